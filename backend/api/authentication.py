@@ -0,0 +1,117 @@
+import hashlib
+import pickle
+import threading
+import time
+from collections import OrderedDict
+
+from core.checks import has_shared_cache
+from django.core.cache import cache
+from django.db import transaction
+from rest_framework.authentication import TokenAuthentication
+
+from backend.settings import (AUTH_TOKEN_CACHE, AUTH_TOKEN_CACHE_SIZE,
+                              AUTH_TOKEN_CACHE_TIMEOUT)
+
+
+class LocalTokenCache:
+    """LRU-кеш с временем жизни записей в памяти процесса."""
+
+    def __init__(self, size, timeout):
+        self.size = size
+        self.timeout = timeout
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+
+    def get(self, key):
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                return None
+            expires, value = entry
+            if expires < time.monotonic():
+                del self.entries[key]
+                return None
+            self.entries.move_to_end(key)
+            return value
+
+    def set(self, key, value):
+        with self.lock:
+            self.entries[key] = (time.monotonic() + self.timeout, value)
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.size:
+                self.entries.popitem(last=False)
+
+    def delete_many(self, keys):
+        with self.lock:
+            for key in keys:
+                self.entries.pop(key, None)
+
+
+class SharedTokenCache:
+    """Записи в кеше Django (`CACHES`), общем для всех воркеров."""
+
+    def __init__(self, timeout):
+        self.timeout = timeout
+
+    @staticmethod
+    def make_key(key):
+        # Сам токен в кеш не попадает, только его хеш.
+        return f'auth-token:{hashlib.sha256(key.encode()).hexdigest()}'
+
+    def get(self, key):
+        return cache.get(self.make_key(key))
+
+    def set(self, key, value):
+        cache.set(self.make_key(key), value, self.timeout)
+
+    def delete_many(self, keys):
+        cache.delete_many([self.make_key(key) for key in keys])
+
+
+def get_token_cache():
+    if AUTH_TOKEN_CACHE == 'local':
+        return LocalTokenCache(AUTH_TOKEN_CACHE_SIZE, AUTH_TOKEN_CACHE_TIMEOUT)
+    # В кэше процесса удалённый токен оставался бы действительным в
+    # остальных процессах до истечения записи.
+    if AUTH_TOKEN_CACHE == 'shared' and has_shared_cache():
+        return SharedTokenCache(AUTH_TOKEN_CACHE_TIMEOUT)
+    return None
+
+
+token_cache = get_token_cache()
+
+
+class CachedTokenAuthentication(TokenAuthentication):
+    """TokenAuthentication с кешем токена и пользователя.
+
+    В кеше лежит сериализованный токен вместе с пользователем: каждый
+    запрос получает свои экземпляры моделей. Неверные токены не кешируются.
+    Записи удаляются при удалении токена (выход) и при сохранении
+    пользователя (смена пароля, блокировка), см. `api.signals`.
+    """
+
+    def authenticate_credentials(self, key):
+        if token_cache is None:
+            return super().authenticate_credentials(key)
+
+        cached = token_cache.get(key)
+        if cached is not None:
+            token = pickle.loads(cached)
+            return token.user, token
+
+        user, token = super().authenticate_credentials(key)
+        token_cache.set(key, pickle.dumps(token))
+        return user, token
+
+
+def invalidate_tokens(keys):
+    """Удаляет записи сразу и ещё раз после коммита.
+
+    Повторное удаление убирает запись, которую параллельный запрос мог
+    успеть закешировать из ещё не изменённых данных.
+    """
+    if token_cache is None:
+        return
+    keys = list(keys)
+    token_cache.delete_many(keys)
+    transaction.on_commit(lambda: token_cache.delete_many(keys))
@@ -0,0 +1,87 @@
+import csv
+import json
+
+
+class Echo:
+    """Псевдо-буфер для csv.writer: возвращает строку вместо записи."""
+
+    def write(self, value):
+        return value
+
+
+class ShoppingListExporter:
+    """Базовый формат выгрузки списка покупок.
+
+    Строки списка — словари с ключами `check`, `ingredient`, `amount`.
+    Вывод отдаётся кусками по `chunk_size` строк, чтобы не держать весь
+    файл в памяти.
+    """
+    format = None
+    media_type = None
+    extension = None
+
+    def header(self):
+        return ''
+
+    def row(self, item, first):
+        raise NotImplementedError
+
+    def footer(self):
+        return ''
+
+    def render(self, rows, chunk_size):
+        chunk = [self.header()]
+        for number, item in enumerate(rows):
+            chunk.append(self.row(item, first=number == 0))
+            if len(chunk) >= chunk_size:
+                yield ''.join(chunk)
+                chunk = []
+        chunk.append(self.footer())
+        yield ''.join(chunk)
+
+
+class CsvExporter(ShoppingListExporter):
+    format = 'csv'
+    media_type = 'text/csv'
+    extension = 'csv'
+    fields = ('check', 'ingredient', 'amount')
+
+    def __init__(self):
+        self.writer = csv.writer(Echo())
+
+    def header(self):
+        return self.writer.writerow(self.fields)
+
+    def row(self, item, first):
+        return self.writer.writerow([item[field] for field in self.fields])
+
+
+class TxtExporter(ShoppingListExporter):
+    format = 'txt'
+    media_type = 'text/plain'
+    extension = 'txt'
+
+    def row(self, item, first):
+        return f'{item["check"]} {item["ingredient"]} — {item["amount"]}\n'
+
+
+class JsonExporter(ShoppingListExporter):
+    format = 'json'
+    media_type = 'application/json'
+    extension = 'json'
+
+    def header(self):
+        return '['
+
+    def row(self, item, first):
+        prefix = '' if first else ','
+        return prefix + json.dumps(item, ensure_ascii=False)
+
+    def footer(self):
+        return ']'
+
+
+EXPORTERS = {
+    exporter.format: exporter
+    for exporter in (CsvExporter, TxtExporter, JsonExporter)
+}
@@ -1,19 +1,29 @@
 import django_filters as filters
+from django.db import connections
 from django.db.models import F, Q
 from django.db.models import Value as V
 from django.db.models.functions import StrIndex
 from recipes.models import Ingredient, Recipe, Tag
+from recipes.search import search_recipes
+
+from backend.settings import INGREDIENT_SEARCH_MIN_LENGTH
 
 TURN = (
     (0, 0),
     (1, 1),
 )
 
+TAGS_MODES = (
+    ('any', 'any'),
+    ('all', 'all'),
+)
+
 class IngredientFilter(filters.FilterSet):
     """Фильтр для ингредиентов.
 
     Двойная фильтрация ингредиентов по вхождению в начало названия и вхождению
-    в произвольном месте. Сортировка от первых ко вторым.
+    в произвольном месте. Сортировка от первых ко вторым. Короткие запросы,
+    как и в индексе `api.search`, ищутся только с начала названия.
     """
 
     name = filters.CharFilter(method='multiple_filter')
@@ -24,6 +34,8 @@ class IngredientFilter(filters.FilterSet):
 
     @staticmethod
     def multiple_filter(queryset, name, value):
+        if len(value) < INGREDIENT_SEARCH_MIN_LENGTH:
+            return queryset.filter(name__istartswith=value)
 
         return queryset.filter(
             Q(name__istartswith=value) | Q(name__icontains=value)
@@ -31,12 +43,24 @@ class IngredientFilter(filters.FilterSet):
 
 
 class RecipeFilter(filters.FilterSet):
-    """Фильтры для рецептов. """
+    """Фильтры для рецептов.
+
+    `search` — полнотекстовый поиск по названию и описанию, результаты
+    сортируются по релевантности.
+
+    `tags` проверяется по битовой маске `Recipe.tags_mask` без JOIN
+    с таблицей тегов: `tags_mode=any` (по умолчанию) — любой из тегов,
+    `tags_mode=all` — все теги сразу.
+    """
 
     tags = filters.ModelMultipleChoiceFilter(
         field_name='tags__slug',
         queryset=Tag.objects.all(),
-        to_field_name='slug'
+        to_field_name='slug',
+        method='tags_filter'
+    )
+    tags_mode = filters.ChoiceFilter(
+        choices=TAGS_MODES, method='tags_mode_filter'
     )
     author = filters.NumberFilter(field_name='author__id')
 
@@ -46,8 +70,37 @@ class RecipeFilter(filters.FilterSet):
     is_in_shopping_cart = filters.TypedChoiceFilter(
         field_name='is_in_shopping_cart', choices=TURN
     )
+    search = filters.CharFilter(method='search_filter')
 
     class Meta:
         model = Recipe
         fields = ('tags', 'author', )
 
+    def tags_filter(self, queryset, name, value):
+        if not value:
+            return queryset
+        match_all = self.form.cleaned_data.get('tags_mode') == 'all'
+        bits = {tag.bit for tag in value}
+        if None in bits:
+            # Тегу не хватило бита: фильтрация через связующую таблицу.
+            if match_all:
+                for tag in value:
+                    queryset = queryset.filter(tags=tag)
+                return queryset
+            return queryset.filter(tags__in=value).distinct()
+
+        mask = sum(1 << bit for bit in bits)
+        queryset = queryset.alias(tags_match=F('tags_mask').bitand(mask))
+        if match_all:
+            return queryset.filter(tags_match=mask)
+        return queryset.exclude(tags_match=0)
+
+    @staticmethod
+    def tags_mode_filter(queryset, name, value):
+        # Режим учитывается в tags_filter.
+        return queryset
+
+    @staticmethod
+    def search_filter(queryset, name, value):
+        return search_recipes(queryset, value, connections[queryset.db])
+
@@ -0,0 +1,49 @@
+from users.models import Follow
+
+
+class FollowGraph:
+    """Подписки пользователя запроса на авторов.
+
+    Каждый id автора проверяется в базе не больше одного раза за запрос:
+    `prime` загружает подписки сразу на пачку авторов (страницу списка),
+    а проверка незагруженного id подтягивает все подписки пользователя.
+    """
+
+    def __init__(self, user):
+        self.user = user
+        self.following = set()
+        self.known = set()
+        self.complete = not user.is_authenticated
+
+    def prime(self, author_ids):
+        missing = set(author_ids) - self.known
+        if self.complete or not missing:
+            return
+        self.following.update(
+            Follow.objects.filter(
+                user=self.user, author_id__in=missing
+            ).values_list('author_id', flat=True)
+        )
+        self.known |= missing
+
+    def load_all(self):
+        self.following = set(
+            Follow.objects.filter(
+                user=self.user
+            ).values_list('author_id', flat=True)
+        )
+        self.complete = True
+
+    def __contains__(self, author_id):
+        if not self.complete and author_id not in self.known:
+            self.load_all()
+        return author_id in self.following
+
+
+def get_follow_graph(request):
+    """Граф подписок, общий для всех сериализаторов одного запроса."""
+    graph = getattr(request, 'follow_graph', None)
+    if graph is None:
+        graph = FollowGraph(request.user)
+        request.follow_graph = graph
+    return graph
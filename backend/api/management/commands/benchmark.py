@@ -0,0 +1,336 @@
+import gc
+import json
+import platform
+import statistics
+import time
+import tracemalloc
+from contextlib import ExitStack
+from math import ceil
+
+import django
+from django.core.cache import cache
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DEFAULT_DB_ALIAS, connection, connections, reset_queries
+from django.db.models import Count
+from django.test import Client
+from django.test.utils import (CaptureQueriesContext, override_settings,
+                               setup_test_environment,
+                               teardown_test_environment)
+from recipes.dataset import DatasetBuilder
+from recipes.models import Ingredient, Recipe, User
+from rest_framework.authtoken.models import Token
+
+from backend.settings import REPLICA_DATABASES
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'benchmark',
+    }
+}
+PAGE_SIZE = 6
+
+# (имя, URL, нужен ли токен). Подстановки берутся из `context`.
+CASES = (
+    ('recipes', '/api/recipes/?page=1&limit={page_size}', False),
+    ('recipes-auth', '/api/recipes/?page=1&limit={page_size}', True),
+    ('recipes-deep-page',
+     '/api/recipes/?page={last_page}&limit={page_size}', True),
+    ('recipes-cursor', '/api/recipes/?cursor=&limit={page_size}', True),
+    ('recipes-limit-100', '/api/recipes/?page=1&limit=100', True),
+    ('recipes-tags-any',
+     '/api/recipes/?limit={page_size}&tags={tag}&tags={other_tag}', True),
+    ('recipes-tags-all',
+     '/api/recipes/?limit={page_size}&tags={tag}&tags={other_tag}'
+     '&tags_mode=all', True),
+    ('recipes-author', '/api/recipes/?limit={page_size}&author={author}',
+     True),
+    ('recipes-favorited',
+     '/api/recipes/?limit={page_size}&is_favorited=1', True),
+    ('recipes-in-cart',
+     '/api/recipes/?limit={page_size}&is_in_shopping_cart=1', True),
+    ('recipes-search', '/api/recipes/?limit={page_size}&search={word}',
+     True),
+    ('recipe-detail', '/api/recipes/{recipe}/', True),
+    ('subscriptions',
+     '/api/users/subscriptions/?limit={page_size}&recipes_limit=3', True),
+    ('shopping-list-csv',
+     '/api/recipes/download_shopping_cart/?format=csv', True),
+    ('shopping-list-txt',
+     '/api/recipes/download_shopping_cart/?format=txt', True),
+    ('shopping-list-json',
+     '/api/recipes/download_shopping_cart/?format=json', True),
+    ('ingredients-prefix', '/api/ingredients/?name={prefix}', False),
+    ('ingredients-infix', '/api/ingredients/?name={infix}', False),
+    ('tags', '/api/tags/', False),
+    ('users', '/api/users/?limit={page_size}', True),
+    ('users-me', '/api/users/me/', True),
+)
+
+
+class Command(BaseCommand):
+    help = (
+        'Замеряет задержку, число запросов к БД и память для каждого '
+        'эндпоинта API на детерминированном наборе данных во временной '
+        'тестовой базе: с кэшем, очищаемым перед каждым запросом, и с '
+        'тёплым кэшем. С базовым прогоном сравниваются холодные замеры.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--users', type=int, default=200,
+            help='Number of users in the dataset.'
+        )
+        parser.add_argument(
+            '--recipes', type=int, default=2000,
+            help='Number of recipes in the dataset.'
+        )
+        parser.add_argument(
+            '--seed', type=int, default=0,
+            help='Random seed of the dataset.'
+        )
+        parser.add_argument(
+            '--iterations', type=int, default=50,
+            help='Timed requests per case.'
+        )
+        parser.add_argument(
+            '--warmup', type=int, default=5,
+            help='Untimed requests per case before measuring.'
+        )
+        parser.add_argument(
+            '--no-warm', action='store_false', dest='warm',
+            help='Measure only with the cache cleared before every request.'
+        )
+        parser.add_argument(
+            '--case', action='append', dest='cases',
+            help='Run only the named case; may be repeated.'
+        )
+        parser.add_argument(
+            '--output', help='Write results as JSON to this file.'
+        )
+        parser.add_argument(
+            '--baseline', help='Compare results with this JSON file.'
+        )
+        parser.add_argument(
+            '--tolerance', type=float, default=0.25,
+            help='Allowed relative p95 growth over the baseline.'
+        )
+
+    def handle(self, *args, **options):
+        if options['iterations'] < 2:
+            raise CommandError('At least 2 iterations are required.')
+        cases = CASES
+        if options['cases']:
+            names = {name for name, _, _ in CASES}
+            unknown = set(options['cases']) - names
+            if unknown:
+                raise CommandError(
+                    f'Unknown cases: {", ".join(sorted(unknown))}.'
+                )
+            cases = [case for case in CASES if case[0] in options['cases']]
+        baseline = None
+        if options['baseline']:
+            with open(options['baseline'], encoding='utf-8') as file:
+                baseline = json.load(file)
+
+        setup_test_environment()
+        old_name = connection.settings_dict['NAME']
+        connection.creation.create_test_db(
+            verbosity=0, autoclobber=True, serialize=False
+        )
+        # Реплики читают ту же временную базу, как TEST MIRROR в тестах.
+        for alias in REPLICA_DATABASES:
+            connections[alias].creation.set_as_test_mirror(
+                connection.settings_dict
+            )
+        try:
+            with override_settings(CACHES=CACHES, DEBUG=False):
+                report = self.run(cases, options)
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+            teardown_test_environment()
+
+        self.print_report(report['results'])
+        if options['output']:
+            with open(options['output'], 'w', encoding='utf-8') as file:
+                json.dump(report, file, ensure_ascii=False, indent=2)
+        if baseline is not None:
+            self.compare(report, baseline, options['tolerance'])
+
+    def run(self, cases, options):
+        started = time.perf_counter()
+        DatasetBuilder(
+            seed=options['seed'],
+            users=options['users'],
+            recipes=options['recipes'],
+            log=self.stdout.write
+        ).build()
+        self.stdout.write(
+            f'Dataset built in {time.perf_counter() - started:.1f}s.'
+        )
+        context = self.get_context()
+
+        results = {}
+        for name, url, auth in cases:
+            self.stdout.write(f'Measuring {name}...')
+            client = Client()
+            if auth:
+                client.defaults['HTTP_AUTHORIZATION'] = (
+                    f'Token {context["token"]}'
+                )
+            url = url.format(**context)
+            # Холодные замеры — работа вьюсетов и фильтров с БД, тёплые —
+            # попадания в общий кэш страниц.
+            results[name] = {'url': url}
+            for mode, cold in (('cold', True), ('warm', False)):
+                if cold or options['warm']:
+                    results[name][mode] = self.measure(
+                        client, url, options, cold
+                    )
+
+        return {
+            'meta': {
+                'vendor': connection.vendor,
+                'python': platform.python_version(),
+                'django': django.get_version(),
+                'users': options['users'],
+                'recipes': options['recipes'],
+                'seed': options['seed'],
+                'iterations': options['iterations'],
+            },
+            'results': results,
+        }
+
+    @staticmethod
+    def get_context():
+        """Параметры URL, выбранные по данным, а не по заданным id."""
+        # Больше всех в корзине и подписок — самый тяжёлый пользователь.
+        user = User.objects.annotate(
+            carts_total=Count('carts', distinct=True),
+            follows_total=Count('follower', distinct=True)
+        ).order_by('-carts_total', '-follows_total', 'id').first()
+        author = User.objects.annotate(
+            recipes_total=Count('recipe')
+        ).order_by('-recipes_total', 'id').first()
+        recipe = Recipe.objects.order_by('-favorites_count', 'id').first()
+        tags = list(
+            Recipe.tags.through.objects.values('tag__slug').annotate(
+                total=Count('id')
+            ).order_by('-total', 'tag__slug').values_list(
+                'tag__slug', flat=True
+            )[:2]
+        )
+        ingredient = Ingredient.objects.order_by('id').values_list(
+            'name', flat=True
+        )[Ingredient.objects.count() // 2]
+        return {
+            'token': Token.objects.get(user=user).key,
+            'author': author.id,
+            'recipe': recipe.id,
+            'tag': tags[0],
+            'other_tag': tags[-1],
+            'word': recipe.name.split()[0].strip(':'),
+            'prefix': ingredient[:3],
+            'infix': ingredient[1:5],
+            'page_size': PAGE_SIZE,
+            'last_page': ceil(Recipe.objects.count() / PAGE_SIZE),
+        }
+
+    @staticmethod
+    def fetch(client, url, cold):
+        if cold:
+            cache.clear()
+        response = client.get(url)
+        if response.streaming:
+            b''.join(response.streaming_content)
+        return response
+
+    def measure(self, client, url, options, cold):
+        for _ in range(options['warmup']):
+            self.fetch(client, url, cold)
+
+        # Журнал — deque ограниченной длины: заполненный журнал не растёт.
+        reset_queries()
+        with ExitStack() as stack:
+            captured = [
+                stack.enter_context(CaptureQueriesContext(connections[alias]))
+                for alias in (DEFAULT_DB_ALIAS, *REPLICA_DATABASES)
+            ]
+            response = self.fetch(client, url, cold)
+        # Следующий запрос очистит журнал, число запросов нужно сейчас.
+        query_count = sum(len(queries) for queries in captured)
+
+        tracemalloc.start()
+        self.fetch(client, url, cold)
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+
+        # Как в timeit: сборка мусора не должна попадать в замеры.
+        gc.collect()
+        gc.disable()
+        timings = []
+        try:
+            for _ in range(options['iterations']):
+                if cold:
+                    cache.clear()
+                started = time.perf_counter()
+                self.fetch(client, url, False)
+                timings.append((time.perf_counter() - started) * 1000)
+        finally:
+            gc.enable()
+
+        quantiles = statistics.quantiles(timings, n=100)
+        return {
+            'status': response.status_code,
+            'queries': query_count,
+            'peak_kib': round(peak / 1024, 1),
+            'p50_ms': round(quantiles[49], 2),
+            'p95_ms': round(quantiles[94], 2),
+            'p99_ms': round(quantiles[98], 2),
+        }
+
+    def print_report(self, results):
+        self.stdout.write(
+            f'{"case":<22}{"cache":>6}{"status":>7}{"queries":>8}{"KiB":>9}'
+            f'{"p50":>9}{"p95":>9}{"p99":>9}'
+        )
+        for name, modes in results.items():
+            for mode in ('cold', 'warm'):
+                if mode not in modes:
+                    continue
+                result = modes[mode]
+                self.stdout.write(
+                    f'{name:<22}{mode:>6}{result["status"]:>7}'
+                    f'{result["queries"]:>8}{result["peak_kib"]:>9}'
+                    f'{result["p50_ms"]:>9}{result["p95_ms"]:>9}'
+                    f'{result["p99_ms"]:>9}'
+                )
+
+    def compare(self, report, baseline, tolerance):
+        """Ошибка, если в холодных замерах выросло число запросов или p95
+        сверх допуска: тёплые замеры не видят запросов за кэшем страниц."""
+        regressions = []
+        for name, modes in report['results'].items():
+            base = baseline.get('results', {}).get(name, {}).get('cold')
+            if base is None:
+                continue
+            result = modes['cold']
+            if result['status'] != base['status']:
+                regressions.append(
+                    f'{name}: status {base["status"]} -> {result["status"]}'
+                )
+            if result['queries'] > base['queries']:
+                regressions.append(
+                    f'{name}: queries {base["queries"]} -> '
+                    f'{result["queries"]}'
+                )
+            if result['p95_ms'] > base['p95_ms'] * (1 + tolerance):
+                regressions.append(
+                    f'{name}: p95 {base["p95_ms"]}ms -> '
+                    f'{result["p95_ms"]}ms'
+                )
+        if regressions:
+            raise CommandError(
+                'Regressions against the baseline:\n' + '\n'.join(regressions)
+            )
+        self.stdout.write(self.style.SUCCESS('No regressions.'))
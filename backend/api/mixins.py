@@ -1,7 +1,20 @@
+import hashlib
+
+from core.db_routers import can_cache_read, is_pinned
+from django.core.cache import cache
+from django.db.models import Value as V
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import http_date, quote_etag
+from recipes.models import Cart, Favorite
+from recipes.versions import get_version
 from rest_framework.mixins import (CreateModelMixin, DestroyModelMixin,
                                    ListModelMixin)
 from rest_framework.permissions import IsAuthenticated
+from rest_framework.response import Response
 from rest_framework.viewsets import GenericViewSet
+from users.models import Follow
+
+from backend.settings import RECIPE_CACHE_TIMEOUT
 
 
 class CreateDeleteMixinSet(CreateModelMixin, DestroyModelMixin, GenericViewSet):
@@ -18,3 +31,151 @@ class CreateListDeleteMixinSet(
     Миксин для вюсетов: Поддерживает вывод списком, создание, удаление.
     """
     permission_classes = (IsAuthenticated,)
+
+
+class ConditionalGetMixin:
+    """Условные GET-запросы для редко меняющихся справочников.
+
+    `ETag` и `Last-Modified` строятся по версии данных `version_name`,
+    поэтому на `If-None-Match`/`If-Modified-Since` ответ 304 отдаётся до
+    обращения к БД и сериализатору.
+    """
+    version_name = None
+
+    def get_etag(self, request, version):
+        variant = hashlib.md5(
+            f'{request.get_full_path()}|{request.META.get("HTTP_ACCEPT")}'
+            .encode()
+        ).hexdigest()
+        return quote_etag(f'{self.version_name}-{version}-{variant}')
+
+    def check_conditions(self, request):
+        """ETag, время изменения и ответ 304/412, если он уже готов."""
+        version, modified = get_version(self.version_name)
+        etag = self.get_etag(request, version)
+        return etag, modified, get_conditional_response(
+            request, etag=etag, last_modified=modified
+        )
+
+    @staticmethod
+    def set_validators(response, etag, modified):
+        response['ETag'] = etag
+        response['Last-Modified'] = http_date(modified)
+        patch_cache_control(response, public=True, no_cache=True)
+        return response
+
+    def conditional(self, handler, request, *args, **kwargs):
+        etag, modified, response = self.check_conditions(request)
+        if response is None:
+            response = handler(request, *args, **kwargs)
+            if response.status_code != 200:
+                return response
+        return self.set_validators(response, etag, modified)
+
+    def list(self, request, *args, **kwargs):
+        return self.conditional(super().list, request, *args, **kwargs)
+
+    def retrieve(self, request, *args, **kwargs):
+        return self.conditional(super().retrieve, request, *args, **kwargs)
+
+
+class SharedPageCacheMixin:
+    """Общий для всех пользователей кэш списка и карточек рецептов.
+
+    В кэше хранится ответ по ключу из адреса запроса и версии данных
+    `recipes`. Флаги, зависящие от пользователя (`is_favorited`,
+    `is_in_shopping_cart`, `author.is_subscribed`), накладываются поверх
+    одним запросом по рецептам страницы. При чтении с реплик кэш не
+    нарушает чтение своих записей, см. `core.db_routers`.
+    """
+    cache_version = 'recipes'
+    viewer_filters = ('is_favorited', 'is_in_shopping_cart')
+
+    def get_cache_key(self, request, version):
+        variant = hashlib.md5(
+            f'{request.build_absolute_uri()}|{request.META.get("HTTP_ACCEPT")}'
+            .encode()
+        ).hexdigest()
+        return f'{self.cache_version}-page:{version}:{variant}'
+
+    def is_cacheable(self, params):
+        return bool(RECIPE_CACHE_TIMEOUT) and not any(
+            name in params for name in self.viewer_filters
+        )
+
+    def read_cache(self, request):
+        """Ключ, время изменения версии данных и ответ из кэша.
+
+        Клиент, закреплённый за основной базой, кэш пропускает.
+        """
+        if is_pinned():
+            return None, None, None
+        version, modified = get_version(self.cache_version)
+        key = self.get_cache_key(request, version)
+        data = cache.get(key)
+        if data is not None:
+            self.overlay(request.user, data)
+        return key, modified, data
+
+    @staticmethod
+    def write_cache(key, modified, data):
+        if key is not None and can_cache_read(modified):
+            cache.set(key, data, RECIPE_CACHE_TIMEOUT)
+
+    def cached(self, handler, request, *args, **kwargs):
+        if not self.is_cacheable(request.query_params):
+            return handler(request, *args, **kwargs)
+
+        key, modified, data = self.read_cache(request)
+        if data is not None:
+            return Response(data)
+
+        response = handler(request, *args, **kwargs)
+        if response.status_code == 200:
+            self.write_cache(key, modified, response.data)
+        return response
+
+    @staticmethod
+    def overlay(user, data):
+        if isinstance(data, list):
+            recipes = data
+        elif 'results' in data:
+            recipes = data['results']
+        else:
+            recipes = [data]
+
+        flags = set()
+        if user.is_authenticated and recipes:
+            recipe_ids = [recipe['id'] for recipe in recipes]
+            author_ids = {recipe['author']['id'] for recipe in recipes}
+            flags = set(
+                Favorite.objects.filter(
+                    user=user, recipe_id__in=recipe_ids
+                ).annotate(kind=V('favorite')).values_list(
+                    'kind', 'recipe_id'
+                ).union(
+                    Cart.objects.filter(
+                        user=user, recipe_id__in=recipe_ids
+                    ).annotate(kind=V('cart')).values_list(
+                        'kind', 'recipe_id'
+                    ),
+                    Follow.objects.filter(
+                        user=user, author_id__in=author_ids
+                    ).annotate(kind=V('follow')).values_list(
+                        'kind', 'author_id'
+                    )
+                )
+            )
+
+        for recipe in recipes:
+            recipe['is_favorited'] = ('favorite', recipe['id']) in flags
+            recipe['is_in_shopping_cart'] = ('cart', recipe['id']) in flags
+            recipe['author']['is_subscribed'] = (
+                ('follow', recipe['author']['id']) in flags
+            )
+
+    def list(self, request, *args, **kwargs):
+        return self.cached(super().list, request, *args, **kwargs)
+
+    def retrieve(self, request, *args, **kwargs):
+        return self.cached(super().retrieve, request, *args, **kwargs)
@@ -1,6 +1,122 @@
+import base64
+import json
+from collections import OrderedDict
+
+from django.core.exceptions import ValidationError
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
 from rest_framework.pagination import PageNumberPagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import remove_query_param, replace_query_param
 
 
 class FoodgramPagination(PageNumberPagination):
-    """Пагинация для проекта. """
+    """Пагинация для проекта.
+
+    По умолчанию постраничная (`page`, `limit`). С параметром `cursor`
+    включается пагинация по ключу: следующая страница выбирается условием
+    по полям `keyset_ordering` вьюсета, без OFFSET и COUNT(*), поэтому
+    глубокие страницы стоят столько же, сколько первая.
+    """
     page_size_query_param = 'limit'
+    cursor_query_param = 'cursor'
+    cursor_page_size = 10
+    invalid_cursor_message = 'Invalid cursor'
+
+    keyset = False
+
+    def paginate_queryset(self, queryset, request, view=None):
+        if self.cursor_query_param not in request.query_params:
+            return super().paginate_queryset(queryset, request, view)
+
+        self.keyset = True
+        self.request = request
+        self.ordering = view.keyset_ordering
+        self.fields = [field.lstrip('-') for field in self.ordering]
+        page_size = self.get_page_size(request) or self.cursor_page_size
+
+        values, reverse = self.decode_cursor(
+            request.query_params[self.cursor_query_param], queryset.model
+        )
+        ordering = self.ordering
+        if reverse:
+            ordering = [self.invert(field) for field in ordering]
+        queryset = queryset.order_by(*ordering)
+        if values is not None:
+            queryset = queryset.filter(self.seek(ordering, values))
+
+        rows = list(queryset[:page_size + 1])
+        has_more = len(rows) > page_size
+        rows = rows[:page_size]
+        if reverse:
+            rows.reverse()
+
+        self.next_values = self.previous_values = None
+        if rows and (has_more or reverse):
+            self.next_values = self.row_values(rows[-1])
+        if rows and (has_more if reverse else values is not None):
+            self.previous_values = self.row_values(rows[0])
+        return rows
+
+    @staticmethod
+    def invert(field):
+        return field[1:] if field.startswith('-') else f'-{field}'
+
+    def seek(self, ordering, values):
+        """Условие «строго после `values`» для лексикографического порядка."""
+        condition = Q()
+        for position, field in enumerate(ordering):
+            name = field.lstrip('-')
+            lookup = 'lt' if field.startswith('-') else 'gt'
+            step = Q(**{f'{name}__{lookup}': values[position]})
+            for previous in range(position):
+                step &= Q(**{self.fields[previous]: values[previous]})
+            condition |= step
+        return condition
+
+    def row_values(self, row):
+        return [getattr(row, field) for field in self.fields]
+
+    def encode_cursor(self, values, reverse):
+        # isoformat() сохраняет микросекунды, в отличие от DjangoJSONEncoder.
+        payload = json.dumps(
+            {'v': values, 'r': int(reverse)},
+            default=lambda value: value.isoformat()
+        )
+        return base64.urlsafe_b64encode(payload.encode()).decode()
+
+    def decode_cursor(self, token, model):
+        if not token:
+            return None, False
+        try:
+            payload = json.loads(base64.urlsafe_b64decode(token.encode()))
+            if len(payload['v']) != len(self.fields):
+                raise ValueError
+            values = [
+                model._meta.get_field(field).to_python(value)
+                for field, value in zip(self.fields, payload['v'])
+            ]
+            return values, bool(payload.get('r'))
+        except (TypeError, ValueError, KeyError, ValidationError):
+            raise NotFound(self.invalid_cursor_message)
+
+    def get_cursor_link(self, values, reverse):
+        if values is None:
+            return None
+        url = remove_query_param(
+            self.request.build_absolute_uri(), self.page_query_param
+        )
+        return replace_query_param(
+            url, self.cursor_query_param, self.encode_cursor(values, reverse)
+        )
+
+    def get_paginated_response(self, data):
+        if not self.keyset:
+            return super().get_paginated_response(data)
+
+        return Response(OrderedDict([
+            ('count', None),
+            ('next', self.get_cursor_link(self.next_values, False)),
+            ('previous', self.get_cursor_link(self.previous_values, True)),
+            ('results', data),
+        ]))
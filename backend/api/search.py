@@ -0,0 +1,179 @@
+import logging
+import threading
+import time
+from array import array
+from bisect import bisect_left
+from collections import Counter
+
+from django.db import DatabaseError, connections
+from recipes.models import Ingredient
+from recipes.versions import get_version
+
+from backend.settings import (INGREDIENT_INDEX_TTL,
+                              INGREDIENT_SEARCH_MIN_LENGTH,
+                              INGREDIENT_SEARCH_SIMILARITY)
+
+logger = logging.getLogger(__name__)
+
+
+def trigrams(text):
+    """Триграммы строки с отбивкой пробелами, как в pg_trgm."""
+    padded = f'  {text} '
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+class IngredientIndex:
+    """Поисковый индекс по названиям ингредиентов в памяти процесса.
+
+    Порядок выдачи как у `IngredientFilter`: сначала совпадения с начала
+    названия, затем вхождения в произвольном месте по позиции вхождения.
+    Если точных совпадений нет, ищутся похожие названия по триграммам.
+    Запрос короче INGREDIENT_SEARCH_MIN_LENGTH ищется только с начала
+    названия двоичным поиском по отсортированным ключам.
+    """
+
+    def __init__(self, rows):
+        items = sorted(
+            (
+                {'id': _id, 'name': name, 'measurement_unit': unit}
+                for _id, name, unit in rows
+            ),
+            key=lambda item: (item['name'].lower(), item['id'])
+        )
+        self.items = items
+        self.keys = [item['name'].lower() for item in items]
+        self.sizes = array('H')
+        postings = {}
+        bigram_postings = {}
+        for position, key in enumerate(self.keys):
+            grams = trigrams(key)
+            self.sizes.append(min(len(grams), 0xFFFF))
+            for gram in grams:
+                postings.setdefault(gram, array('I')).append(position)
+            for gram in {key[i:i + 2] for i in range(len(key) - 1)}:
+                bigram_postings.setdefault(gram, array('I')).append(position)
+        self.postings = postings
+        self.bigram_postings = bigram_postings
+
+    def __len__(self):
+        return len(self.items)
+
+    def prefix(self, query):
+        start = bisect_left(self.keys, query)
+        end = bisect_left(self.keys, query + '\uffff', start)
+        return range(start, end)
+
+    def candidates(self, query):
+        """Позиции названий, которые могут содержать `query`."""
+        if len(query) == 2:
+            return self.bigram_postings.get(query, ())
+
+        grams = {query[i:i + 3] for i in range(len(query) - 2)}
+        lists = sorted(
+            (self.postings.get(gram, ()) for gram in grams), key=len
+        )
+        found = set(lists[0])
+        for positions in lists[1:]:
+            found.intersection_update(positions)
+            if not found:
+                break
+        return sorted(found)
+
+    def similar(self, query):
+        grams = trigrams(query)
+        shared = Counter()
+        for gram in grams:
+            shared.update(self.postings.get(gram, ()))
+        scored = []
+        for position, common in shared.items():
+            score = common / (len(grams) + self.sizes[position] - common)
+            if score >= INGREDIENT_SEARCH_SIMILARITY:
+                scored.append((-score, position))
+        scored.sort()
+        return [position for _, position in scored]
+
+    def search(self, query, limit=None, fuzzy=True):
+        query = query.lower()
+        positions = list(self.prefix(query))
+        if len(query) < INGREDIENT_SEARCH_MIN_LENGTH:
+            return [self.items[position] for position in positions[:limit]]
+        if limit is None or len(positions) < limit:
+            seen = set(positions)
+            contains = [
+                (self.keys[position].find(query), position)
+                for position in self.candidates(query)
+                if position not in seen and query in self.keys[position]
+            ]
+            contains.sort()
+            positions.extend(position for _, position in contains)
+
+        if not positions and fuzzy:
+            positions = self.similar(query)
+
+        return [self.items[position] for position in positions[:limit]]
+
+
+class IngredientIndexHolder:
+    """Сборка индекса по версии данных ингредиентов.
+
+    Индекс строится при старте процесса (`warm_in_background`), а если
+    не успел — при первом запросе. Он перестраивается, когда меняется
+    версия `ingredients` (её обновляют сигналы и загрузчик каталога): в
+    процессе, где была запись, сразу после коммита, в остальных — при
+    первом запросе с новой версией. В любом случае индекс перестраивается
+    по истечении `INGREDIENT_INDEX_TTL` секунд, чтобы ограничить
+    устаревание, если версия изменилась мимо `bump_version`.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.index = None
+        self.version = None
+        self.built_at = 0
+
+    def is_fresh(self, version):
+        return (
+            self.index is not None
+            and self.version == version
+            and time.monotonic() - self.built_at < INGREDIENT_INDEX_TTL
+        )
+
+    def get(self):
+        version = get_version('ingredients')
+        if self.is_fresh(version):
+            return self.index
+
+        with self.lock:
+            if not self.is_fresh(version):
+                self.index = IngredientIndex(
+                    Ingredient.objects.values_list(
+                        'id', 'name', 'measurement_unit'
+                    ).iterator()
+                )
+                self.version = version
+                self.built_at = time.monotonic()
+            return self.index
+
+    def refresh(self):
+        """Перестраивает уже построенный индекс под новую версию."""
+        if self.index is not None:
+            self.get()
+
+
+ingredient_index = IngredientIndexHolder()
+
+
+def warm_in_background():
+    """Строит индекс в отдельном потоке при старте сервера."""
+    def warm():
+        try:
+            ingredient_index.get()
+        except DatabaseError:
+            # Например, до migrate: индекс построит первый запрос.
+            logger.warning('Ingredient index warm-up failed', exc_info=True)
+        finally:
+            connections.close_all()
+
+    threading.Thread(
+        target=warm, name='ingredient-index', daemon=True
+    ).start()
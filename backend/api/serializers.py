@@ -1,21 +1,45 @@
 import base64
+import binascii
+import re
 
-from django.core.files.base import ContentFile
-from django.db import transaction
-from django.db.models import Q
+from django.core.files.uploadedfile import TemporaryUploadedFile
+from django.db import models, transaction
 from djoser import serializers as djoser_serializer
 from djoser.conf import settings
+from recipes.images import image_variants
 from recipes.models import (Cart, Favorite, Ingredient, IngredientAmount,
-                            Recipe, Tag, User)
+                            Recipe, ShoppingListItem, Tag, User)
+from recipes.versions import bump_version
 from rest_framework import serializers
-from rest_framework.generics import get_object_or_404
 from users.models import Follow
 
-from backend.settings import MEDIA_URL
+from backend.settings import BULK_MAX_IDS, MEDIA_URL, RECIPE_IMAGE_MAX_SIZE
+
+from .follows import get_follow_graph
+
+
+class FollowGraphListSerializer(serializers.ListSerializer):
+    """Список, для которого подписки на всех авторов грузятся разом.
+
+    Поле автора берётся из `follow_author_field` дочернего сериализатора.
+    """
+
+    def to_representation(self, data):
+        if isinstance(data, models.Manager):
+            data = data.all()
+        request = self.context.get('request')
+        if request is not None:
+            data = list(data)
+            get_follow_graph(request).prime(
+                getattr(item, self.child.follow_author_field)
+                for item in data
+            )
+        return super().to_representation(data)
 
 
 class UserProfileSerializer(serializers.ModelSerializer):
     is_subscribed = serializers.SerializerMethodField()
+    follow_author_field = 'id'
 
     class Meta:
         fields = (
@@ -23,12 +47,16 @@ class UserProfileSerializer(serializers.ModelSerializer):
             'last_name', 'is_subscribed',
         )
         model = User
+        list_serializer_class = FollowGraphListSerializer
 
     def get_is_subscribed(self, obj):
+        if hasattr(obj, 'is_subscribed'):
+            return obj.is_subscribed
+
         request = self.context.get('request')
-        return Follow.objects.filter(
-            Q(user__id=request.user.id) & Q(author__id=obj.id)
-        ).exists()
+        if request is None:
+            return False
+        return obj.id in get_follow_graph(request)
 
 
 class UserCreateSerializer(djoser_serializer.UserCreateSerializer):
@@ -93,6 +121,15 @@ class FavoriteSerializer(serializers.ModelSerializer):
         model = Favorite
 
 
+class BulkIdsSerializer(serializers.Serializer):
+    """Список id для пакетных операций."""
+    ids = serializers.ListField(
+        child=serializers.IntegerField(min_value=1),
+        allow_empty=False,
+        max_length=BULK_MAX_IDS
+    )
+
+
 class ShortRecipeSerializer(serializers.ModelSerializer):
     class Meta:
         fields = ('id', 'name', 'image', 'cooking_time')
@@ -119,28 +156,24 @@ class FollowSerializer(serializers.ModelSerializer):
         model = Follow
 
     def get_recipes(self, obj):
+        data = getattr(obj.author, 'latest_recipes', None)
+        if data is None:
+            request = self.context.get('request')
+            params = request.query_params
 
-        request = self.context.get('request')
-        params = request.query_params
-
-        recipes_limit = params.get('recipes_limit')
-        if recipes_limit:
-            data = obj.author.recipe.all()[:int(recipes_limit)]
-        else:
+            recipes_limit = params.get('recipes_limit')
             data = obj.author.recipe.all()
+            if recipes_limit:
+                data = data[:int(recipes_limit)]
 
-        recipe_serializers = ShortRecipeSerializer(
-            data=data, many=True
-        )
-        recipe_serializers.is_valid()
-        return recipe_serializers.data
+        return ShortRecipeSerializer(data, many=True).data
 
 
 class TagSerializer(serializers.ModelSerializer):
     """Сериализация тегов."""
 
     class Meta:
-        fields = '__all__'
+        exclude = ('bit', )
         model = Tag
 
 
@@ -157,17 +190,53 @@ class IngredientSerializer(serializers.ModelSerializer):
 
 
 class Base64ImageField(serializers.ImageField):
+    """Картинка в виде `data:image/<ext>;base64,<данные>`.
+
+    Данные декодируются кусками во временный файл, размер ограничен
+    `RECIPE_IMAGE_MAX_SIZE`. Имя в хранилище задаёт хеш содержимого.
+    """
+    default_error_messages = {
+        'too_large': 'Image must not be larger than {max_size} bytes.',
+        'invalid_base64': 'Invalid base64 image data.',
+    }
+    # Кратно 4, чтобы каждый кусок декодировался независимо.
+    chunk_size = 64 * 1024
 
     def to_representation(self, value):
         return f'{MEDIA_URL}{value}'
 
     def to_internal_value(self, data):
-        if isinstance(data, str) and data.startswith('data:image'):
-            format, imgstr = data.split(';base64,')
-            ext = format.split('/')[-1]
-            data = ContentFile(base64.b64decode(imgstr), name='temp.' + ext)
+        if not (isinstance(data, str) and data.startswith('data:image')):
+            return super().to_internal_value(data)
 
-        return super().to_internal_value(data)
+        header, _, encoded = data.partition(';base64,')
+        ext = re.sub(r'\W', '', header.split('/')[-1]) or 'img'
+        size = len(encoded) * 3 // 4 - encoded[-2:].count('=')
+        if size > RECIPE_IMAGE_MAX_SIZE:
+            self.fail('too_large', max_size=RECIPE_IMAGE_MAX_SIZE)
+
+        upload = TemporaryUploadedFile(
+            f'image.{ext}', f'image/{ext}', size, None
+        )
+        # Файл остаётся открытым до сохранения рецепта, а при любой
+        # ошибке проверки удаляется сразу.
+        try:
+            self.decode(encoded, upload)
+            return super().to_internal_value(upload)
+        except BaseException:
+            upload.close()
+            raise
+
+    def decode(self, encoded, upload):
+        try:
+            for start in range(0, len(encoded), self.chunk_size):
+                upload.write(base64.b64decode(
+                    encoded[start:start + self.chunk_size], validate=True
+                ))
+        except binascii.Error:
+            self.fail('invalid_base64')
+        upload.size = upload.tell()
+        upload.seek(0)
 
 
 class IngredientAmountSerializer(serializers.ModelSerializer):
@@ -193,11 +262,112 @@ class RecipeListRetrieveSerializer(serializers.ModelSerializer):
         many=True, source='ingredient_amounts'
     )
     image = Base64ImageField(required=False, use_url=False)
-
+    image_variants = serializers.SerializerMethodField()
+    follow_author_field = 'author_id'
 
     class Meta:
-        exclude = ('pub_date',)
+        exclude = (
+            'pub_date', 'favorites_count', 'carts_count', 'tags_mask',
+            'variants_image'
+        )
         model = Recipe
+        list_serializer_class = FollowGraphListSerializer
+
+    @staticmethod
+    def get_image_variants(obj):
+        return image_variants(obj)
+
+
+TAG_KEYS = ('id', 'name', 'color', 'slug')
+INGREDIENT_KEYS = ('id', 'name', 'measurement_unit', 'amount')
+
+
+def load_recipe_relations(recipe_ids):
+    """Теги и ингредиенты рецептов: два запроса values_list.
+
+    Порядок тот же, что у prefetch_related, — по умолчанию моделей.
+    """
+    tags = {recipe_id: [] for recipe_id in recipe_ids}
+    for recipe_id, *values in Tag.objects.filter(
+        recipe__id__in=recipe_ids
+    ).values_list('recipe__id', 'id', 'name', 'color', 'slug'):
+        tags[recipe_id].append(dict(zip(TAG_KEYS, values)))
+
+    ingredients = {recipe_id: [] for recipe_id in recipe_ids}
+    for recipe_id, *values in IngredientAmount.objects.filter(
+        recipe_id__in=recipe_ids
+    ).values_list(
+        'recipe_id', 'ingredient_id', 'ingredient__name',
+        'ingredient__measurement_unit', 'amount'
+    ):
+        ingredients[recipe_id].append(dict(zip(INGREDIENT_KEYS, values)))
+    return tags, ingredients
+
+
+class RecipeFastListSerializer(serializers.ListSerializer):
+
+    def to_representation(self, data):
+        if isinstance(data, models.Manager):
+            data = data.all()
+        return self.child.render(list(data))
+
+
+class RecipeListFastSerializer(serializers.BaseSerializer):
+    """Быстрое чтение рецептов для list и retrieve.
+
+    Ответ совпадает с RecipeListRetrieveSerializer байт в байт, но теги
+    и ингредиенты читаются кортежами, а словари собираются напрямую,
+    без моделей и полей DRF на каждое значение. Автор ожидается
+    подтянутым через select_related. Любое изменение полей
+    RecipeListRetrieveSerializer нужно повторить здесь.
+    """
+
+    class Meta:
+        list_serializer_class = RecipeFastListSerializer
+
+    def to_representation(self, recipe):
+        return self.render([recipe])[0]
+
+    def render(self, recipes):
+        request = self.context.get('request')
+        following = ()
+        if request is not None:
+            following = get_follow_graph(request)
+            following.prime(recipe.author_id for recipe in recipes)
+        tags, ingredients = load_recipe_relations(
+            [recipe.id for recipe in recipes]
+        )
+        return [
+            self.represent(
+                recipe, tags[recipe.id], ingredients[recipe.id], following
+            )
+            for recipe in recipes
+        ]
+
+    @staticmethod
+    def represent(recipe, tags, ingredients, following):
+        author = recipe.author
+        image = recipe.image
+        return {
+            'id': recipe.id,
+            'is_favorited': bool(recipe.is_favorited),
+            'is_in_shopping_cart': bool(recipe.is_in_shopping_cart),
+            'tags': tags,
+            'author': {
+                'email': author.email,
+                'id': author.id,
+                'username': author.username,
+                'first_name': author.first_name,
+                'last_name': author.last_name,
+                'is_subscribed': author.id in following,
+            },
+            'ingredients': ingredients,
+            'image': f'{MEDIA_URL}{image}',
+            'image_variants': image_variants(recipe),
+            'name': recipe.name,
+            'text': recipe.text,
+            'cooking_time': recipe.cooking_time,
+        }
 
 
 class RecipeCreateUpdateSerializer(serializers.ModelSerializer):
@@ -223,48 +393,118 @@ class RecipeCreateUpdateSerializer(serializers.ModelSerializer):
             'text', 'cooking_time', 'is_favorited', 'is_in_shopping_cart',
         )
 
-    @staticmethod
-    def create_ingredient(recipe, ingredients):
-
-        for order_dict in ingredients:
-            amount = order_dict.get('amount')
+    update_fields = ('name', 'text', 'cooking_time', 'image')
+
+    def save(self, **kwargs):
+        image = self.validated_data.get('image')
+        try:
+            return super().save(**kwargs)
+        finally:
+            # Временный файл декодированной картинки уже в хранилище.
+            if isinstance(image, TemporaryUploadedFile):
+                image.close()
+
+    def validate_ingredients(self, value):
+        """Проверка ингредиентов рецепта одним запросом.
+
+        Повторы одного ингредиента суммируются, все неизвестные id
+        возвращаются в одной ошибке.
+        """
+        amounts = {}
+        for order_dict in value:
             _id = order_dict.get('id')
-            ingredient = get_object_or_404(Ingredient, pk=_id)
-
-            IngredientAmount.objects.create(
-                recipe=recipe, ingredient=ingredient, amount=amount,
+            amount = order_dict.get('amount')
+            if amount is None:
+                raise serializers.ValidationError(
+                    f'Amount is required for ingredient {_id}.'
+                )
+            amounts[_id] = amounts.get(_id, 0) + amount
+
+        found = set(
+            Ingredient.objects.filter(
+                id__in=amounts
+            ).values_list('id', flat=True)
+        )
+        missing = sorted(set(amounts) - found)
+        if missing:
+            raise serializers.ValidationError(
+                f'Ingredients not found: {missing}.'
             )
 
+        return amounts
+
+    @staticmethod
+    def set_ingredients(recipe, amounts, created=False):
+        """Приводит ингредиенты рецепта к `amounts` {id ингредиента: кол-во}.
+
+        Пишутся только изменившиеся строки: новые добавляются одним
+        `bulk_create`, изменённые количества — одним `bulk_update`,
+        лишние удаляются одним `DELETE`. Разница переносится в списки
+        покупок пользователей, у которых рецепт в корзине; удалённые
+        строки вычитают сигналы удаления. `bulk_create` и `bulk_update`
+        сигналов не вызывают, поэтому версия рецептов меняется здесь же.
+        """
+        current = {}
+        to_delete = []
+        changes = dict(amounts)
+        if not created:
+            for row in recipe.ingredient_amounts.all():
+                if row.ingredient_id in amounts and (
+                        row.ingredient_id not in current):
+                    current[row.ingredient_id] = row
+                    changes[row.ingredient_id] -= row.amount
+                else:
+                    to_delete.append(row.id)
+
+        to_update = []
+        for _id, row in current.items():
+            if row.amount != amounts[_id]:
+                row.amount = amounts[_id]
+                to_update.append(row)
+
+        to_create = [
+            IngredientAmount(recipe=recipe, ingredient_id=_id, amount=amount)
+            for _id, amount in amounts.items() if _id not in current
+        ]
+
+        if to_delete:
+            IngredientAmount.objects.filter(id__in=to_delete).delete()
+        if to_update:
+            IngredientAmount.objects.bulk_update(to_update, ('amount',))
+        if to_create:
+            IngredientAmount.objects.bulk_create(to_create)
+        if to_delete or to_update or to_create:
+            bump_version('recipes')
+        if not created:
+            ShoppingListItem.objects.change_recipe(recipe.id, changes)
+
     def create(self, validated_data):
 
         tags = validated_data.pop('tags')
         ingredients = validated_data.pop('ingredients')
 
-        recipe, status = Recipe.objects.get_or_create(**validated_data)
-        recipe.tags.set(tags)
-
         with transaction.atomic():
-            self.create_ingredient(recipe, ingredients)
+            recipe, created = Recipe.objects.get_or_create(**validated_data)
+            recipe.tags.set(tags)
+            self.set_ingredients(recipe, ingredients, created=created)
 
         return recipe
 
     def update(self, instance, validated_data):
-        instance.image = validated_data.get('image', instance.image)
-
         tags = validated_data.pop('tags')
-        instance.tags.set(tags)
-
         ingredients = validated_data.pop('ingredients')
 
-        with transaction.atomic():
-            qs = instance.ingredient_amounts.all()
-            qs.delete()
+        fields = [
+            name for name in self.update_fields if name in validated_data
+        ]
+        for name in fields:
+            setattr(instance, name, validated_data[name])
 
-            self.create_ingredient(instance, ingredients)
-
-        for attr, value in validated_data.items():
-            setattr(instance, attr, value)
-
-        instance.save()
+        with transaction.atomic():
+            # Только изменяемые поля и до tags.set: маску тегов и счётчики
+            # пишут сигналы, полный save вернул бы их старые значения.
+            instance.save(update_fields=fields)
+            instance.tags.set(tags)
+            self.set_ingredients(instance, ingredients)
 
         return instance
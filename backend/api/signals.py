@@ -0,0 +1,34 @@
+from django.contrib.auth import get_user_model
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from recipes.versions import version_changed
+from rest_framework.authtoken.models import Token
+
+from .authentication import invalidate_tokens
+from .search import ingredient_index
+
+User = get_user_model()
+
+
+@receiver(post_delete, sender=Token)
+def invalidate_deleted_token(sender, instance, **kwargs):
+    invalidate_tokens([instance.key])
+
+
+@receiver(post_save, sender=User)
+def invalidate_user_tokens(sender, instance, created, update_fields,
+                           **kwargs):
+    # Вход пользователя обновляет только last_login.
+    if created or set(update_fields or ()) == {'last_login'}:
+        return
+    invalidate_tokens(
+        Token.objects.filter(user=instance).values_list('key', flat=True)
+    )
+
+
+@receiver(version_changed)
+def refresh_ingredient_index(sender, names, **kwargs):
+    # Процесс, где изменились ингредиенты, перестраивает индекс сразу,
+    # а не при следующем поиске.
+    if 'ingredients' in names:
+        ingredient_index.refresh()
@@ -3,7 +3,8 @@ from django.urls import include, path
 from rest_framework.routers import DefaultRouter, Route, SimpleRouter
 
 from .routers import ExtendedEndpointRouter
-from .views import (CartViewSet, DownloadCartView, FavoriteViewSet,
+from .views import (CartBulkView, CartViewSet, DownloadCartView,
+                    FavoriteBulkView, FavoriteViewSet, FollowBulkView,
                     FollowViewSet, IngredientViewSet, RecipeViewSet,
                     TagViewSet)
 
@@ -28,13 +29,25 @@ ext_router.register(
 urlpatterns = [
     path('users/subscriptions/',
          FollowViewSet.as_view({'get': 'list'}),
-         name='download_cart'
+         name='subscriptions'
          ),
 
     path('recipes/download_shopping_cart/',
          DownloadCartView.as_view(),
          name='download_cart'
          ),
+    path('recipes/shopping_cart/',
+         CartBulkView.as_view(),
+         name='carts-bulk'
+         ),
+    path('recipes/favorite/',
+         FavoriteBulkView.as_view(),
+         name='favorites-bulk'
+         ),
+    path('users/subscribe/',
+         FollowBulkView.as_view(),
+         name='subscriptions-bulk'
+         ),
     path('', include(ext_router.urls)),
     path('', include(router.urls)),
     path('auth/', include('djoser.urls.authtoken')),
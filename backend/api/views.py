@@ -1,49 +1,104 @@
-import djqscsv
-from django.db.models import Count, Exists, OuterRef, Q, Sum
+import hashlib
+from itertools import chain, islice
+
+from django.db import IntegrityError, transaction
+from django.db.models import Exists, OuterRef, Prefetch, Q, Subquery
 from django.db.models import Value as V
-from django.db.models.functions import Concat
+from django.db.models.functions import Coalesce
+from django.http import HttpResponse, StreamingHttpResponse
+from django.utils.cache import get_conditional_response
+from django.utils.http import quote_etag
 from django_filters.rest_framework import DjangoFilterBackend
 from recipes.models import (Cart, Favorite, Ingredient, IngredientAmount,
-                            Recipe, Tag, User)
+                            Recipe, ShoppingListItem, Tag, User)
+from rest_framework.exceptions import ValidationError
 from rest_framework.generics import get_object_or_404
 from rest_framework.permissions import (AllowAny, IsAuthenticated,
                                         IsAuthenticatedOrReadOnly)
+from rest_framework.response import Response
 from rest_framework.views import APIView
 from rest_framework.viewsets import ModelViewSet, ReadOnlyModelViewSet
-from users.models import Follow
+from users.models import AuthorStats, Follow
+
+from backend.settings import (INGREDIENT_SEARCH_INDEX,
+                              SHOPPING_LIST_BUFFER_ROWS,
+                              SHOPPING_LIST_CHUNK_SIZE)
 
+from .exporters import EXPORTERS
 from .filters import IngredientFilter, RecipeFilter
-from .mixins import CreateDeleteMixinSet, CreateListDeleteMixinSet
+from .mixins import (ConditionalGetMixin, CreateDeleteMixinSet,
+                     CreateListDeleteMixinSet, SharedPageCacheMixin)
 from .pagination import FoodgramPagination
-from .serializers import (CartSerializer, FavoriteSerializer, FollowSerializer,
+from .search import ingredient_index
+from .serializers import (BulkIdsSerializer, CartSerializer,
+                          FavoriteSerializer, FollowSerializer,
                           IngredientSerializer, RecipeCreateUpdateSerializer,
+                          RecipeListFastSerializer,
                           RecipeListRetrieveSerializer, TagSerializer)
 
 
 class DownloadCartView(APIView):
-    """Формирование и отправка списка покупок пользователю."""
+    """Формирование и отправка списка покупок пользователю.
+
+    Формат файла задаётся параметром `?format=csv|txt|json`. Небольшой
+    список отдаётся целиком с `Content-Length` и `ETag`, большой — потоком
+    по мере чтения строк из курсора.
+    """
     permission_classes = (IsAuthenticated,)
 
-    def get(self, request, *args, **kwargs):
-        qs = IngredientAmount.objects.filter(
-            recipe__carts__user__id=self.request.user.id
-        ).values(
-            'ingredient__name', 'ingredient__measurement_unit'
-        ).annotate(
-            check=V('▢'),
-            ingredient=Concat(
-                'ingredient__name',
-                V('('), 'ingredient__measurement_unit', V(')')),
-            amount=Sum('amount')
+    def perform_content_negotiation(self, request, force=False):
+        # Параметр `format` выбирает формат файла, а не рендерер DRF.
+        return super().perform_content_negotiation(request, force=True)
+
+    def get_rows(self):
+        rows = ShoppingListItem.objects.filter(
+            user__id=self.request.user.id, amount__gt=0
+        ).values_list(
+            'ingredient__name', 'ingredient__measurement_unit', 'amount'
         ).order_by(
             'ingredient__name', 'ingredient__measurement_unit'
-        )
+        ).iterator(chunk_size=SHOPPING_LIST_CHUNK_SIZE)
 
         return (
-            djqscsv.render_to_csv_response(
-                qs.values('check', 'ingredient', 'amount'))
+            {'check': '▢', 'ingredient': f'{name}({unit})', 'amount': amount}
+            for name, unit, amount in rows
         )
 
+    def get(self, request, *args, **kwargs):
+        fmt = request.query_params.get('format', 'csv')
+        if fmt not in EXPORTERS:
+            raise ValidationError(
+                {'format': [f'Choose one of: {", ".join(EXPORTERS)}.']}
+            )
+        exporter = EXPORTERS[fmt]()
+        content_type = f'{exporter.media_type}; charset=utf-8'
+
+        rows = self.get_rows()
+        head = list(islice(rows, SHOPPING_LIST_BUFFER_ROWS + 1))
+
+        if len(head) <= SHOPPING_LIST_BUFFER_ROWS:
+            content = ''.join(
+                exporter.render(head, SHOPPING_LIST_CHUNK_SIZE)
+            ).encode()
+            etag = quote_etag(hashlib.md5(content).hexdigest())
+            not_modified = get_conditional_response(request, etag=etag)
+            if not_modified is not None:
+                return not_modified
+
+            response = HttpResponse(content, content_type=content_type)
+            response['ETag'] = etag
+            response['Content-Length'] = len(content)
+        else:
+            response = StreamingHttpResponse(
+                exporter.render(chain(head, rows), SHOPPING_LIST_CHUNK_SIZE),
+                content_type=content_type
+            )
+
+        response['Content-Disposition'] = (
+            f'attachment; filename="shopping_list.{exporter.extension}"'
+        )
+        return response
+
 
 class CartViewSet(CreateDeleteMixinSet):
     queryset = None
@@ -89,14 +144,33 @@ class FollowViewSet(CreateListDeleteMixinSet):
     serializer_class = FollowSerializer
     permission_classes = (IsAuthenticatedOrReadOnly,)
     pagination_class = FoodgramPagination
+    keyset_ordering = ('-id',)
+    use_replica = True
 
     def get_queryset(self):
         user = self.request.user
 
+        # Последние рецепты всех авторов страницы одним запросом.
+        recipes = Recipe.objects.only(
+            'id', 'author_id', 'name', 'image', 'cooking_time'
+        )
+        recipes_limit = self.request.query_params.get('recipes_limit', '')
+        if recipes_limit.isdigit():
+            latest = Recipe.objects.filter(
+                author=OuterRef('author')
+            ).order_by('-pub_date', '-id').values('id')[:int(recipes_limit)]
+            recipes = recipes.filter(id__in=Subquery(latest))
+
         return (
-            user.follower.annotate(
-                recipes_count=Count('author__recipe'),
+            user.follower.select_related('author').annotate(
+                recipes_count=Coalesce('author__stats__recipes_count', 0),
                 is_subscribed=V(True)
+            ).order_by(*self.keyset_ordering).prefetch_related(
+                Prefetch(
+                    'author__recipe',
+                    queryset=recipes,
+                    to_attr='latest_recipes'
+                )
             )
         )
 
@@ -118,29 +192,214 @@ class FollowViewSet(CreateListDeleteMixinSet):
         return instance
 
 
-class RecipeViewSet(ModelViewSet):
+class BulkRelationView(APIView):
+    """Пакетное добавление и удаление связей пользователя с объектами.
+
+    Тело запроса — `{"ids": [...]}`: POST добавляет недостающие связи
+    одним INSERT, DELETE удаляет существующие через `QuerySet.delete()`.
+    В ответе статус каждого id: `added`, `exists`, `removed`, `absent`
+    или `not_found`. После добавления счётчики пересчитываются в
+    `changed`, при удалении их обновляют сигналы моделей.
+    """
+    permission_classes = (IsAuthenticated,)
+    # Связь (Cart, Favorite, Follow), её поле объекта и модель объекта.
+    model = None
+    target_field = None
+    target_model = None
+
+    def get_ids(self):
+        serializer = BulkIdsSerializer(data=self.request.data)
+        serializer.is_valid(raise_exception=True)
+        return list(dict.fromkeys(serializer.validated_data['ids']))
+
+    def get_targets(self, ids):
+        """`{id: связь уже есть}` для существующих объектов из `ids`."""
+        present = self.model.objects.filter(
+            user=self.request.user, **{self.target_field: OuterRef('pk')}
+        )
+        return dict(
+            self.target_model.objects.filter(id__in=ids).annotate(
+                present=Exists(present)
+            ).values_list('id', 'present')
+        )
+
+    def reject(self, target_id):
+        """Статус для объекта, связь с которым создать нельзя."""
+        return None
+
+    def changed(self, target_ids):
+        """Обновляет зависимые данные после добавления связей."""
+
+    @staticmethod
+    def results(ids, statuses):
+        return Response({'results': [
+            {'id': target_id, 'status': statuses[target_id]}
+            for target_id in ids
+        ]})
+
+    def relations(self, target_ids):
+        return [
+            self.model(
+                user=self.request.user,
+                **{f'{self.target_field}_id': target_id}
+            )
+            for target_id in target_ids
+        ]
+
+    def insert(self, target_ids, statuses):
+        """Создаёт связи одним INSERT; возвращает id созданных."""
+        try:
+            with transaction.atomic():
+                self.model.objects.bulk_create(self.relations(target_ids))
+        except IntegrityError:
+            # Часть связей успел создать параллельный запрос: они
+            # вставляются по одной, чтобы статус каждой был точным.
+            for target_id in target_ids:
+                statuses[target_id] = self.insert_one(target_id)
+            return [
+                target_id for target_id in target_ids
+                if statuses[target_id] == 'added'
+            ]
+        return target_ids
+
+    def insert_one(self, target_id):
+        """Статус связи, которую вставка пачкой создать не смогла."""
+        try:
+            with transaction.atomic():
+                self.model.objects.bulk_create(self.relations([target_id]))
+        except IntegrityError:
+            exists = self.model.objects.filter(
+                user=self.request.user,
+                **{f'{self.target_field}_id': target_id}
+            ).exists()
+            return 'exists' if exists else 'not_found'
+        return 'added'
+
+    def post(self, request, *args, **kwargs):
+        ids = self.get_ids()
+        with transaction.atomic():
+            targets = self.get_targets(ids)
+            statuses = {}
+            for target_id in ids:
+                if target_id not in targets:
+                    statuses[target_id] = 'not_found'
+                elif targets[target_id]:
+                    statuses[target_id] = 'exists'
+                else:
+                    statuses[target_id] = self.reject(target_id) or 'added'
+            added = [
+                target_id for target_id in ids
+                if statuses[target_id] == 'added'
+            ]
+            if added:
+                added = self.insert(added, statuses)
+            if added:
+                self.changed(added)
+        return self.results(ids, statuses)
+
+    def delete(self, request, *args, **kwargs):
+        ids = self.get_ids()
+        with transaction.atomic():
+            targets = self.get_targets(ids)
+            relations = self.model.objects.filter(
+                user=request.user, **{f'{self.target_field}_id__in': ids}
+            )
+            rows = dict(relations.select_for_update().values_list(
+                'id', f'{self.target_field}_id'
+            ))
+            if rows:
+                # delete(), а не одним DELETE без выборки: сигналы моделей
+                # обновляют счётчики и списки покупок.
+                self.model.objects.filter(id__in=rows).delete()
+            removed = set(rows.values())
+        return self.results(ids, {
+            target_id: (
+                'not_found' if target_id not in targets
+                else 'removed' if target_id in removed else 'absent'
+            )
+            for target_id in ids
+        })
+
+
+class CartBulkView(BulkRelationView):
+    model = Cart
+    target_field = 'recipe'
+    target_model = Recipe
+
+    def changed(self, target_ids):
+        Recipe.objects.recount(target_ids)
+        ShoppingListItem.objects.add_recipes(self.request.user.id, target_ids)
+
+
+class FavoriteBulkView(BulkRelationView):
+    model = Favorite
+    target_field = 'recipe'
+    target_model = Recipe
+
+    def changed(self, target_ids):
+        Recipe.objects.recount(target_ids)
+
+
+class FollowBulkView(BulkRelationView):
+    model = Follow
+    target_field = 'author'
+    target_model = User
+
+    def reject(self, target_id):
+        if target_id == self.request.user.id:
+            return 'self'
+        return None
+
+    def changed(self, target_ids):
+        AuthorStats.objects.recount(target_ids)
+
+
+class RecipeViewSet(SharedPageCacheMixin, ModelViewSet):
     serializer_class = RecipeCreateUpdateSerializer
     permission_classes = (IsAuthenticatedOrReadOnly, )
     filter_backends = (DjangoFilterBackend,)
     filterset_class = RecipeFilter
     pagination_class = FoodgramPagination
+    keyset_ordering = ('-pub_date', '-id')
+    use_replica = True
+    # Чтение через RecipeListFastSerializer; False — обычный сериализатор.
+    fast_read = True
 
     def get_queryset(self):
+        user_id = self.request.user.id
         is_in_shopping_cart = Cart.objects.filter(
-            user__id=self.request.user.id, recipe=OuterRef('id')
+            user__id=user_id, recipe=OuterRef('id')
         )
         is_favorited = Favorite.objects.filter(
-            user__id=self.request.user.id, recipe=OuterRef('id')
+            user__id=user_id, recipe=OuterRef('id')
         )
-        return (
-            Recipe.objects.annotate(
-                is_favorited=Exists(is_favorited),
-                is_in_shopping_cart=Exists(is_in_shopping_cart)
-            ).order_by('-pub_date')
+        queryset = Recipe.objects.annotate(
+            is_favorited=Exists(is_favorited),
+            is_in_shopping_cart=Exists(is_in_shopping_cart)
+        ).order_by(*self.keyset_ordering)
+
+        if self.action not in ('list', 'retrieve'):
+            return queryset
+
+        # Все вложенные данные подтягиваются фиксированным числом запросов
+        # независимо от размера страницы; подписки на авторов — одним
+        # запросом через граф подписок в сериализаторе. Быстрый
+        # сериализатор сам читает теги и ингредиенты кортежами.
+        queryset = queryset.select_related('author')
+        if self.fast_read:
+            return queryset
+        return queryset.prefetch_related(
+            'tags',
+            Prefetch(
+                'ingredient_amounts',
+                queryset=IngredientAmount.objects.select_related('ingredient')
+            ),
         )
 
     def get_serializer_class(self):
         if self.action in ('list', 'retrieve'):
+            if self.fast_read:
+                return RecipeListFastSerializer
             return RecipeListRetrieveSerializer
 
         return RecipeCreateUpdateSerializer
@@ -149,7 +408,13 @@ class RecipeViewSet(ModelViewSet):
         serializer.save(author=self.request.user)
 
 
-class IngredientViewSet(ReadOnlyModelViewSet):
+class IngredientViewSet(ConditionalGetMixin, ReadOnlyModelViewSet):
+    """Представление для ингредиентов.
+
+    Поиск по `?name=` обслуживается индексом в памяти без запросов к БД.
+    """
+    version_name = 'ingredients'
+    use_replica = True
     queryset = Ingredient.objects.all()
     serializer_class = IngredientSerializer
     permission_classes = (AllowAny,)
@@ -157,9 +422,21 @@ class IngredientViewSet(ReadOnlyModelViewSet):
     filter_backends = (DjangoFilterBackend,)
     filterset_class = IngredientFilter
 
+    def list(self, request, *args, **kwargs):
+        if not request.query_params.get('name') or not INGREDIENT_SEARCH_INDEX:
+            return super().list(request, *args, **kwargs)
+
+        return self.conditional(self.search, request, *args, **kwargs)
+
+    def search(self, request, *args, **kwargs):
+        name = request.query_params['name']
+        return Response(ingredient_index.get().search(name))
+
 
-class TagViewSet(ReadOnlyModelViewSet):
+class TagViewSet(ConditionalGetMixin, ReadOnlyModelViewSet):
     """Представление для тегов."""
+    version_name = 'tags'
+    use_replica = True
     queryset = Tag.objects.all()
     serializer_class = TagSerializer
     permission_classes = (AllowAny,)
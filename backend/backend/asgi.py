@@ -5,3 +5,11 @@ from django.core.asgi import get_asgi_application
 os.environ.setdefault("DJANGO_SETTINGS_MODULE", "backend.settings")
 
 application = get_asgi_application()
+
+# Модели доступны только после настройки Django.
+from api.search import warm_in_background  # noqa: E402
+
+from backend.settings import INGREDIENT_SEARCH_INDEX  # noqa: E402
+
+if INGREDIENT_SEARCH_INDEX:
+    warm_in_background()
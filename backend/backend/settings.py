@@ -1,3 +1,4 @@
+import ipaddress
 import os
 from pathlib import Path
 
@@ -36,7 +37,6 @@ INSTALLED_APPS = [
     "django.contrib.sessions",
     "django.contrib.messages",
     "django.contrib.staticfiles",
-    'debug_toolbar',
     'rest_framework.authtoken',
     'rest_framework',
     'corsheaders',
@@ -49,6 +49,8 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'core.middleware.PerformanceMiddleware',
+    'core.middleware.ReplicaRoutingMiddleware',
     "django.middleware.security.SecurityMiddleware",
     "django.contrib.sessions.middleware.SessionMiddleware",
     "corsheaders.middleware.CorsMiddleware",
@@ -57,9 +59,32 @@ MIDDLEWARE = [
     "django.contrib.auth.middleware.AuthenticationMiddleware",
     "django.contrib.messages.middleware.MessageMiddleware",
     "django.middleware.clickjacking.XFrameOptionsMiddleware",
-    'debug_toolbar.middleware.DebugToolbarMiddleware',
 ]
 
+# debug_toolbar только для разработки: под нагрузкой он сам становится
+# главным потребителем времени.
+if DEBUG:
+    INSTALLED_APPS.append('debug_toolbar')
+    MIDDLEWARE.append('debug_toolbar.middleware.DebugToolbarMiddleware')
+
+# Заголовок Server-Timing с разбивкой времени запроса (БД, код вью,
+# рендеринг). Метрики для Prometheus отдаются по /metrics только адресам
+# из METRICS_ALLOWED_NETWORKS.
+SERVER_TIMING = os.getenv('SERVER_TIMING', '1') == '1'
+METRICS_ALLOWED_NETWORKS = [
+    ipaddress.ip_network(network.strip())
+    for network in os.getenv(
+        'METRICS_ALLOWED_NETWORKS',
+        '127.0.0.0/8,::1/128,10.0.0.0/8,172.16.0.0/12,192.168.0.0/16'
+    ).split(',')
+]
+
+# Журнал медленных запросов с планами (core.SlowQuery): порог в мс
+# (0 — журнал выключен), доля сохраняемых запросов и размер журнала.
+SLOW_QUERY_THRESHOLD = float(os.getenv('SLOW_QUERY_THRESHOLD', 500))
+SLOW_QUERY_SAMPLE_RATE = float(os.getenv('SLOW_QUERY_SAMPLE_RATE', 0.01))
+SLOW_QUERY_LOG_SIZE = int(os.getenv('SLOW_QUERY_LOG_SIZE', 1000))
+
 ROOT_URLCONF = "backend.urls"
 
 TEMPLATES_DIR = os.path.join(BASE_DIR, 'templates')
@@ -89,9 +114,58 @@ DATABASES = {
         'USER': os.getenv('POSTGRES_USER'),
         'PASSWORD': os.getenv('POSTGRES_PASSWORD'),
         'HOST': os.getenv('DB_HOST'),
-        'PORT': os.getenv('DB_PORT')
+        'PORT': os.getenv('DB_PORT'),
+        # Время жизни соединения в секундах.
+        'CONN_MAX_AGE': int(os.getenv('DB_CONN_MAX_AGE', 0)),
+    }
+}
+
+# Реплики для чтения (core.db_routers): хосты и/или имена баз через
+# запятую, остальные параметры как у `default`. Локально — копия файла
+# SQLite или вторая база PostgreSQL: DB_REPLICA_NAMES=/tmp/replica.sqlite3.
+# После записи клиент читает с основной базы REPLICA_STICKY_SECONDS секунд.
+# Это закрепление хранится в CACHES, поэтому с репликами нужен общий для
+# процессов кэш (Redis, memcached), иначе `manage.py check` и `migrate`
+# завершатся ошибкой core.E001.
+replica_hosts = [
+    host for host in os.getenv('DB_REPLICA_HOSTS', '').split(',') if host
+]
+replica_names = [
+    name for name in os.getenv('DB_REPLICA_NAMES', '').split(',') if name
+]
+REPLICA_DATABASES = []
+for number in range(max(len(replica_hosts), len(replica_names))):
+    alias = f'replica{number + 1}'
+    DATABASES[alias] = {
+        **DATABASES['default'],
+        'TEST': {'MIRROR': 'default'},
+    }
+    if number < len(replica_hosts):
+        DATABASES[alias]['HOST'] = replica_hosts[number]
+    if number < len(replica_names):
+        DATABASES[alias]['NAME'] = replica_names[number]
+    REPLICA_DATABASES.append(alias)
+DATABASE_ROUTERS = ['core.db_routers.ReplicaRouter']
+REPLICA_STICKY_SECONDS = int(os.getenv('REPLICA_STICKY_SECONDS', 10))
+
+# Версии данных и кэши страниц. При нескольких процессах нужен общий кэш
+# (например, memcached: CACHE_BACKEND=django.core.cache.backends.memcached.
+# PyMemcacheCache): с LocMemCache по умолчанию каждый процесс узнаёт о
+# чужих изменениях только через VERSION_CACHE_TIMEOUT секунд, когда
+# перечитывает версии данных из базы.
+CACHES = {
+    'default': {
+        'BACKEND': os.getenv(
+            'CACHE_BACKEND', 'django.core.cache.backends.locmem.LocMemCache'
+        ),
+        'LOCATION': os.getenv('CACHE_LOCATION', ''),
     }
 }
+VERSION_CACHE_TIMEOUT = int(os.getenv('VERSION_CACHE_TIMEOUT', 60))
+
+# Время жизни общего для всех пользователей кэша страниц рецептов, 0 —
+# кэш отключён.
+RECIPE_CACHE_TIMEOUT = int(os.getenv('RECIPE_CACHE_TIMEOUT', 300))
 
 
 AUTH_PASSWORD_VALIDATORS = [
@@ -119,6 +193,26 @@ STATIC_ROOT = os.path.join(BASE_DIR, 'static')
 MEDIA_URL = '/media/'
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
 
+# Предельный размер загружаемой картинки рецепта в байтах.
+RECIPE_IMAGE_MAX_SIZE = int(
+    os.getenv('RECIPE_IMAGE_MAX_SIZE', 10 * 1024 * 1024)
+)
+
+# Фоновые задачи: `database` — очередь в таблице core_job, которую
+# разбирает `manage.py run_jobs`; `thread` — пул потоков в процессе
+# веб-сервера; `auto` — `thread` на SQLite, иначе `database`.
+JOB_BACKEND = os.getenv('JOB_BACKEND', 'auto')
+JOB_THREADS = int(os.getenv('JOB_THREADS', 2))
+JOB_MAX_ATTEMPTS = int(os.getenv('JOB_MAX_ATTEMPTS', 5))
+# Задержка перед повтором: JOB_RETRY_DELAY * 2 ** (попытка - 1) секунд,
+# не больше JOB_RETRY_MAX_DELAY.
+JOB_RETRY_DELAY = int(os.getenv('JOB_RETRY_DELAY', 10))
+JOB_RETRY_MAX_DELAY = int(os.getenv('JOB_RETRY_MAX_DELAY', 3600))
+# Воркер продлевает блокировку выполняемых задач каждые
+# JOB_LOCK_TIMEOUT / 4 секунд; задача, блокировка которой не продлевалась
+# дольше JOB_LOCK_TIMEOUT, считается брошенной и возвращается в очередь.
+JOB_LOCK_TIMEOUT = int(os.getenv('JOB_LOCK_TIMEOUT', 600))
+
 DEFAULT_AUTO_FIELD = "django.db.models.BigAutoField"
 
 REST_FRAMEWORK = {
@@ -126,12 +220,41 @@ REST_FRAMEWORK = {
         'rest_framework.permissions.IsAuthenticated',
     ],
     'DEFAULT_AUTHENTICATION_CLASSES': [
-        'rest_framework.authentication.TokenAuthentication',
+        'api.authentication.CachedTokenAuthentication',
     ],
 }
 
+# Кеш токенов авторизации: `shared` — в CACHES, только если он общий для
+# процессов (с LocMemCache по умолчанию кеш токенов не используется);
+# `local` — LRU в памяти процесса, быстрее, но удаление токена видно
+# только процессу, где оно произошло; `none` — без кеша.
+AUTH_TOKEN_CACHE = os.getenv('AUTH_TOKEN_CACHE', 'shared')
+AUTH_TOKEN_CACHE_TIMEOUT = int(os.getenv('AUTH_TOKEN_CACHE_TIMEOUT', 300))
+AUTH_TOKEN_CACHE_SIZE = int(os.getenv('AUTH_TOKEN_CACHE_SIZE', 10000))
+
 # AUTH_USER_MODEL = 'recipe.User'
 
+# Выгрузка списка покупок: размер пачки строк при чтении курсора и
+# максимальный размер списка, который отдаётся целиком с ETag.
+SHOPPING_LIST_CHUNK_SIZE = int(os.getenv('SHOPPING_LIST_CHUNK_SIZE', 500))
+SHOPPING_LIST_BUFFER_ROWS = int(os.getenv('SHOPPING_LIST_BUFFER_ROWS', 1000))
+
+# Максимум id в одном запросе пакетных корзины, избранного и подписок.
+BULK_MAX_IDS = int(os.getenv('BULK_MAX_IDS', 500))
+
+# Поиск ингредиентов по индексу в памяти процесса: время жизни индекса в
+# секундах и минимальная триграммная похожесть для нечёткого поиска.
+# Запросы короче INGREDIENT_SEARCH_MIN_LENGTH символов ищутся только с
+# начала названия, без перебора всех названий.
+INGREDIENT_SEARCH_INDEX = os.getenv('INGREDIENT_SEARCH_INDEX', '1') == '1'
+INGREDIENT_INDEX_TTL = int(os.getenv('INGREDIENT_INDEX_TTL', 300))
+INGREDIENT_SEARCH_MIN_LENGTH = int(
+    os.getenv('INGREDIENT_SEARCH_MIN_LENGTH', 2)
+)
+INGREDIENT_SEARCH_SIMILARITY = float(
+    os.getenv('INGREDIENT_SEARCH_SIMILARITY', 0.3)
+)
+
 DJOSER = {
     'LOGIN_FIELD': 'email',
     'ACTIVATION_URL': False,
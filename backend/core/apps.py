@@ -1,6 +1,17 @@
 from django.apps import AppConfig
+from django.core.signals import request_finished
+from django.db.backends.signals import connection_created
 
 
 class CoreConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'core'
+
+    def ready(self):
+        from . import checks, middleware, slow_queries  # noqa: F401
+
+        # Замер запросов стоит внутри журнала: время записи в журнал
+        # не попадает в длительность запроса.
+        connection_created.connect(slow_queries.install)
+        connection_created.connect(middleware.install)
+        request_finished.connect(slow_queries.flush_pending)
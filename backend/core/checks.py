@@ -0,0 +1,30 @@
+"""Проверки настроек для `manage.py check`, `migrate` и `runserver`."""
+from django.core.checks import Error, register
+
+from backend.settings import CACHES, REPLICA_DATABASES
+
+# Кэши, которые каждый процесс держит у себя.
+PROCESS_CACHES = (
+    'django.core.cache.backends.dummy.DummyCache',
+    'django.core.cache.backends.locmem.LocMemCache',
+)
+
+
+def has_shared_cache():
+    """Общий ли для процессов кэш по умолчанию."""
+    return CACHES['default']['BACKEND'] not in PROCESS_CACHES
+
+
+@register()
+def check_replica_cache(app_configs, **kwargs):
+    # Закрепление клиента за основной базой после записи хранится в
+    # кэше: с кэшем процесса следующий запрос клиента, попавший в другой
+    # процесс, прочитал бы с реплики устаревшие данные.
+    if REPLICA_DATABASES and not has_shared_cache():
+        return [Error(
+            'Read replicas require a cache shared by all processes.',
+            hint='Set CACHE_BACKEND and CACHE_LOCATION, for example to '
+                 'Redis or memcached.',
+            id='core.E001',
+        )]
+    return []
@@ -0,0 +1,19 @@
+from django.db.models import Count, IntegerField, Subquery
+from django.db.models.functions import Coalesce
+
+
+def count_subquery(queryset, field):
+    """Количество строк `queryset`, сгруппированных по `field`.
+
+    Используется как коррелированный подзапрос вместо JOIN + GROUP BY, например
+    `count_subquery(Cart.objects.filter(recipe=OuterRef('pk')), 'recipe')`.
+    """
+    return Coalesce(
+        Subquery(
+            queryset.order_by().values(field).annotate(
+                count=Count('pk')
+            ).values('count'),
+            output_field=IntegerField()
+        ),
+        0
+    )
@@ -0,0 +1,123 @@
+"""Чтение с реплик БД.
+
+Безопасные запросы (GET, HEAD, OPTIONS) к вью с `use_replica = True`
+читают с одной из REPLICA_DATABASES, выбранной на весь запрос. Клиент,
+который только что записывал, REPLICA_STICKY_SECONDS читает с основной
+базы и сразу видит свои изменения; клиент определяется по заголовку
+Authorization. Запись, миграции и запросы вне HTTP-запросов (команды,
+фоновые задачи) идут в `default`.
+
+Общий кэш страниц учитывает то же окно: закреплённый клиент его не
+читает, а прочитанное с реплики не кладётся в кэш, пока версия данных
+моложе REPLICA_STICKY_SECONDS — реплика могла ещё не получить изменение.
+"""
+import hashlib
+import random
+import time
+from contextvars import ContextVar
+
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS
+
+from backend.settings import REPLICA_DATABASES, REPLICA_STICKY_SECONDS
+
+SAFE_METHODS = ('GET', 'HEAD', 'OPTIONS')
+# Свежий токен после входа может ещё не дойти до реплики, а устаревшая
+# версия данных попала бы в кэш.
+PRIMARY_MODELS = ('authtoken.token', 'recipes.dataversion')
+
+# Маршрутизация текущего запроса, её ставит ReplicaRoutingMiddleware.
+# Контекст передаётся и в потоки sync_to_async асинхронных вью.
+current_routing = ContextVar('current_routing', default=None)
+
+
+def use_replica(view):
+    """Разрешает функции-вью читать с реплик."""
+    view.use_replica = True
+    return view
+
+
+def pin_key(request):
+    header = request.META.get('HTTP_AUTHORIZATION')
+    if not header:
+        return None
+    return f'replica-pin:{hashlib.sha256(header.encode()).hexdigest()}'
+
+
+def pin_to_primary(request):
+    """Закрепляет клиента запроса за основной базой после записи."""
+    key = pin_key(request)
+    if key is not None and REPLICA_STICKY_SECONDS:
+        cache.set(key, True, REPLICA_STICKY_SECONDS)
+
+
+def is_pinned():
+    """Закреплён ли клиент текущего запроса за основной базой."""
+    routing = current_routing.get()
+    return routing is not None and routing.is_pinned()
+
+
+def can_cache_read(modified):
+    """Можно ли положить в общий кэш данные, прочитанные в этом запросе.
+
+    `modified` — время изменения версии данных в секундах.
+    """
+    routing = current_routing.get()
+    if routing is None:
+        return True
+    if routing.is_pinned():
+        return False
+    if routing.alias in (None, DEFAULT_DB_ALIAS):
+        return True
+    return time.time() - modified >= REPLICA_STICKY_SECONDS
+
+
+class RequestRouting:
+    def __init__(self, request):
+        self.request = request
+        self.alias = None
+        self.pinned = None
+
+    def is_pinned(self):
+        if self.pinned is None:
+            key = pin_key(self.request)
+            self.pinned = key is not None and bool(cache.get(key))
+        return self.pinned
+
+    def get_alias(self):
+        """База для чтения, выбирается при первом запросе к БД после
+        разрешения URL."""
+        if self.alias is not None:
+            return self.alias
+        match = self.request.resolver_match
+        if match is None:
+            return DEFAULT_DB_ALIAS
+        self.alias = self.choose(getattr(match.func, 'cls', match.func))
+        return self.alias
+
+    def choose(self, view):
+        request = self.request
+        if (request.method not in SAFE_METHODS
+                or not getattr(view, 'use_replica', False)):
+            return DEFAULT_DB_ALIAS
+        if self.is_pinned():
+            return DEFAULT_DB_ALIAS
+        return random.choice(REPLICA_DATABASES)
+
+
+class ReplicaRouter:
+    def db_for_read(self, model, **hints):
+        routing = current_routing.get()
+        if routing is None or model._meta.label_lower in PRIMARY_MODELS:
+            return DEFAULT_DB_ALIAS
+        return routing.get_alias()
+
+    def db_for_write(self, model, **hints):
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        # Реплики — копии основной базы.
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return db == DEFAULT_DB_ALIAS
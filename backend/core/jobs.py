@@ -0,0 +1,168 @@
+"""Фоновые задачи без внешнего брокера.
+
+Функция-задача регистрируется декоратором `job` и ставится в очередь
+через `enqueue(func, **kwargs)`; аргументы должны сериализоваться в JSON.
+
+* `database` — задача пишется строкой в `core_job` в той же транзакции,
+  что и данные запроса, а `manage.py run_jobs` забирает строки через
+  `SELECT ... FOR UPDATE SKIP LOCKED`, повторяет упавшие с нарастающей
+  задержкой и после `max_attempts` попыток переводит в `dead`. Пока
+  задача выполняется, воркер обновляет `locked_at`; в очередь
+  возвращаются только задачи, отметка которых старше JOB_LOCK_TIMEOUT,
+  то есть задачи остановившихся воркеров;
+* `thread` — задача выполняется пулом потоков текущего процесса после
+  коммита. Подходит для SQLite и разработки: очередь живёт в памяти.
+"""
+import logging
+import threading
+import traceback
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+
+from django.db import close_old_connections, connection, transaction
+from django.db.models import F
+from django.utils import timezone
+
+from backend.settings import (JOB_BACKEND, JOB_LOCK_TIMEOUT, JOB_MAX_ATTEMPTS,
+                              JOB_RETRY_DELAY, JOB_RETRY_MAX_DELAY,
+                              JOB_THREADS)
+
+from .models import Job
+
+logger = logging.getLogger(__name__)
+
+registry = {}
+
+
+def job(func):
+    """Регистрирует функцию как фоновую задачу."""
+    func.job_name = f'{func.__module__}.{func.__qualname__}'
+    registry[func.job_name] = func
+    return func
+
+
+def get_backend():
+    if JOB_BACKEND != 'auto':
+        return JOB_BACKEND
+    return 'thread' if connection.vendor == 'sqlite' else 'database'
+
+
+def retry_delay(attempt):
+    return min(JOB_RETRY_DELAY * 2 ** (attempt - 1), JOB_RETRY_MAX_DELAY)
+
+
+def enqueue(func, delay=0, **payload):
+    """Ставит задачу `func` в очередь с аргументами `payload`."""
+    if get_backend() == 'database':
+        Job.objects.create(
+            name=func.job_name,
+            payload=payload,
+            max_attempts=JOB_MAX_ATTEMPTS,
+            run_at=timezone.now() + timedelta(seconds=delay)
+        )
+        return
+    transaction.on_commit(
+        lambda: local_queue.submit(func.job_name, payload, delay)
+    )
+
+
+class LocalQueue:
+    """Очередь в пуле потоков текущего процесса с повторами."""
+
+    def __init__(self, threads):
+        self.executor = ThreadPoolExecutor(
+            max_workers=threads, thread_name_prefix='jobs'
+        )
+
+    def submit(self, name, payload, delay=0, attempt=1):
+        if delay:
+            timer = threading.Timer(
+                delay, self.submit, (name, payload, 0, attempt)
+            )
+            timer.daemon = True
+            timer.start()
+            return
+        self.executor.submit(self.run, name, payload, attempt)
+
+    def run(self, name, payload, attempt):
+        try:
+            registry[name](**payload)
+        except Exception:
+            if attempt >= JOB_MAX_ATTEMPTS:
+                logger.exception('Job %s failed, giving up', name)
+                return
+            logger.warning('Job %s failed, retrying', name, exc_info=True)
+            self.submit(name, payload, retry_delay(attempt), attempt + 1)
+        finally:
+            close_old_connections()
+
+
+local_queue = LocalQueue(JOB_THREADS)
+
+
+def claim(worker, limit):
+    """Забирает до `limit` готовых задач, пропуская занятые другими."""
+    now = timezone.now()
+    with transaction.atomic():
+        jobs = list(
+            Job.objects.select_for_update(skip_locked=True).filter(
+                status=Job.QUEUED, run_at__lte=now
+            )[:limit]
+        )
+        Job.objects.filter(pk__in=[job.pk for job in jobs]).update(
+            status=Job.RUNNING,
+            locked_by=worker,
+            locked_at=now,
+            attempts=F('attempts') + 1
+        )
+    for job in jobs:
+        job.attempts += 1
+        job.locked_by = worker
+    return jobs
+
+
+def heartbeat(worker):
+    """Продлевает блокировку задач, которые выполняет `worker`."""
+    return Job.objects.filter(status=Job.RUNNING, locked_by=worker).update(
+        locked_at=timezone.now()
+    )
+
+
+def execute(job):
+    """Выполняет задачу; удаляет её при успехе, иначе планирует повтор."""
+    func = registry.get(job.name)
+    # Задачу, возвращённую в очередь и взятую другим воркером, не трогаем.
+    claimed = Job.objects.filter(pk=job.pk, locked_by=job.locked_by)
+    try:
+        if func is None:
+            raise LookupError(f'Unknown job {job.name}.')
+        func(**job.payload)
+    except Exception:
+        error = traceback.format_exc()
+        logger.warning('Job %s failed', job, exc_info=True)
+        if func is None or job.attempts >= job.max_attempts:
+            changes = {'status': Job.DEAD}
+        else:
+            changes = {
+                'status': Job.QUEUED,
+                'run_at': timezone.now() + timedelta(
+                    seconds=retry_delay(job.attempts)
+                ),
+            }
+        claimed.update(
+            last_error=error, locked_by='', locked_at=None, **changes
+        )
+        return False
+    else:
+        claimed.delete()
+        return True
+    finally:
+        close_old_connections()
+
+
+def release_stale():
+    """Возвращает в очередь задачи упавших воркеров."""
+    expired = timezone.now() - timedelta(seconds=JOB_LOCK_TIMEOUT)
+    return Job.objects.filter(
+        status=Job.RUNNING, locked_at__lt=expired
+    ).update(status=Job.QUEUED, locked_by='', locked_at=None)
@@ -0,0 +1,88 @@
+import json
+
+from core.models import SlowQuery
+from core.slow_queries import explain
+from django.core.management.base import BaseCommand
+from django.db import DatabaseError, connections
+from django.db.utils import ConnectionDoesNotExist
+
+
+class Command(BaseCommand):
+    help = 'Выводит журнал медленных запросов с планами выполнения.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--limit', type=int, default=20,
+            help='Number of the latest entries to show.'
+        )
+        parser.add_argument(
+            '--min-duration', type=float, default=0,
+            help='Show only queries slower than this, in milliseconds.'
+        )
+        parser.add_argument(
+            '--view', help='Show only queries of this view (URL name).'
+        )
+        parser.add_argument(
+            '--json', action='store_true',
+            help='Print entries as JSON lines.'
+        )
+        parser.add_argument(
+            '--analyze', action='store_true',
+            help='Re-run the shown SELECT queries with EXPLAIN ANALYZE and '
+                 'store the new plans (PostgreSQL).'
+        )
+        parser.add_argument(
+            '--clear', action='store_true',
+            help='Delete the shown entries afterwards.'
+        )
+
+    @staticmethod
+    def analyze(entry):
+        """План с ANALYZE, построенный вне запроса пользователя."""
+        try:
+            entry.plan = explain(
+                connections[entry.database], entry.sql,
+                json.loads(entry.params), analyze=True
+            )
+        except (ConnectionDoesNotExist, DatabaseError, ValueError) as error:
+            entry.plan = f'EXPLAIN ANALYZE failed: {error}'
+        entry.save(update_fields=('plan', ))
+
+    def handle(self, *args, **options):
+        entries = SlowQuery.objects.filter(
+            duration__gte=options['min_duration']
+        )
+        if options['view']:
+            entries = entries.filter(view=options['view'])
+        entries = list(entries[:options['limit']])
+
+        for entry in entries:
+            if options['analyze']:
+                self.analyze(entry)
+            if options['json']:
+                self.stdout.write(json.dumps({
+                    'id': entry.id,
+                    'created_at': entry.created_at.isoformat(),
+                    'duration': entry.duration,
+                    'database': entry.database,
+                    'view': entry.view,
+                    'origin': entry.origin,
+                    'sql': entry.sql,
+                    'params': entry.params,
+                    'plan': entry.plan,
+                }, ensure_ascii=False))
+                continue
+            self.stdout.write(self.style.WARNING(
+                f'#{entry.id} {entry.created_at:%Y-%m-%d %H:%M:%S} '
+                f'{entry.duration:.1f} ms [{entry.database}] '
+                f'{entry.view or "-"} {entry.origin}'
+            ))
+            self.stdout.write(entry.sql)
+            self.stdout.write(f'params: {entry.params}')
+            self.stdout.write(entry.plan + '\n')
+
+        if options['clear'] and entries:
+            SlowQuery.objects.filter(
+                id__in=[entry.id for entry in entries]
+            ).delete()
+            self.stdout.write(f'Deleted {len(entries)} entries.')
@@ -0,0 +1,82 @@
+import os
+import signal
+import socket
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+from core.jobs import claim, execute, heartbeat, release_stale
+from django.core.management.base import BaseCommand
+
+from backend.settings import JOB_LOCK_TIMEOUT, JOB_THREADS
+
+RELEASE_INTERVAL = 60
+HEARTBEAT_INTERVAL = JOB_LOCK_TIMEOUT / 4
+
+
+class Command(BaseCommand):
+    help = 'Выполняет фоновые задачи из очереди core_job.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--threads', type=int, default=JOB_THREADS,
+            help='Number of jobs executed concurrently.'
+        )
+        parser.add_argument(
+            '--poll-interval', type=float, default=1.0,
+            help='Seconds to wait when the queue is empty.'
+        )
+        parser.add_argument(
+            '--once', action='store_true',
+            help='Exit when no jobs are ready instead of polling.'
+        )
+
+    def handle(self, *args, **options):
+        threads = options['threads']
+        worker = f'{socket.gethostname()}:{os.getpid()}'
+        stop = threading.Event()
+        for signum in (signal.SIGINT, signal.SIGTERM):
+            signal.signal(signum, lambda *args: stop.set())
+
+        done = failed = 0
+        released_at = 0
+        beaten_at = time.monotonic()
+        running = set()
+        with ThreadPoolExecutor(max_workers=threads) as pool:
+            # После сигнала новые задачи не берутся, начатые дорабатывают.
+            while running or not stop.is_set():
+                if time.monotonic() - released_at > RELEASE_INTERVAL:
+                    release_stale()
+                    released_at = time.monotonic()
+                if time.monotonic() - beaten_at > HEARTBEAT_INTERVAL:
+                    heartbeat(worker)
+                    beaten_at = time.monotonic()
+
+                # Освободившийся поток сразу получает следующую задачу,
+                # не дожидаясь самой долгой из взятых.
+                free = threads - len(running)
+                if free and not stop.is_set():
+                    running.update(
+                        pool.submit(execute, job)
+                        for job in claim(worker, free)
+                    )
+                if not running:
+                    if options['once']:
+                        break
+                    stop.wait(options['poll_interval'])
+                    continue
+
+                finished, running = wait(
+                    running, timeout=options['poll_interval'],
+                    return_when=FIRST_COMPLETED
+                )
+                for future in finished:
+                    succeeded = future.result()
+                    done += succeeded
+                    failed += not succeeded
+                if finished and options['verbosity'] > 1:
+                    self.stdout.write(f'Done: {done}, failed: {failed}.')
+
+        self.stdout.write(
+            f'Worker {worker} stopped. Done: {done}, failed: {failed}.'
+        )
@@ -0,0 +1,140 @@
+"""Метрики процесса в текстовом формате Prometheus.
+
+Значения хранятся в памяти процесса: при нескольких воркерах gunicorn
+каждый отдаёт свои, и Prometheus собирает их как отдельные цели
+(или воркер один на контейнер).
+"""
+import threading
+from bisect import bisect_left
+
+DURATION_BUCKETS = (
+    0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10
+)
+QUERY_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100, 200)
+
+
+def escape(value):
+    return str(value).replace('\\', '\\\\').replace(
+        '"', '\\"'
+    ).replace('\n', '\\n')
+
+
+def format_labels(names, values, extra=()):
+    pairs = [*zip(names, values), *extra]
+    if not pairs:
+        return ''
+    return '{' + ','.join(
+        f'{name}="{escape(value)}"' for name, value in pairs
+    ) + '}'
+
+
+class Counter:
+    kind = 'counter'
+
+    def __init__(self, name, documentation, labels=()):
+        self.name = name
+        self.documentation = documentation
+        self.labels = labels
+        self.values = {}
+        self.lock = threading.Lock()
+
+    def inc(self, labels=(), amount=1):
+        with self.lock:
+            self.values[labels] = self.values.get(labels, 0) + amount
+
+    def samples(self):
+        with self.lock:
+            values = dict(self.values)
+        for labels, value in sorted(values.items()):
+            yield f'{self.name}{format_labels(self.labels, labels)} {value}'
+
+
+class Histogram:
+    kind = 'histogram'
+
+    def __init__(self, name, documentation, labels=(),
+                 buckets=DURATION_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labels = labels
+        self.buckets = tuple(buckets)
+        # labels -> [счётчики по корзинам (последняя — +Inf), сумма]
+        self.values = {}
+        self.lock = threading.Lock()
+
+    def observe(self, labels, value):
+        position = bisect_left(self.buckets, value)
+        with self.lock:
+            entry = self.values.get(labels)
+            if entry is None:
+                entry = self.values[labels] = [
+                    [0] * (len(self.buckets) + 1), 0
+                ]
+            entry[0][position] += 1
+            entry[1] += value
+
+    def samples(self):
+        with self.lock:
+            values = {
+                labels: (list(counts), total)
+                for labels, (counts, total) in self.values.items()
+            }
+        bounds = [*map(str, self.buckets), '+Inf']
+        for labels, (counts, total) in sorted(values.items()):
+            cumulative = 0
+            for bound, count in zip(bounds, counts):
+                cumulative += count
+                yield (
+                    f'{self.name}_bucket'
+                    f'{format_labels(self.labels, labels, (("le", bound),))}'
+                    f' {cumulative}'
+                )
+            suffix = format_labels(self.labels, labels)
+            yield f'{self.name}_sum{suffix} {total}'
+            yield f'{self.name}_count{suffix} {cumulative}'
+
+
+class Registry:
+    def __init__(self):
+        self.metrics = []
+
+    def register(self, metric):
+        self.metrics.append(metric)
+        return metric
+
+    def render(self):
+        lines = []
+        for metric in self.metrics:
+            lines.append(f'# HELP {metric.name} {metric.documentation}')
+            lines.append(f'# TYPE {metric.name} {metric.kind}')
+            lines.extend(metric.samples())
+        return '\n'.join(lines) + '\n'
+
+
+registry = Registry()
+
+requests_total = registry.register(Counter(
+    'foodgram_http_requests_total', 'Requests by view, method and status.',
+    ('view', 'method', 'status')
+))
+request_duration = registry.register(Histogram(
+    'foodgram_http_request_duration_seconds', 'Total request time.',
+    ('view', 'method')
+))
+db_duration = registry.register(Histogram(
+    'foodgram_http_request_db_seconds', 'Time spent in database queries.',
+    ('view', 'method')
+))
+db_queries = registry.register(Histogram(
+    'foodgram_http_request_db_queries', 'Database queries per request.',
+    ('view', 'method'), QUERY_BUCKETS
+))
+app_duration = registry.register(Histogram(
+    'foodgram_http_request_app_seconds',
+    'View time without database queries: filters, serializers.',
+    ('view', 'method')
+))
+render_duration = registry.register(Histogram(
+    'foodgram_http_request_render_seconds', 'Response rendering time.',
+    ('view', 'method')
+))
@@ -0,0 +1,182 @@
+import asyncio
+import threading
+import time
+from contextvars import ContextVar
+
+from asgiref.sync import sync_to_async
+from django.core.exceptions import MiddlewareNotUsed
+
+from backend.settings import REPLICA_DATABASES, SERVER_TIMING
+
+from . import metrics
+from .db_routers import (SAFE_METHODS, RequestRouting, current_routing,
+                         pin_to_primary)
+
+# Замеры текущего запроса. ContextVar, а не атрибут потока: asgiref
+# передаёт контекст в потоки sync_to_async, так что запросы к БД из
+# асинхронных вью попадают в замеры своего запроса.
+current_timings = ContextVar('current_timings', default=None)
+
+
+class RequestTimings:
+    def __init__(self, request):
+        self.request = request
+        self.started = time.perf_counter()
+        self.queries = 0
+        self.db = 0.0
+        self.render = 0.0
+        self.render_started = None
+        self.lock = threading.Lock()
+
+    def add_query(self, duration):
+        # Асинхронные вью выполняют запросы из нескольких потоков сразу.
+        with self.lock:
+            self.queries += 1
+            self.db += duration
+
+
+def time_queries(execute, sql, params, many, context):
+    """Обёртка `execute_wrapper` всех соединений."""
+    timings = current_timings.get()
+    if timings is None:
+        return execute(sql, params, many, context)
+    started = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        timings.add_query(time.perf_counter() - started)
+
+
+def install(sender, connection, **kwargs):
+    """Обработчик `connection_created`."""
+    if time_queries not in connection.execute_wrappers:
+        connection.execute_wrappers.append(time_queries)
+
+
+class PerformanceMiddleware:
+    """Замеры каждого запроса: БД, рендеринг, остальной код, общее время.
+
+    Результат пишется в заголовок `Server-Timing` (если `SERVER_TIMING`)
+    и в гистограммы `core.metrics` с меткой имени URL: `recipes-list`,
+    `carts-list`, `download_cart` и т. д. Должен стоять первым в
+    MIDDLEWARE, чтобы общее время включало остальные middleware.
+    Работает и под WSGI, и под ASGI без переключения потоков.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.is_async = asyncio.iscoroutinefunction(get_response)
+        if self.is_async:
+            # Так же Django помечает асинхронные MiddlewareMixin.
+            self._is_coroutine = asyncio.coroutines._is_coroutine
+
+    def __call__(self, request):
+        if self.is_async:
+            return self.__acall__(request)
+        timings = RequestTimings(request)
+        token = current_timings.set(timings)
+        try:
+            response = self.get_response(request)
+        finally:
+            current_timings.reset(token)
+        return self.report(request, response, timings)
+
+    async def __acall__(self, request):
+        timings = RequestTimings(request)
+        token = current_timings.set(timings)
+        try:
+            response = await self.get_response(request)
+        finally:
+            current_timings.reset(token)
+        return self.report(request, response, timings)
+
+    @staticmethod
+    def report(request, response, timings):
+        total = time.perf_counter() - timings.started
+        app = max(total - timings.db - timings.render, 0.0)
+
+        match = request.resolver_match
+        labels = (
+            match.url_name if match and match.url_name else 'unmatched',
+            request.method
+        )
+        metrics.requests_total.inc((*labels, str(response.status_code)))
+        metrics.request_duration.observe(labels, total)
+        metrics.db_duration.observe(labels, timings.db)
+        metrics.db_queries.observe(labels, timings.queries)
+        metrics.app_duration.observe(labels, app)
+        metrics.render_duration.observe(labels, timings.render)
+
+        if SERVER_TIMING:
+            response['Server-Timing'] = ', '.join((
+                f'db;dur={timings.db * 1000:.1f};'
+                f'desc="{timings.queries} queries"',
+                f'app;dur={app * 1000:.1f}',
+                f'render;dur={timings.render * 1000:.1f}',
+                f'total;dur={total * 1000:.1f}',
+            ))
+        return response
+
+    def process_template_response(self, request, response):
+        # Ответы DRF рендерятся после выхода из вью.
+        timings = current_timings.get()
+        if timings is None:
+            return response
+        timings.render_started = time.perf_counter()
+
+        def rendered(response):
+            timings.render = time.perf_counter() - timings.render_started
+
+        response.add_post_render_callback(rendered)
+        return response
+
+
+class ReplicaRoutingMiddleware:
+    """Маршрутизация чтения на реплики, см. `core.db_routers`.
+
+    Без REPLICA_DATABASES не подключается. Успешный небезопасный запрос
+    с заголовком Authorization закрепляет клиента за основной базой.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        if not REPLICA_DATABASES:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        self.is_async = asyncio.iscoroutinefunction(get_response)
+        if self.is_async:
+            self._is_coroutine = asyncio.coroutines._is_coroutine
+
+    @staticmethod
+    def is_write(request, response):
+        return (
+            request.method not in SAFE_METHODS
+            and response.status_code < 400
+        )
+
+    def __call__(self, request):
+        if self.is_async:
+            return self.__acall__(request)
+        token = current_routing.set(RequestRouting(request))
+        try:
+            response = self.get_response(request)
+        finally:
+            current_routing.reset(token)
+        if self.is_write(request, response):
+            pin_to_primary(request)
+        return response
+
+    async def __acall__(self, request):
+        token = current_routing.set(RequestRouting(request))
+        try:
+            response = await self.get_response(request)
+        finally:
+            current_routing.reset(token)
+        if self.is_write(request, response):
+            await sync_to_async(pin_to_primary, thread_sensitive=False)(
+                request
+            )
+        return response
@@ -0,0 +1,31 @@
+# Generated by Django 3.2.15 on 2026-10-18 19:50
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('core', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SlowQuery',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('sql', models.TextField()),
+                ('params', models.TextField(blank=True)),
+                ('duration', models.FloatField(verbose_name='Duration, ms')),
+                ('database', models.CharField(max_length=100)),
+                ('view', models.CharField(blank=True, max_length=200)),
+                ('origin', models.CharField(blank=True, max_length=500)),
+                ('plan', models.TextField(blank=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True, db_index=True)),
+            ],
+            options={
+                'verbose_name_plural': 'Slow queries',
+                'ordering': ('-id',),
+            },
+        ),
+    ]
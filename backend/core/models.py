@@ -0,0 +1,63 @@
+from django.db import models
+from django.utils import timezone
+
+
+class Job(models.Model):
+    """Отложенная задача в очереди на базе данных."""
+
+    QUEUED = 'queued'
+    RUNNING = 'running'
+    DEAD = 'dead'
+    STATUSES = (
+        (QUEUED, 'Queued'),
+        (RUNNING, 'Running'),
+        (DEAD, 'Dead'),
+    )
+
+    name = models.CharField(max_length=200)
+    payload = models.JSONField(default=dict)
+    status = models.CharField(
+        max_length=10, choices=STATUSES, default=QUEUED
+    )
+    attempts = models.PositiveSmallIntegerField(default=0)
+    max_attempts = models.PositiveSmallIntegerField(default=5)
+    run_at = models.DateTimeField(default=timezone.now)
+    locked_by = models.CharField(max_length=200, blank=True)
+    locked_at = models.DateTimeField(null=True, blank=True)
+    last_error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        ordering = ('run_at', 'id')
+        indexes = [
+            models.Index(
+                fields=['status', 'run_at'], name='job_status_run_at'
+            ),
+        ]
+
+    def __str__(self):
+        return f'{self.name} #{self.pk} ({self.status})'
+
+
+class SlowQuery(models.Model):
+    """Медленный запрос к БД с планом выполнения.
+
+    Таблица — кольцевой буфер: хранятся последние SLOW_QUERY_LOG_SIZE
+    записей, см. `core.slow_queries`.
+    """
+
+    sql = models.TextField()
+    params = models.TextField(blank=True)
+    duration = models.FloatField('Duration, ms')
+    database = models.CharField(max_length=100)
+    view = models.CharField(max_length=200, blank=True)
+    origin = models.CharField(max_length=500, blank=True)
+    plan = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True, db_index=True)
+
+    class Meta:
+        ordering = ('-id', )
+        verbose_name_plural = 'Slow queries'
+
+    def __str__(self):
+        return f'{self.duration:.0f} ms {self.view or self.origin}'
@@ -0,0 +1,174 @@
+"""Журнал медленных запросов к БД.
+
+Обёртка `execute_wrapper` ставится на каждое соединение при его
+создании. Запрос дольше SLOW_QUERY_THRESHOLD мс с вероятностью
+SLOW_QUERY_SAMPLE_RATE сохраняется в `SlowQuery` вместе с планом:
+`EXPLAIN` на PostgreSQL, `EXPLAIN QUERY PLAN` на SQLite. План с
+ANALYZE повторно выполняет запрос, поэтому в запросе пользователя он не
+строится: его получает `dump_slow_queries --analyze`.
+
+Запись в журнал идёт вне транзакции запроса: если основная база внутри
+`atomic`, запись откладывается до конца запроса (`request_finished`),
+иначе откат унёс бы её вместе с транзакцией. Запросы самого журнала не
+попадают ни в журнал, ни в замеры Server-Timing.
+"""
+import json
+import logging
+import os
+import random
+import sys
+import threading
+import time
+
+from django.db import DEFAULT_DB_ALIAS, DatabaseError, connections, transaction
+
+from backend.settings import (BASE_DIR, SLOW_QUERY_LOG_SIZE,
+                              SLOW_QUERY_SAMPLE_RATE, SLOW_QUERY_THRESHOLD)
+
+from .middleware import current_timings
+
+# Служебные команды (SAVEPOINT, BEGIN и т. п.) не журналируются.
+STATEMENTS = ('SELECT', 'INSERT', 'UPDATE', 'DELETE', 'WITH')
+local = threading.local()
+# Записи, ждущие конца транзакции; общие для потоков: ASGI завершает
+# запрос не в том потоке, где выполнялась вью.
+pending = []
+pending_lock = threading.Lock()
+logger = logging.getLogger(__name__)
+
+
+def current_view():
+    """Имя URL текущего запроса из замеров PerformanceMiddleware."""
+    timings = current_timings.get()
+    match = timings and timings.request.resolver_match
+    return match.url_name or '' if match else ''
+
+
+def find_origin():
+    """Ближайший к запросу кадр кода проекта: вью, сериализатор, фильтр."""
+    frame = sys._getframe(2)
+    while frame is not None:
+        filename = frame.f_code.co_filename
+        if (filename.startswith(BASE_DIR) and filename != __file__
+                and 'site-packages' not in filename):
+            return (
+                f'{os.path.relpath(filename, BASE_DIR)}:{frame.f_lineno} '
+                f'in {frame.f_code.co_name}'
+            )
+        frame = frame.f_back
+    return ''
+
+
+def explain(connection, sql, params, analyze=False):
+    """План запроса; курсор бэкенда в обход execute_wrappers.
+
+    `analyze` выполняет SELECT на PostgreSQL ещё раз ради настоящих
+    времён и буферов.
+    """
+    if connection.vendor == 'postgresql':
+        options = (
+            '(ANALYZE, BUFFERS) '
+            if analyze and sql.lstrip()[:6].upper() == 'SELECT' else ''
+        )
+        prefix = f'EXPLAIN {options}'
+    elif connection.vendor == 'sqlite':
+        prefix = 'EXPLAIN QUERY PLAN '
+    else:
+        prefix = 'EXPLAIN '
+    # Ошибка плана не должна ломать транзакцию запроса.
+    with transaction.atomic(using=connection.alias), \
+            connection.cursor() as cursor:
+        cursor.cursor.execute(prefix + sql, params)
+        rows = cursor.cursor.fetchall()
+    if connection.vendor == 'sqlite':
+        # (id, parent, notused, detail) -> дерево с отступами.
+        depth = {0: -1}
+        lines = []
+        for node, parent, _, detail in rows:
+            depth[node] = depth.get(parent, -1) + 1
+            lines.append('  ' * depth[node] + detail)
+        return '\n'.join(lines)
+    return '\n'.join(' '.join(map(str, row)) for row in rows)
+
+
+def capture(connection, sql, params, many, duration, view):
+    """Поля записи журнала; план строится сразу, пока запрос актуален."""
+    try:
+        plan = '' if many else explain(connection, sql, params)
+    except DatabaseError as error:
+        plan = f'EXPLAIN failed: {error}'
+    if many:
+        params = params[0] if params else None
+    return dict(
+        sql=sql,
+        params=json.dumps(params, default=str, ensure_ascii=False),
+        duration=duration * 1000,
+        database=connection.alias,
+        view=view,
+        origin=find_origin()[:500],
+        plan=plan
+    )
+
+
+def write(entries):
+    from .models import SlowQuery
+
+    # Журнал всегда в основной базе, в том числе для запросов к репликам.
+    queryset = SlowQuery.objects.using(DEFAULT_DB_ALIAS)
+    with transaction.atomic(using=DEFAULT_DB_ALIAS):
+        queryset.bulk_create(SlowQuery(**entry) for entry in entries)
+        last = queryset.order_by('-id').values_list('id', flat=True).first()
+        queryset.filter(id__lte=last - SLOW_QUERY_LOG_SIZE).delete()
+
+
+def flush_pending(**kwargs):
+    """Записывает отложенные записи; обработчик `request_finished`."""
+    with pending_lock:
+        entries = pending[:]
+        pending.clear()
+    if not entries:
+        return
+    local.capturing = True
+    token = current_timings.set(None)
+    try:
+        write(entries)
+    except DatabaseError:
+        logger.warning('Slow queries were not logged', exc_info=True)
+    finally:
+        current_timings.reset(token)
+        local.capturing = False
+
+
+def slow_query_log(execute, sql, params, many, context):
+    if getattr(local, 'capturing', False):
+        return execute(sql, params, many, context)
+    started = time.perf_counter()
+    result = execute(sql, params, many, context)
+    duration = time.perf_counter() - started
+    if (duration * 1000 >= SLOW_QUERY_THRESHOLD
+            and sql.lstrip()[:6].upper().startswith(STATEMENTS)
+            and random.random() < SLOW_QUERY_SAMPLE_RATE):
+        view = current_view()
+        local.capturing = True
+        token = current_timings.set(None)
+        try:
+            entry = capture(
+                context['connection'], sql, params, many, duration, view
+            )
+        finally:
+            current_timings.reset(token)
+            local.capturing = False
+        with pending_lock:
+            # Вне запросов отложенные записи могут не дождаться сброса.
+            del pending[:max(len(pending) + 1 - SLOW_QUERY_LOG_SIZE, 0)]
+            pending.append(entry)
+        if not connections[DEFAULT_DB_ALIAS].in_atomic_block:
+            flush_pending()
+    return result
+
+
+def install(sender, connection, **kwargs):
+    """Обработчик `connection_created`; порог 0 отключает журнал."""
+    wrappers = connection.execute_wrappers
+    if SLOW_QUERY_THRESHOLD and slow_query_log not in wrappers:
+        wrappers.append(slow_query_log)
@@ -1,5 +1,12 @@
+import ipaddress
+
+from django.http import HttpResponse, HttpResponseNotFound
 from django.shortcuts import render
 
+from backend.settings import METRICS_ALLOWED_NETWORKS
+
+from .metrics import registry
+
 
 def page_not_found(request, exception):
     return render(request, 'core/404.html', {'path': request.path}, status=404)
@@ -15,3 +22,21 @@ def permission_denied(request, exception):
 
 def csrf_failure(request, reason=''):
     return render(request, 'core/403csrf.html')
+
+
+def metrics(request):
+    """Метрики в формате Prometheus, только для внутренних адресов.
+
+    Запросы, пришедшие через прокси (с X-Forwarded-For), считаются
+    внешними.
+    """
+    try:
+        address = ipaddress.ip_address(request.META.get('REMOTE_ADDR', ''))
+    except ValueError:
+        return HttpResponseNotFound()
+    if 'HTTP_X_FORWARDED_FOR' in request.META or not any(
+            address in network for network in METRICS_ALLOWED_NETWORKS):
+        return HttpResponseNotFound()
+    return HttpResponse(
+        registry.render(), content_type='text/plain; version=0.0.4'
+    )
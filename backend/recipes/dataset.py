@@ -0,0 +1,413 @@
+"""Детерминированный набор данных для бенчмарков и нагрузочных стендов.
+
+Один и тот же `seed` на пустой базе даёт одни и те же данные, кроме
+токенов авторизации: они случайны, чтобы их нельзя было вычислить по
+`seed` на общем стенде. Популярность авторов, рецептов, ингредиентов и
+тегов распределена по закону Ципфа: немногие авторы пишут и собирают
+подписчиков больше остальных, немногие рецепты чаще попадают в
+избранное и корзины. Строки пишутся пачками в отдельных транзакциях
+(COPY на PostgreSQL, executemany на остальных СУБД) в обход моделей и
+сигналов; пачка пользователей или рецептов пишется одной транзакцией
+вместе со своими токенами, тегами и ингредиентами. Счётчики и списки
+покупок пересчитываются в конце.
+"""
+import io
+import os
+import random
+import secrets
+import time
+from datetime import datetime, timedelta, timezone
+from itertools import accumulate, islice
+
+from django.contrib.auth.hashers import make_password
+from django.core.management import call_command
+from django.db import connection, transaction
+from django.db.models import DateTimeField
+from django.utils import timezone as django_timezone
+from rest_framework.authtoken.models import Token
+from users.models import Follow
+
+from backend.settings import BASE_DIR
+
+from .models import (Cart, Favorite, Ingredient, IngredientAmount, Recipe,
+                     ShoppingListItem, Tag, User)
+from .versions import bump_version
+
+TAGS = (
+    ('Завтрак', '#E26C2D', 'breakfast'),
+    ('Обед', '#49B64E', 'lunch'),
+    ('Ужин', '#8775D2', 'dinner'),
+    ('Десерт', '#F2C94C', 'dessert'),
+    ('Выпечка', '#BB6BD9', 'bakery'),
+    ('Постное', '#2D9CDB', 'lenten'),
+)
+DISHES = (
+    'Салат', 'Суп', 'Рагу', 'Запеканка', 'Пирог', 'Омлет', 'Каша',
+    'Котлеты', 'Паста', 'Плов', 'Блины', 'Гратен', 'Похлёбка', 'Соус',
+)
+PASSWORD = 'foodgram-dataset'
+CATALOGUE = os.path.join(BASE_DIR, '..', 'data', 'ingredients.csv')
+UNITS = ('г', 'кг', 'мл', 'л', 'шт.', 'ст. л.', 'ч. л.', 'по вкусу')
+# Рецепты публикуются раз в минуту начиная с этой даты.
+FIRST_PUB_DATE = datetime(2020, 1, 1, tzinfo=timezone.utc)
+PUB_INTERVAL = timedelta(minutes=1)
+
+
+def cumulative_zipf(count, exponent):
+    """Накопленные веса рангов 1..count для random.choices."""
+    return list(
+        accumulate(1 / rank ** exponent for rank in range(1, count + 1))
+    )
+
+
+def copy_value(value):
+    """Значение в текстовом формате COPY."""
+    if value is None:
+        return '\\N'
+    return str(value).replace('\\', '\\\\').replace(
+        '\t', '\\t'
+    ).replace('\n', '\\n').replace('\r', '\\r')
+
+
+class RowWriter:
+    """Пакетная запись строк в таблицу модели без создания экземпляров.
+
+    Строки — кортежи значений полей `fields`. Остальные поля получают
+    значение по умолчанию, одно на всю запись.
+    """
+
+    def __init__(self, model, fields):
+        opts = model._meta
+        self.table = opts.db_table
+        written = [opts.get_field(name) for name in fields]
+        rest = [
+            field for field in opts.concrete_fields
+            if field not in written and field is not opts.auto_field
+        ]
+        self.columns = [field.column for field in written + rest]
+        self.defaults = tuple(self.adapt(
+            field,
+            django_timezone.now()
+            if getattr(field, 'auto_now_add', False)
+            or getattr(field, 'auto_now', False)
+            else field.get_default()
+        ) for field in rest)
+        self.datetimes = [
+            position for position, field in enumerate(written)
+            if isinstance(field, DateTimeField)
+        ]
+
+    @staticmethod
+    def adapt(field, value):
+        if isinstance(field, DateTimeField):
+            return connection.ops.adapt_datetimefield_value(value)
+        return value
+
+    def prepare(self, row):
+        if not self.datetimes:
+            return row + self.defaults
+        row = list(row)
+        for position in self.datetimes:
+            row[position] = connection.ops.adapt_datetimefield_value(
+                row[position]
+            )
+        return (*row, *self.defaults)
+
+    def write(self, rows):
+        """Записывает пачку строк одной транзакцией."""
+        rows = [self.prepare(row) for row in rows]
+        columns = ', '.join(self.columns)
+        with transaction.atomic(), connection.cursor() as cursor:
+            if connection.vendor == 'postgresql':
+                buffer = io.StringIO()
+                buffer.writelines(
+                    '\t'.join(map(copy_value, row)) + '\n' for row in rows
+                )
+                buffer.seek(0)
+                cursor.copy_expert(
+                    f'COPY {self.table} ({columns}) FROM STDIN', buffer
+                )
+            else:
+                placeholders = ', '.join(['%s'] * len(self.columns))
+                cursor.executemany(
+                    f'INSERT INTO {self.table} ({columns}) '
+                    f'VALUES ({placeholders})',
+                    rows
+                )
+        return len(rows)
+
+
+class DatasetBuilder:
+    """Строит набор данных.
+
+    `follows`, `favorites` и `carts` — среднее число на пользователя,
+    `ingredients_per_recipe` — минимум, мода и максимум треугольного
+    распределения, `tags_per_recipe` — минимум и максимум.
+    """
+
+    def __init__(self, seed=0, users=100, recipes=1000, follows=10,
+                 favorites=20, carts=5, ingredients_per_recipe=(3, 8, 20),
+                 tags_per_recipe=(1, 3), exponent=1.1, batch_size=5000,
+                 username_prefix='user', log=None):
+        self.rng = random.Random(seed)
+        self.users = users
+        self.recipes = recipes
+        self.follows = follows
+        self.favorites = favorites
+        self.carts = carts
+        self.ingredients_per_recipe = ingredients_per_recipe
+        self.tags_per_recipe = tags_per_recipe
+        self.exponent = exponent
+        self.batch_size = batch_size
+        self.username_prefix = username_prefix
+        self.log = log or (lambda message: None)
+        self.reported = 0
+        self.reported_message = None
+        self.authors = None
+
+    def progress(self, message, force=False):
+        """Пишет прогресс не чаще раза в секунду."""
+        now = time.monotonic()
+        if message != self.reported_message and (
+                force or now - self.reported >= 1):
+            self.reported, self.reported_message = now, message
+            self.log(message)
+
+    def ranking(self, items):
+        """Случайный порядок популярности и накопленные веса к нему."""
+        items = list(items)
+        self.rng.shuffle(items)
+        return items, cumulative_zipf(len(items), self.exponent)
+
+    def sample(self, ranking, count):
+        """`count` разных элементов, популярные выпадают чаще."""
+        items, cum_weights = ranking
+        count = min(count, len(items))
+        chosen = set()
+        while len(chosen) < count:
+            chosen.update(self.rng.choices(
+                items, cum_weights=cum_weights, k=count - len(chosen)
+            ))
+        return sorted(chosen)
+
+    def count_around(self, mean):
+        return self.rng.randint(0, 2 * mean) if mean else 0
+
+    @staticmethod
+    def last_id(model):
+        return model.objects.order_by('-pk').values_list(
+            'pk', flat=True
+        ).first() or 0
+
+    @staticmethod
+    def ids_after(model, start, count=None):
+        """Id строк, записанных после `start`, в порядке записи."""
+        ids = model.objects.filter(pk__gt=start).order_by('pk').values_list(
+            'pk', flat=True
+        )
+        return list(ids if count is None else ids[:count])
+
+    def write_all(self, writer, rows, label):
+        done = 0
+        rows = iter(rows)
+        while True:
+            batch = list(islice(rows, self.batch_size))
+            if not batch:
+                break
+            done += writer.write(batch)
+            self.progress(f'{label}: {done}')
+        self.progress(f'{label}: {done}', force=True)
+        return done
+
+    def build(self):
+        tags = self.create_tags()
+        ingredients = self.load_ingredients()
+        user_ids = self.create_users()
+        recipe_ids = self.create_recipes(user_ids, tags, ingredients)
+        self.create_relations(user_ids, recipe_ids)
+
+        self.create_shopping_lists(user_ids)
+
+        self.log('Recounting counters...')
+        call_command(
+            'reconcile_counters', batch_size=self.batch_size,
+            stdout=io.StringIO()
+        )
+        bump_version('tags', 'ingredients', 'recipes')
+        return {'users': user_ids, 'recipes': recipe_ids, 'tags': tags}
+
+    def create_tags(self):
+        # Через save(): тег получает бит маски.
+        for name, color, slug in TAGS:
+            Tag.objects.get_or_create(
+                slug=slug, defaults={'name': name, 'color': color}
+            )
+        return list(
+            Tag.objects.filter(slug__in=[slug for *_, slug in TAGS])
+            .order_by('id').values_list('id', 'slug', 'bit')
+        )
+
+    def load_ingredients(self):
+        """Каталог из `data/`; без него — синтетические ингредиенты."""
+        if not Ingredient.objects.exists():
+            if os.path.exists(CATALOGUE):
+                self.log('Loading the ingredient catalogue...')
+                call_command(
+                    'load_catalogue', CATALOGUE, stdout=io.StringIO()
+                )
+            else:
+                RowWriter(Ingredient, ('name', 'measurement_unit')).write(
+                    (f'ингредиент {number}', UNITS[number % len(UNITS)])
+                    for number in range(2000)
+                )
+        return list(
+            Ingredient.objects.order_by('id').values_list('id', 'name')
+        )
+
+    def create_users(self):
+        password = make_password(PASSWORD)
+        prefix = self.username_prefix
+        user_writer = RowWriter(User, (
+            'username', 'email', 'first_name', 'last_name', 'password'
+        ))
+        token_writer = RowWriter(Token, ('key', 'user'))
+
+        user_ids = []
+        for offset in range(0, self.users, self.batch_size):
+            size = min(self.batch_size, self.users - offset)
+            with transaction.atomic():
+                start = self.last_id(User)
+                user_writer.write(
+                    (f'{prefix}{number}', f'{prefix}{number}@example.com',
+                     f'Имя{number}', f'Фамилия{number}', password)
+                    for number in range(offset, offset + size)
+                )
+                batch_ids = self.ids_after(User, start, size)
+                token_writer.write(
+                    (secrets.token_hex(20), user_id) for user_id in batch_ids
+                )
+            user_ids.extend(batch_ids)
+            self.progress(
+                f'Users: {len(user_ids)}/{self.users}',
+                force=len(user_ids) == self.users
+            )
+        return user_ids
+
+    def create_recipes(self, user_ids, tags, ingredients):
+        # Плодовитые авторы потом получают и больше подписчиков.
+        self.authors = authors = self.ranking(user_ids)
+        tag_ranking = self.ranking(tags)
+        names = dict(ingredients)
+        ingredient_ranking = self.ranking(names)
+        low, mode, high = self.ingredients_per_recipe
+
+        recipe_writer = RowWriter(Recipe, (
+            'author', 'name', 'text', 'cooking_time', 'pub_date',
+            'tags_mask'
+        ))
+        tag_writer = RowWriter(Recipe.tags.through, ('recipe', 'tag'))
+        amount_writer = RowWriter(
+            IngredientAmount, ('recipe', 'ingredient', 'amount')
+        )
+
+        recipe_ids = []
+        amounts = 0
+        for offset in range(0, self.recipes, self.batch_size):
+            size = min(self.batch_size, self.recipes - offset)
+            recipes, plans = [], []
+            for number, author in enumerate(self.rng.choices(
+                    authors[0], cum_weights=authors[1], k=size), offset):
+                recipe_tags = self.sample(
+                    tag_ranking, self.rng.randint(*self.tags_per_recipe)
+                )
+                components = self.sample(
+                    ingredient_ranking,
+                    round(self.rng.triangular(low, high, mode))
+                )
+                recipes.append((
+                    author,
+                    f'{self.rng.choice(DISHES)}: '
+                    f'{names[components[0]]}'[:200],
+                    'Понадобится: ' + ', '.join(
+                        names[ingredient_id] for ingredient_id in components
+                    ) + '.',
+                    round(self.rng.triangular(5, 180, 30)),
+                    FIRST_PUB_DATE + number * PUB_INTERVAL,
+                    sum(
+                        1 << bit for _, _, bit in recipe_tags
+                        if bit is not None
+                    )
+                ))
+                plans.append((recipe_tags, components))
+
+            with transaction.atomic():
+                start = self.last_id(Recipe)
+                recipe_writer.write(recipes)
+                batch_ids = self.ids_after(Recipe, start, size)
+                tag_writer.write(
+                    (recipe_id, tag_id)
+                    for recipe_id, (recipe_tags, _) in zip(batch_ids, plans)
+                    for tag_id, _, _ in recipe_tags
+                )
+                amounts += amount_writer.write(
+                    (recipe_id, ingredient_id, self.rng.randint(1, 500))
+                    for recipe_id, (_, components) in zip(batch_ids, plans)
+                    for ingredient_id in components
+                )
+            recipe_ids.extend(batch_ids)
+            self.progress(
+                f'Recipes: {len(recipe_ids)}/{self.recipes}, '
+                f'ingredient amounts: {amounts}',
+                force=len(recipe_ids) == self.recipes
+            )
+        return recipe_ids
+
+    def create_relations(self, user_ids, recipe_ids):
+        authors = self.authors
+        recipes = self.ranking(recipe_ids)
+
+        def follows():
+            for user_id in user_ids:
+                count = self.count_around(self.follows)
+                # Себя выбрать можно, такой автор отбрасывается.
+                targets = [
+                    author_id for author_id in self.sample(authors, count + 1)
+                    if author_id != user_id
+                ]
+                for author_id in targets[:count]:
+                    yield user_id, author_id
+
+        def choices(mean):
+            for user_id in user_ids:
+                for recipe_id in self.sample(
+                        recipes, self.count_around(mean)):
+                    yield user_id, recipe_id
+
+        self.write_all(
+            RowWriter(Follow, ('user', 'author')), follows(), 'Follows'
+        )
+        self.write_all(
+            RowWriter(Favorite, ('user', 'recipe')), choices(self.favorites),
+            'Favorites'
+        )
+        self.write_all(
+            RowWriter(Cart, ('user', 'recipe')), choices(self.carts), 'Carts'
+        )
+
+    def create_shopping_lists(self, user_ids):
+        """Агрегат списков покупок новых пользователей по их корзинам."""
+        writer = RowWriter(ShoppingListItem, ('user', 'ingredient', 'amount'))
+        # В среднем около 50 строк на пользователя.
+        step = max(1, self.batch_size // 50)
+        done = 0
+        for start in range(0, len(user_ids), step):
+            done += writer.write(
+                (user_id, ingredient_id, total)
+                for (user_id, ingredient_id), total
+                in ShoppingListItem.objects.expected(
+                    user_ids[start:start + step]
+                ).items()
+                if total
+            )
+            self.progress(f'Shopping list items: {done}')
+        self.progress(f'Shopping list items: {done}', force=True)
@@ -0,0 +1,89 @@
+"""Уменьшенные копии картинок рецептов.
+
+Для каждой картинки готовятся варианты из `IMAGE_VARIANTS` в форматах
+`IMAGE_FORMATS`. Имя варианта выводится из имени оригинала, которое
+уже содержит хеш содержимого: `<sha256>.card.webp` и т. п.
+"""
+import os
+from io import BytesIO
+
+from core.jobs import enqueue, job
+from django.core.files.base import ContentFile
+from PIL import Image, ImageOps
+
+from .models import Recipe
+from .settings import IMAGE_FORMATS, IMAGE_QUALITY, IMAGE_VARIANTS
+from .versions import bump_version
+
+
+def variant_name(name, variant, extension):
+    return f'{os.path.splitext(name)[0]}.{variant}.{extension}'
+
+
+def generate_variants(storage, name):
+    """Создаёт недостающие варианты картинки `name` в `storage`."""
+    missing = [
+        (variant, size, extension, image_format)
+        for variant, size in IMAGE_VARIANTS.items()
+        for extension, image_format in IMAGE_FORMATS.items()
+        if not storage.exists(variant_name(name, variant, extension))
+    ]
+    if not missing:
+        return
+
+    with storage.open(name) as source, Image.open(source) as original:
+        original = ImageOps.exif_transpose(original)
+        if original.mode not in ('RGB', 'RGBA'):
+            original = original.convert('RGBA')
+        for variant, size, extension, image_format in missing:
+            image = original.copy()
+            image.thumbnail((size, size), Image.LANCZOS)
+            if image_format == 'JPEG' and image.mode != 'RGB':
+                image = image.convert('RGB')
+            buffer = BytesIO()
+            image.save(
+                buffer, image_format, quality=IMAGE_QUALITY, optimize=True
+            )
+            storage.save_as(
+                variant_name(name, variant, extension),
+                ContentFile(buffer.getvalue())
+            )
+
+
+@job
+def generate_recipe_image_variants(name):
+    generate_variants(Recipe._meta.get_field('image').storage, name)
+    ready = Recipe.objects.filter(image=name).exclude(variants_image=name)
+    if ready.update(variants_image=name):
+        # Страницы рецептов в кеше ещё не знают о готовых вариантах.
+        bump_version('recipes')
+
+
+def schedule_variants(image):
+    """Ставит генерацию вариантов картинки в фоновую задачу."""
+    if image:
+        enqueue(generate_recipe_image_variants, name=image.name)
+
+
+def image_variants(recipe):
+    """Карта URL вариантов картинки рецепта для srcset.
+
+    Пока фоновая задача не отметила варианты готовыми в
+    `Recipe.variants_image`, в карте есть только оригинал.
+    """
+    image = recipe.image
+    if not image:
+        return None
+    storage, name = image.storage, image.name
+    variants = {'original': storage.url(name)}
+    if recipe.variants_image != name:
+        return variants
+    for variant, size in IMAGE_VARIANTS.items():
+        variants[variant] = {
+            'width': size,
+            **{
+                extension: storage.url(variant_name(name, variant, extension))
+                for extension in IMAGE_FORMATS
+            }
+        }
+    return variants
@@ -0,0 +1,79 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from recipes.dataset import DatasetBuilder
+from recipes.models import User
+
+
+class Command(BaseCommand):
+    help = (
+        'Генерирует синтетических пользователей, рецепты, подписки, '
+        'избранное и корзины для нагрузочных проверок. Одинаковый seed '
+        'на пустой базе даёт одинаковые данные, кроме случайных токенов '
+        'авторизации.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--users', type=int, default=1000,
+            help='Number of users.'
+        )
+        parser.add_argument(
+            '--recipes', type=int, default=10000,
+            help='Number of recipes.'
+        )
+        parser.add_argument(
+            '--follows', type=int, default=10,
+            help='Average number of followed authors per user.'
+        )
+        parser.add_argument(
+            '--favorites', type=int, default=20,
+            help='Average number of favorite recipes per user.'
+        )
+        parser.add_argument(
+            '--carts', type=int, default=5,
+            help='Average number of recipes in a cart per user.'
+        )
+        parser.add_argument(
+            '--exponent', type=float, default=1.1,
+            help='Zipf exponent of author, recipe and ingredient popularity.'
+        )
+        parser.add_argument(
+            '--seed', type=int, default=0,
+            help='Random seed.'
+        )
+        parser.add_argument(
+            '--batch-size', type=int, default=5000,
+            help='Number of rows written per transaction.'
+        )
+        parser.add_argument(
+            '--prefix', default='user',
+            help='Username prefix, change it to add users to a filled base.'
+        )
+
+    def handle(self, *args, **options):
+        if options['users'] < 1:
+            raise CommandError('At least one user is required.')
+        prefix = options['prefix']
+        if User.objects.filter(username__startswith=prefix).exists():
+            raise CommandError(
+                f'Users named "{prefix}..." already exist, use --prefix.'
+            )
+
+        started = time.monotonic()
+        DatasetBuilder(
+            seed=options['seed'],
+            users=options['users'],
+            recipes=options['recipes'],
+            follows=options['follows'],
+            favorites=options['favorites'],
+            carts=options['carts'],
+            exponent=options['exponent'],
+            batch_size=options['batch_size'],
+            username_prefix=prefix,
+            log=self.stdout.write
+        ).build()
+        self.stdout.write(self.style.SUCCESS(
+            f'Generated {options["users"]} users and {options["recipes"]} '
+            f'recipes in {time.monotonic() - started:.1f}s.'
+        ))
@@ -0,0 +1,244 @@
+import csv
+import io
+import json
+import os
+import sys
+import time
+from itertools import islice
+
+from django.core.exceptions import ValidationError
+from django.core.management.base import BaseCommand, CommandError
+from django.core.validators import MaxLengthValidator
+from django.db import connection, transaction
+from recipes.models import Ingredient, Tag
+from recipes.versions import bump_version
+
+FIELDS = {
+    'ingredients': ('name', 'measurement_unit'),
+    'tags': ('name', 'color', 'slug'),
+}
+MODELS = {
+    'ingredients': Ingredient,
+    'tags': Tag,
+}
+FORMATS = {
+    '.csv': 'csv',
+    '.json': 'json',
+    '.ndjson': 'ndjson',
+    '.jsonl': 'ndjson',
+}
+JSON_CHUNK_SIZE = 1 << 16
+STAGING_TABLE = 'recipes_ingredient_staging'
+
+
+def read_csv(stream, fields):
+    """Строки CSV без заголовка в порядке `fields`."""
+    for row in csv.reader(stream):
+        if row:
+            yield dict(zip(fields, row))
+
+
+def read_ndjson(stream, fields):
+    for line in stream:
+        if line.strip():
+            yield json.loads(line)
+
+
+def read_json(stream, fields):
+    """Объекты JSON-массива по одному, не загружая файл целиком."""
+    decoder = json.JSONDecoder()
+    buffer = stream.read(JSON_CHUNK_SIZE).lstrip()
+    if not buffer.startswith('['):
+        raise CommandError('JSON input must be an array of objects.')
+    position = 1
+    while True:
+        while position < len(buffer) and buffer[position] in ' \t\r\n,':
+            position += 1
+        if position < len(buffer) and buffer[position] == ']':
+            return
+        try:
+            if position == len(buffer):
+                raise ValueError
+            item, position = decoder.raw_decode(buffer, position)
+        except ValueError:
+            chunk = stream.read(JSON_CHUNK_SIZE)
+            if not chunk:
+                raise CommandError('Unexpected end of JSON input.')
+            buffer, position = buffer[position:] + chunk, 0
+            continue
+        yield item
+
+
+READERS = {
+    'csv': read_csv,
+    'json': read_json,
+    'ndjson': read_ndjson,
+}
+
+
+class Command(BaseCommand):
+    help = (
+        'Загружает каталог ингредиентов или тегов из CSV, JSON или NDJSON. '
+        'Повторная загрузка того же файла ничего не дублирует.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'path', help='Input file, "-" to read from stdin.'
+        )
+        parser.add_argument(
+            '--model', choices=tuple(FIELDS), default='ingredients',
+            help='Catalogue to load.'
+        )
+        parser.add_argument(
+            '--format', choices=tuple(READERS),
+            help='Input format, guessed from the file extension by default.'
+        )
+        parser.add_argument(
+            '--batch-size', type=int, default=5000,
+            help='Number of rows written per batch.'
+        )
+
+    def handle(self, *args, **options):
+        path = options['path']
+        input_format = options['format'] or FORMATS.get(
+            os.path.splitext(path)[1].lower()
+        )
+        if input_format is None:
+            raise CommandError('Unable to guess the format, use --format.')
+
+        model_name = options['model']
+        load = getattr(self, f'load_{model_name}')
+        if model_name == 'ingredients' and connection.vendor == 'postgresql':
+            load = self.copy_ingredients
+        self.model = MODELS[model_name]
+        self.fields = FIELDS[model_name]
+        self.verbosity = options['verbosity']
+        self.skipped = 0
+
+        stream = (
+            sys.stdin if path == '-'
+            else open(path, encoding='utf-8', newline='')
+        )
+        with stream:
+            rows = self.clean(READERS[input_format](stream, self.fields))
+            started = reported = time.monotonic()
+            read = written = 0
+            while True:
+                batch = list(islice(rows, options['batch_size']))
+                if not batch:
+                    break
+                written += load(batch)
+                read += len(batch)
+                now = time.monotonic()
+                if now - reported >= 1:
+                    reported = now
+                    self.stdout.write(
+                        f'{read} rows, {read / (now - started):.0f} rows/s'
+                    )
+
+        elapsed = max(time.monotonic() - started, 1e-6)
+        bump_version(model_name, 'recipes')
+        self.stdout.write(self.style.SUCCESS(
+            f'Loaded {read} rows in {elapsed:.2f}s '
+            f'({read / elapsed:.0f} rows/s): {written} written, '
+            f'{read - written} already present, {self.skipped} skipped.'
+        ))
+
+    def clean(self, items):
+        """Отбрасывает строки, не проходящие валидаторы полей модели."""
+        checks = []
+        for name in self.fields:
+            field = self.model._meta.get_field(name)
+            validators = [
+                validator for validator in field.validators
+                if not isinstance(validator, MaxLengthValidator)
+            ]
+            checks.append((name, field.null, field.max_length, validators))
+
+        for number, item in enumerate(items, 1):
+            if not isinstance(item, dict):
+                item = {}
+            row, invalid = {}, []
+            for name, null, max_length, validators in checks:
+                value = str(item.get(name) or '').strip() or None
+                row[name] = value
+                if value is None:
+                    if not null:
+                        invalid.append(name)
+                    continue
+                try:
+                    if len(value) > max_length:
+                        raise ValidationError('Value is too long.')
+                    for validator in validators:
+                        validator(value)
+                except ValidationError:
+                    invalid.append(name)
+            if invalid:
+                self.skipped += 1
+                if self.verbosity > 1:
+                    self.stderr.write(
+                        f'Row {number} skipped, invalid: {", ".join(invalid)}.'
+                    )
+                continue
+            yield row
+
+    def load_ingredients(self, batch):
+        """Пакетный INSERT с пропуском дублей в синтаксисе текущей СУБД.
+
+        То же, что bulk_create(ignore_conflicts=True), но без сборки
+        моделей и SQL на каждую строку: один executemany на пакет.
+        """
+        ops = connection.ops
+        sql = ' '.join(filter(None, (
+            ops.insert_statement(ignore_conflicts=True),
+            f'{Ingredient._meta.db_table} (name, measurement_unit)',
+            'VALUES (%s, %s)',
+            ops.ignore_conflicts_suffix_sql(ignore_conflicts=True),
+        )))
+        with transaction.atomic(), connection.cursor() as cursor:
+            cursor.executemany(sql, [
+                (row['name'], row['measurement_unit']) for row in batch
+            ])
+            return cursor.rowcount
+
+    def copy_ingredients(self, batch):
+        """PostgreSQL: COPY во временную таблицу и один INSERT из неё."""
+        buffer = io.StringIO()
+        csv.writer(buffer).writerows(
+            (row['name'], row['measurement_unit']) for row in batch
+        )
+        buffer.seek(0)
+        table = Ingredient._meta.db_table
+        with transaction.atomic(), connection.cursor() as cursor:
+            cursor.execute(
+                f'CREATE TEMP TABLE IF NOT EXISTS {STAGING_TABLE} '
+                '(name text, measurement_unit text) ON COMMIT DELETE ROWS'
+            )
+            cursor.copy_expert(
+                f'COPY {STAGING_TABLE} (name, measurement_unit) '
+                'FROM STDIN WITH (FORMAT csv)',
+                buffer
+            )
+            cursor.execute(
+                f'INSERT INTO {table} (name, measurement_unit) '
+                f'SELECT DISTINCT name, measurement_unit FROM {STAGING_TABLE} '
+                'ON CONFLICT ON CONSTRAINT unique_ingredient DO NOTHING'
+            )
+            return cursor.rowcount
+
+    def load_tags(self, batch):
+        # Тегов единицы: save() назначает бит маски, поэтому без bulk.
+        written = 0
+        with transaction.atomic():
+            for row in batch:
+                tag, created = Tag.objects.get_or_create(
+                    slug=row['slug'], defaults=row
+                )
+                if created:
+                    written += 1
+                elif (tag.name, tag.color) != (row['name'], row['color']):
+                    tag.name, tag.color = row['name'], row['color']
+                    tag.save(update_fields=('name', 'color'))
+                    written += 1
+        return written
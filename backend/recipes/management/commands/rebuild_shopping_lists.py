@@ -0,0 +1,57 @@
+from django.core.management.base import BaseCommand, CommandError
+from recipes.models import Cart, ShoppingListItem
+
+
+class Command(BaseCommand):
+    help = (
+        'Сверяет агрегат списков покупок с корзинами пользователей '
+        'и пересчитывает расхождения.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--verify', action='store_true',
+            help='Only report drift, do not repair it.'
+        )
+        parser.add_argument(
+            '--batch-size', type=int, default=500,
+            help='Number of users checked per batch.'
+        )
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        user_ids = sorted(
+            set(Cart.objects.values_list('user_id', flat=True))
+            | set(ShoppingListItem.objects.values_list('user_id', flat=True))
+        )
+
+        drifted = []
+        for start in range(0, len(user_ids), batch_size):
+            batch = user_ids[start:start + batch_size]
+            expected = ShoppingListItem.objects.expected(batch)
+            actual = {
+                (user_id, ingredient_id): amount
+                for user_id, ingredient_id, amount in
+                ShoppingListItem.objects.filter(
+                    user_id__in=batch
+                ).values_list('user_id', 'ingredient_id', 'amount')
+            }
+            broken = sorted({
+                user_id
+                for user_id, ingredient_id in set(expected) | set(actual)
+                if expected.get((user_id, ingredient_id), 0)
+                != actual.get((user_id, ingredient_id), 0)
+            })
+            if broken and not options['verify']:
+                ShoppingListItem.objects.rebuild(broken)
+            drifted.extend(broken)
+
+        self.stdout.write(
+            f'Checked {len(user_ids)} users, drifted: {len(drifted)}.'
+        )
+        if drifted and options['verify']:
+            raise CommandError(
+                f'Shopping lists out of sync for users: {drifted}.'
+            )
+        if drifted:
+            self.stdout.write(self.style.SUCCESS('Shopping lists rebuilt.'))
@@ -0,0 +1,43 @@
+from django.core.management.base import BaseCommand
+from recipes.models import Recipe, User
+from users.models import AuthorStats
+
+
+class Command(BaseCommand):
+    help = (
+        'Пересчитывает денормализованные счётчики рецептов '
+        '(избранное, корзины) и авторов (рецепты, подписчики).'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size', type=int, default=1000,
+            help='Number of rows recounted per batch.'
+        )
+
+    @staticmethod
+    def batches(queryset, batch_size):
+        ids = queryset.order_by('pk').values_list('pk', flat=True)
+        last = 0
+        while True:
+            batch = list(ids.filter(pk__gt=last)[:batch_size])
+            if not batch:
+                return
+            yield batch
+            last = batch[-1]
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+
+        recipes = 0
+        for batch in self.batches(Recipe.objects.all(), batch_size):
+            recipes += Recipe.objects.recount(batch)
+
+        changed = 0
+        for batch in self.batches(User.objects.all(), batch_size):
+            changed += AuthorStats.objects.recount(batch)
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Recounted {recipes} recipes, '
+            f'updated stats for {changed} authors.'
+        ))
@@ -0,0 +1,40 @@
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AlterModelOptions(
+            name='recipe',
+            options={'ordering': ('-pub_date',)},
+        ),
+        migrations.RenameField(
+            model_name='recipe',
+            old_name='ingredient',
+            new_name='ingredients',
+        ),
+        migrations.RenameField(
+            model_name='recipe',
+            old_name='tag',
+            new_name='tags',
+        ),
+        # Модель Follow переехала в приложение users: таблица
+        # переименовывается, данные сохраняются.
+        migrations.SeparateDatabaseAndState(
+            state_operations=[
+                migrations.DeleteModel(
+                    name='Follow',
+                ),
+            ],
+            database_operations=[
+                migrations.AlterModelTable(
+                    name='Follow',
+                    table='users_follow',
+                ),
+            ],
+        ),
+    ]
@@ -0,0 +1,41 @@
+# Generated by Django 3.2.15 on 2026-10-18 19:07
+
+from django.db import migrations, models
+from django.db.models import OuterRef
+
+from core.db import count_subquery
+
+
+def fill_counters(apps, schema_editor):
+    Recipe = apps.get_model('recipes', 'Recipe')
+    Favorite = apps.get_model('recipes', 'Favorite')
+    Cart = apps.get_model('recipes', 'Cart')
+    Recipe.objects.update(
+        favorites_count=count_subquery(
+            Favorite.objects.filter(recipe=OuterRef('pk')), 'recipe'
+        ),
+        carts_count=count_subquery(
+            Cart.objects.filter(recipe=OuterRef('pk')), 'recipe'
+        )
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0003_shoppinglistitem'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='recipe',
+            name='carts_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='recipe',
+            name='favorites_count',
+            field=models.PositiveIntegerField(db_index=True, default=0),
+        ),
+        migrations.RunPython(fill_counters, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,49 @@
+# Generated by Django 3.2.15 on 2026-10-18 19:16
+
+from django.db import migrations, models
+
+MAX_TAG_BITS = 63
+
+
+def fill_tag_bits(apps, schema_editor):
+    Tag = apps.get_model('recipes', 'Tag')
+    Recipe = apps.get_model('recipes', 'Recipe')
+    tags = list(Tag.objects.order_by('id')[:MAX_TAG_BITS])
+    for bit, tag in enumerate(tags):
+        tag.bit = bit
+    Tag.objects.bulk_update(tags, ('bit',))
+
+    masks = {}
+    rows = Recipe.tags.through.objects.filter(
+        tag__bit__isnull=False
+    ).values_list('recipe_id', 'tag__bit')
+    for recipe_id, bit in rows.iterator():
+        masks[recipe_id] = masks.get(recipe_id, 0) | 1 << bit
+    Recipe.objects.bulk_update(
+        [Recipe(id=_id, tags_mask=mask) for _id, mask in masks.items()],
+        ('tags_mask',),
+        batch_size=1000
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0004_recipe_counters'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='recipe',
+            name='tags_mask',
+            field=models.BigIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='tag',
+            name='bit',
+            field=models.PositiveSmallIntegerField(
+                editable=False, null=True, unique=True
+            ),
+        ),
+        migrations.RunPython(fill_tag_bits, migrations.RunPython.noop),
+    ]
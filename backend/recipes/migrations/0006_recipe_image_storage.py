@@ -0,0 +1,24 @@
+# Generated by Django 3.2.15 on 2026-10-18 19:24
+
+from django.db import migrations, models
+import recipes.storage
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0005_tag_bits'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='recipe',
+            name='image',
+            field=models.ImageField(
+                default=None,
+                null=True,
+                storage=recipes.storage.ContentAddressedStorage(),
+                upload_to='recipe/images/'
+            ),
+        ),
+    ]
@@ -0,0 +1,37 @@
+# Generated by Django 3.2.15 on 2026-10-18 20:21
+
+import os
+
+from django.db import migrations, models
+from recipes.settings import IMAGE_VARIANTS
+
+
+def fill_variants_image(apps, schema_editor):
+    # Варианты, уже сделанные фоновыми задачами, проверяются один раз.
+    Recipe = apps.get_model('recipes', 'Recipe')
+    storage = Recipe._meta.get_field('image').storage
+    first = next(iter(IMAGE_VARIANTS))
+    names = Recipe.objects.exclude(image=None).exclude(image='').values_list(
+        'image', flat=True
+    ).distinct()
+    for name in names.iterator():
+        if storage.exists(f'{os.path.splitext(name)[0]}.{first}.webp'):
+            Recipe.objects.filter(image=name).update(variants_image=name)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0007_recipe_counters_not_editable'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='recipe',
+            name='variants_image',
+            field=models.CharField(
+                blank=True, default='', editable=False, max_length=100
+            ),
+        ),
+        migrations.RunPython(fill_variants_image, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,25 @@
+# Generated by Django 3.2.15 on 2026-10-18 20:24
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0008_recipe_variants_image'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DataVersion',
+            fields=[
+                ('name', models.CharField(
+                    max_length=50, primary_key=True, serialize=False
+                )),
+                ('stamp', models.CharField(max_length=32)),
+                ('modified', models.PositiveIntegerField(
+                    verbose_name='Modified, unix time'
+                )),
+            ],
+        ),
+    ]
@@ -1,8 +1,13 @@
+from core.db import count_subquery
 from django.contrib.auth import get_user_model
 from django.core.validators import MinValueValidator, RegexValidator
-from django.db import models
+from django.db import models, transaction
+from django.db.models import F, OuterRef, Sum
+from django.db.models.functions import Greatest
 
-from .settings import MAX_LENGTH_CHAR_FIELD, MAX_LENGTH_COLOR_FIELD
+from .settings import (MAX_LENGTH_CHAR_FIELD, MAX_LENGTH_COLOR_FIELD,
+                       MAX_TAG_BITS)
+from .storage import ContentAddressedStorage
 
 User = get_user_model()
 
@@ -22,6 +27,12 @@ class Tag(models.Model):
             RegexValidator(regex='^[-a-zA-Z0-9_]+$')
         ]
     )
+    # Номер бита тега в Recipe.tags_mask; None, если биты закончились.
+    bit = models.PositiveSmallIntegerField(
+        unique=True,
+        null=True,
+        editable=False
+    )
 
     class Meta:
         ordering = ('name', )
@@ -29,6 +40,16 @@ class Tag(models.Model):
     def __str__(self):
         return self.name
 
+    def save(self, *args, **kwargs):
+        if self.bit is None:
+            used = set(
+                Tag.objects.exclude(bit=None).values_list('bit', flat=True)
+            )
+            self.bit = next(
+                (bit for bit in range(MAX_TAG_BITS) if bit not in used), None
+            )
+        super().save(*args, **kwargs)
+
 
 class Ingredient(models.Model):
     """Модуль для создания ингредиентов."""
@@ -50,6 +71,44 @@ class Ingredient(models.Model):
         return self.name
 
 
+class RecipeManager(models.Manager):
+    """Атомарное обновление и пересчёт счётчиков рецептов."""
+
+    def bump(self, recipe_id, **deltas):
+        """Изменяет счётчики рецепта на `deltas` одним UPDATE с F()."""
+        self.filter(pk=recipe_id).update(**{
+            field: Greatest(F(field) + delta, 0)
+            for field, delta in deltas.items()
+        })
+
+    def refresh_tags_mask(self, recipe_ids):
+        """Пересчитывает битовые маски тегов рецептов."""
+        masks = dict.fromkeys(recipe_ids, 0)
+        rows = self.model.tags.through.objects.filter(
+            recipe_id__in=masks, tag__bit__isnull=False
+        ).values_list('recipe_id', 'tag__bit')
+        for recipe_id, bit in rows:
+            masks[recipe_id] |= 1 << bit
+        self.bulk_update(
+            [
+                self.model(id=recipe_id, tags_mask=mask)
+                for recipe_id, mask in masks.items()
+            ],
+            ('tags_mask',)
+        )
+
+    def recount(self, recipe_ids):
+        """Пересчитывает счётчики рецептов по исходным таблицам."""
+        return self.filter(pk__in=recipe_ids).update(
+            favorites_count=count_subquery(
+                Favorite.objects.filter(recipe=OuterRef('pk')), 'recipe'
+            ),
+            carts_count=count_subquery(
+                Cart.objects.filter(recipe=OuterRef('pk')), 'recipe'
+            )
+        )
+
+
 class Recipe(models.Model):
     """Модель для рецептов"""
     tags = models.ManyToManyField('Tag', related_name='recipe')
@@ -73,6 +132,7 @@ class Recipe(models.Model):
     name = models.CharField(max_length=MAX_LENGTH_CHAR_FIELD)
     image = models.ImageField(
         upload_to='recipe/images/',
+        storage=ContentAddressedStorage(),
         null=True,
         default=None
     )
@@ -84,6 +144,18 @@ class Recipe(models.Model):
             MinValueValidator(1, 'minimal time - 1 min')
         ]
     )
+    favorites_count = models.PositiveIntegerField(
+        default=0, db_index=True, editable=False
+    )
+    carts_count = models.PositiveIntegerField(default=0, editable=False)
+    # Теги рецепта битами Tag.bit: фильтр по тегам без JOIN и DISTINCT.
+    tags_mask = models.BigIntegerField(default=0, editable=False)
+    # Картинка, для которой фоновая задача уже сделала варианты.
+    variants_image = models.CharField(
+        max_length=100, blank=True, default='', editable=False
+    )
+
+    objects = RecipeManager()
 
     class Meta:
         ordering = ('-pub_date', )
@@ -171,3 +243,152 @@ class Cart(models.Model):
         ]
 
 
+class ShoppingListManager(models.Manager):
+    """Поддержка агрегата списка покупок."""
+
+    def apply_deltas(self, deltas):
+        """Применяет изменения `{(id пользователя, id ингредиента): delta}`.
+
+        Недостающие строки создаются с нулём, затем все строки меняются
+        одним UPDATE `amount = GREATEST(amount + delta, 0)`. Строку,
+        созданную параллельным запросом, пропускает ON CONFLICT DO
+        NOTHING, а UPDATE по F() не теряет чужих изменений. Строки с
+        нулём не удаляются, чтобы параллельное прибавление не попало в
+        удалённую строку; в списке покупок они не выводятся.
+        """
+        deltas = {key: delta for key, delta in deltas.items() if delta}
+        if not deltas:
+            return
+
+        with transaction.atomic():
+            self.bulk_create(
+                [
+                    self.model(
+                        user_id=user_id, ingredient_id=ingredient_id, amount=0
+                    )
+                    for user_id, ingredient_id in deltas
+                ],
+                ignore_conflicts=True
+            )
+            rows = self.filter(
+                user_id__in={user_id for user_id, _ in deltas},
+                ingredient_id__in={_id for _, _id in deltas}
+            ).values_list('id', 'user_id', 'ingredient_id')
+            self.bulk_update(
+                [
+                    self.model(
+                        id=row_id,
+                        amount=Greatest(
+                            F('amount') + deltas[user_id, ingredient_id], 0
+                        )
+                    )
+                    for row_id, user_id, ingredient_id in rows
+                    if (user_id, ingredient_id) in deltas
+                ],
+                ('amount',)
+            )
+
+    def add_recipe(self, user_id, recipe_id, sign=1):
+        """Добавляет (sign=1) или вычитает (sign=-1) ингредиенты рецепта."""
+        self.add_recipes(user_id, [recipe_id], sign)
+
+    def add_recipes(self, user_id, recipe_ids, sign=1):
+        """То же для нескольких рецептов одним запросом."""
+        deltas = {}
+        amounts = IngredientAmount.objects.filter(
+            recipe_id__in=recipe_ids, ingredient__isnull=False
+        ).values_list('ingredient_id', 'amount')
+        for ingredient_id, amount in amounts:
+            key = (user_id, ingredient_id)
+            deltas[key] = deltas.get(key, 0) + sign * amount
+        self.apply_deltas(deltas)
+
+    def change_recipe(self, recipe_id, changes):
+        """Переносит изменения состава рецепта `{id ингредиента: delta}`
+        в списки покупок всех пользователей, у которых рецепт в корзине."""
+        changes = {_id: delta for _id, delta in changes.items() if delta}
+        if not changes:
+            return
+
+        user_ids = Cart.objects.filter(
+            recipe_id=recipe_id
+        ).values_list('user_id', flat=True)
+        self.apply_deltas({
+            (user_id, ingredient_id): delta
+            for user_id in user_ids
+            for ingredient_id, delta in changes.items()
+        })
+
+    @staticmethod
+    def expected(user_ids):
+        """Агрегат, посчитанный заново по корзинам пользователей."""
+        rows = IngredientAmount.objects.filter(
+            recipe__carts__user__id__in=user_ids,
+            ingredient__isnull=False
+        ).values(
+            'recipe__carts__user', 'ingredient'
+        ).annotate(
+            total=Sum('amount')
+        ).order_by()
+        return {
+            (row['recipe__carts__user'], row['ingredient']): row['total']
+            for row in rows
+        }
+
+    def rebuild(self, user_ids):
+        """Пересчитывает списки покупок пользователей с нуля."""
+        user_ids = list(user_ids)
+        with transaction.atomic():
+            self.filter(user_id__in=user_ids).delete()
+            self.bulk_create(
+                self.model(
+                    user_id=user_id, ingredient_id=ingredient_id, amount=total
+                )
+                for (user_id, ingredient_id), total in self.expected(
+                    user_ids).items()
+                if total
+            )
+
+
+class ShoppingListItem(models.Model):
+    """Суммарное количество ингредиента в списке покупок пользователя.
+
+    Обновляется инкрементально при изменении корзины и состава рецептов,
+    сверяется и пересчитывается командой `rebuild_shopping_lists`.
+    """
+
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='shopping_list'
+    )
+    ingredient = models.ForeignKey(
+        Ingredient,
+        on_delete=models.CASCADE,
+        related_name='shopping_list_items'
+    )
+    amount = models.PositiveIntegerField(default=0)
+
+    objects = ShoppingListManager()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=['user', 'ingredient'],
+                name='unique_shopping_list_item'
+            )
+        ]
+
+    def __str__(self):
+        return f'{self.user} {self.ingredient}'
+
+
+class DataVersion(models.Model):
+    """Версия данных для ETag и ключей кэшей, см. `recipes.versions`."""
+
+    name = models.CharField(max_length=50, primary_key=True)
+    stamp = models.CharField(max_length=32)
+    modified = models.PositiveIntegerField('Modified, unix time')
+
+    def __str__(self):
+        return f'{self.name} {self.stamp}'
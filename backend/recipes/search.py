@@ -0,0 +1,133 @@
+"""Полнотекстовый поиск по названию и описанию рецептов.
+
+Индекс не описан в моделях, а создаётся идемпотентно после миграций:
+
+* PostgreSQL — колонка `search_vector` (tsvector), которую заполняет
+  триггер по русской и английской конфигурациям, и GIN-индекс по ней;
+* SQLite — теневая таблица FTS5 `recipes_recipe_fts` с триггерами.
+"""
+import re
+
+from django.db.models import BooleanField, FloatField
+from django.db.models.expressions import RawSQL
+
+FTS_TABLE = 'recipes_recipe_fts'
+
+POSTGRESQL_DDL = (
+    'ALTER TABLE recipes_recipe ADD COLUMN IF NOT EXISTS search_vector '
+    'tsvector',
+    """
+    CREATE OR REPLACE FUNCTION recipes_recipe_search_vector() RETURNS trigger
+    AS $$
+    BEGIN
+        NEW.search_vector :=
+            setweight(to_tsvector('russian', coalesce(NEW.name, '')), 'A')
+            || setweight(to_tsvector('english', coalesce(NEW.name, '')), 'A')
+            || setweight(to_tsvector('russian', coalesce(NEW.text, '')), 'B')
+            || setweight(to_tsvector('english', coalesce(NEW.text, '')), 'B');
+        RETURN NEW;
+    END
+    $$ LANGUAGE plpgsql
+    """,
+    'DROP TRIGGER IF EXISTS recipes_recipe_search_vector ON recipes_recipe',
+    """
+    CREATE TRIGGER recipes_recipe_search_vector
+    BEFORE INSERT OR UPDATE OF name, text ON recipes_recipe
+    FOR EACH ROW EXECUTE FUNCTION recipes_recipe_search_vector()
+    """,
+    'CREATE INDEX IF NOT EXISTS recipes_recipe_search_vector_gin '
+    'ON recipes_recipe USING gin (search_vector)',
+    # Заполнение для строк, созданных до появления триггера.
+    'UPDATE recipes_recipe SET name = name WHERE search_vector IS NULL',
+)
+
+SQLITE_TRIGGERS = (
+    f"""
+    CREATE TRIGGER IF NOT EXISTS recipes_recipe_fts_insert
+    AFTER INSERT ON recipes_recipe BEGIN
+        INSERT INTO {FTS_TABLE} (rowid, name, text)
+        VALUES (new.id, new.name, new.text);
+    END
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS recipes_recipe_fts_delete
+    AFTER DELETE ON recipes_recipe BEGIN
+        INSERT INTO {FTS_TABLE} ({FTS_TABLE}, rowid, name, text)
+        VALUES ('delete', old.id, old.name, old.text);
+    END
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS recipes_recipe_fts_update
+    AFTER UPDATE OF name, text ON recipes_recipe BEGIN
+        INSERT INTO {FTS_TABLE} ({FTS_TABLE}, rowid, name, text)
+        VALUES ('delete', old.id, old.name, old.text);
+        INSERT INTO {FTS_TABLE} (rowid, name, text)
+        VALUES (new.id, new.name, new.text);
+    END
+    """,
+)
+
+
+def install_search_index(connection):
+    """Создаёт или восстанавливает поисковый индекс для `connection`.
+
+    На SQLite триггеры пропадают при пересоздании таблицы миграциями,
+    поэтому установка повторяется после каждого `migrate`.
+    """
+    with connection.cursor() as cursor:
+        if connection.vendor == 'postgresql':
+            for statement in POSTGRESQL_DDL:
+                cursor.execute(statement)
+        elif connection.vendor == 'sqlite':
+            created = FTS_TABLE not in connection.introspection.table_names(
+                cursor
+            )
+            cursor.execute(
+                f'CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} USING fts5('
+                "name, text, content='recipes_recipe', content_rowid='id', "
+                "tokenize='unicode61 remove_diacritics 2')"
+            )
+            for statement in SQLITE_TRIGGERS:
+                cursor.execute(statement)
+            if created:
+                cursor.execute(
+                    f"INSERT INTO {FTS_TABLE} ({FTS_TABLE}) VALUES ('rebuild')"
+                )
+
+
+def search_recipes(queryset, value, connection):
+    """Фильтрует рецепты по поисковой строке и сортирует по релевантности."""
+    if connection.vendor == 'postgresql':
+        query = (
+            "websearch_to_tsquery('russian', %s) "
+            "|| websearch_to_tsquery('english', %s)"
+        )
+        return queryset.filter(RawSQL(
+            f'recipes_recipe.search_vector @@ ({query})',
+            (value, value),
+            output_field=BooleanField()
+        )).annotate(rank=RawSQL(
+            f'ts_rank(recipes_recipe.search_vector, {query})',
+            (value, value),
+            output_field=FloatField()
+        )).order_by('-rank', '-pub_date', '-id')
+
+    if connection.vendor == 'sqlite':
+        words = re.findall(r'\w+', value)
+        if not words:
+            return queryset.none()
+        # Каждое слово — префиксный поиск, слова объединяются через AND.
+        match = ' '.join(f'"{word}"*' for word in words)
+        return queryset.filter(RawSQL(
+            f'recipes_recipe.id IN (SELECT rowid FROM {FTS_TABLE} '
+            f'WHERE {FTS_TABLE} MATCH %s)',
+            (match,),
+            output_field=BooleanField()
+        )).annotate(rank=RawSQL(
+            f'(SELECT bm25({FTS_TABLE}, 10.0, 1.0) FROM {FTS_TABLE} '
+            f'WHERE {FTS_TABLE} MATCH %s AND rowid = recipes_recipe.id)',
+            (match,),
+            output_field=FloatField()
+        )).order_by('rank', '-pub_date', '-id')
+
+    return queryset.filter(name__icontains=value)
@@ -1,2 +1,13 @@
 MAX_LENGTH_CHAR_FIELD = 200
 MAX_LENGTH_COLOR_FIELD = 7
+MAX_TAG_BITS = 63
+# Уменьшенные копии картинок рецептов: наибольшая сторона в пикселях.
+IMAGE_VARIANTS = {
+    'card': 480,
+    'detail': 1200,
+}
+IMAGE_FORMATS = {
+    'webp': 'WEBP',
+    'jpeg': 'JPEG',
+}
+IMAGE_QUALITY = 80
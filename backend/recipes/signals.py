@@ -0,0 +1,176 @@
+from contextvars import ContextVar
+
+from django.db import connections
+from django.db.models import F
+from django.db.models.signals import (m2m_changed, post_delete, post_save,
+                                      pre_delete, pre_save)
+from django.dispatch import receiver
+
+from .images import schedule_variants
+from .models import (Cart, Favorite, Ingredient, IngredientAmount, Recipe,
+                     ShoppingListItem, Tag, User)
+from .search import install_search_index
+from .versions import bump_version
+
+
+@receiver(post_save, sender=Cart)
+def add_to_shopping_list(sender, instance, created, **kwargs):
+    if created:
+        ShoppingListItem.objects.add_recipe(
+            instance.user_id, instance.recipe_id
+        )
+
+
+@receiver(pre_delete, sender=Cart)
+def remove_from_shopping_list(sender, instance, **kwargs):
+    # pre_delete: при каскадном удалении рецепта его ингредиенты
+    # ещё не удалены.
+    ShoppingListItem.objects.add_recipe(
+        instance.user_id, instance.recipe_id, sign=-1
+    )
+
+
+# Рецепты, которые сейчас удаляются: их ингредиенты уходят из списков
+# покупок вместе с корзинами, см. remove_from_shopping_list.
+deleting_recipes = ContextVar('deleting_recipes', default=frozenset())
+
+
+@receiver(pre_delete, sender=Recipe)
+def mark_recipe_deleting(sender, instance, **kwargs):
+    deleting_recipes.set(deleting_recipes.get() | {instance.pk})
+
+
+@receiver(post_delete, sender=Recipe)
+def unmark_recipe_deleting(sender, instance, **kwargs):
+    deleting_recipes.set(deleting_recipes.get() - {instance.pk})
+
+
+def change_recipes(rows):
+    """Переносит изменения ингредиентов `(рецепт, ингредиент, delta)`
+    в списки покупок тех, у кого рецепт в корзине."""
+    changes = {}
+    for recipe_id, ingredient_id, delta in rows:
+        if ingredient_id is not None:
+            recipe = changes.setdefault(recipe_id, {})
+            recipe[ingredient_id] = recipe.get(ingredient_id, 0) + delta
+    for recipe_id, recipe_changes in changes.items():
+        ShoppingListItem.objects.change_recipe(recipe_id, recipe_changes)
+    bump_version('recipes')
+
+
+@receiver(pre_save, sender=IngredientAmount)
+def remember_ingredient_amount(sender, instance, raw, **kwargs):
+    instance.saved_row = None
+    if not raw and instance.pk is not None:
+        instance.saved_row = sender.objects.filter(
+            pk=instance.pk
+        ).values_list('recipe_id', 'ingredient_id', 'amount').first()
+
+
+@receiver(post_save, sender=IngredientAmount)
+def save_ingredient_amount(sender, instance, raw, **kwargs):
+    if raw:
+        return
+    rows = [(instance.recipe_id, instance.ingredient_id, instance.amount)]
+    if instance.saved_row is not None:
+        recipe_id, ingredient_id, amount = instance.saved_row
+        rows.append((recipe_id, ingredient_id, -amount))
+    change_recipes(rows)
+
+
+@receiver(post_delete, sender=IngredientAmount)
+def delete_ingredient_amount(sender, instance, **kwargs):
+    if instance.recipe_id not in deleting_recipes.get():
+        change_recipes(
+            [(instance.recipe_id, instance.ingredient_id, -instance.amount)]
+        )
+
+
+@receiver(post_save, sender=Favorite)
+def increment_favorites_count(sender, instance, created, **kwargs):
+    if created:
+        Recipe.objects.bump(instance.recipe_id, favorites_count=1)
+
+
+@receiver(post_delete, sender=Favorite)
+def decrement_favorites_count(sender, instance, **kwargs):
+    Recipe.objects.bump(instance.recipe_id, favorites_count=-1)
+
+
+@receiver(post_save, sender=Cart)
+def increment_carts_count(sender, instance, created, **kwargs):
+    if created:
+        Recipe.objects.bump(instance.recipe_id, carts_count=1)
+
+
+@receiver(post_delete, sender=Cart)
+def decrement_carts_count(sender, instance, **kwargs):
+    Recipe.objects.bump(instance.recipe_id, carts_count=-1)
+
+
+@receiver(post_save, sender=Tag)
+@receiver(post_delete, sender=Tag)
+def bump_tags_version(sender, **kwargs):
+    bump_version('tags', 'recipes')
+
+
+@receiver(m2m_changed, sender=Recipe.tags.through)
+def refresh_tags_mask(sender, instance, action, reverse, pk_set, **kwargs):
+    if action not in ('post_add', 'post_remove', 'post_clear'):
+        return
+    if not reverse:
+        recipe_ids = [instance.pk]
+    elif action == 'post_clear':
+        recipe_ids = tagged_recipe_ids(instance)
+    else:
+        recipe_ids = pk_set
+    Recipe.objects.refresh_tags_mask(recipe_ids)
+
+
+@receiver(post_delete, sender=Tag)
+def clear_tag_bit(sender, instance, **kwargs):
+    # Связи с рецептами удаляются каскадом без m2m_changed.
+    Recipe.objects.refresh_tags_mask(tagged_recipe_ids(instance))
+
+
+def tagged_recipe_ids(tag):
+    if tag.bit is None:
+        return []
+    return list(
+        Recipe.objects.alias(
+            tag_match=F('tags_mask').bitand(1 << tag.bit)
+        ).exclude(tag_match=0).values_list('id', flat=True)
+    )
+
+
+@receiver(post_save, sender=Ingredient)
+@receiver(post_delete, sender=Ingredient)
+def bump_ingredients_version(sender, **kwargs):
+    bump_version('ingredients', 'recipes')
+
+
+@receiver(post_save, sender=Recipe)
+@receiver(post_delete, sender=Recipe)
+@receiver(m2m_changed, sender=Recipe.tags.through)
+def bump_recipes_version(sender, **kwargs):
+    bump_version('recipes')
+
+
+@receiver(post_save, sender=Recipe)
+def generate_image_variants(sender, instance, update_fields, **kwargs):
+    # Варианты нужны только новой картинке.
+    if update_fields is not None and 'image' not in update_fields:
+        return
+    if instance.image and instance.variants_image != instance.image.name:
+        schedule_variants(instance.image)
+
+
+@receiver(post_save, sender=User)
+def bump_recipes_version_on_author_change(sender, update_fields, **kwargs):
+    # Вход пользователя обновляет только last_login, это не данные автора.
+    if update_fields is None or set(update_fields) != {'last_login'}:
+        bump_version('recipes')
+
+
+def install_search(sender, using, **kwargs):
+    install_search_index(connections[using])
@@ -0,0 +1,43 @@
+import hashlib
+import os
+
+from django.core.files import File
+from django.core.files.storage import FileSystemStorage
+from django.utils.deconstruct import deconstructible
+
+
+def file_digest(content):
+    """SHA-256 содержимого файла; позиция чтения возвращается в начало."""
+    digest = hashlib.sha256()
+    content.seek(0)
+    for chunk in content.chunks():
+        digest.update(chunk)
+    content.seek(0)
+    return digest.hexdigest()
+
+
+@deconstructible
+class ContentAddressedStorage(FileSystemStorage):
+    """Файловое хранилище с именами по хешу содержимого.
+
+    `save` кладёт файл в `<каталог>/<xx>/<sha256>.<ext>`: одинаковые
+    картинки хранятся один раз, а содержимое по одному URL не меняется,
+    поэтому его можно кешировать бессрочно.
+    """
+
+    def save(self, name, content, max_length=None):
+        if not hasattr(content, 'chunks'):
+            content = File(content, name)
+        directory = os.path.dirname(name)
+        extension = os.path.splitext(name)[1].lower()
+        digest = file_digest(content)
+        name = os.path.join(directory, digest[:2], digest + extension)
+        if self.exists(name):
+            return name
+        return super().save(name, content, max_length)
+
+    def save_as(self, name, content):
+        """Записывает файл под точным `name`, если его ещё нет."""
+        if self.exists(name):
+            return name
+        return super().save(name, content)
@@ -0,0 +1,60 @@
+"""Версии данных для ETag, Last-Modified и ключей кэшей страниц.
+
+Версия хранится в таблице DataVersion и копируется в кэш Django на
+VERSION_CACHE_TIMEOUT секунд. С общим для процессов CACHES (Redis,
+memcached) новую версию после `bump_version` сразу видят все процессы;
+с LocMemCache остальные процессы перечитают её из базы не позже чем
+через VERSION_CACHE_TIMEOUT секунд.
+"""
+import time
+import uuid
+
+from django.core.cache import cache
+from django.db import transaction
+from django.dispatch import Signal
+
+from backend.settings import VERSION_CACHE_TIMEOUT
+
+from .models import DataVersion
+
+KEY = 'data-version:{}'
+
+# Отправляется после смены версий в этом процессе, аргумент `names`.
+version_changed = Signal()
+
+
+def new_stamp():
+    return uuid.uuid4().hex, int(time.time())
+
+
+def get_version(name):
+    """Версия данных `name`: пара (метка, время изменения в секундах).
+
+    Версия, которой ещё нет в базе, создаётся при первом чтении.
+    """
+    key = KEY.format(name)
+    stamp = cache.get(key)
+    if stamp is None:
+        version, _ = DataVersion.objects.get_or_create(
+            name=name, defaults=dict(zip(('stamp', 'modified'), new_stamp()))
+        )
+        stamp = version.stamp, version.modified
+        cache.set(key, stamp, VERSION_CACHE_TIMEOUT)
+    return stamp
+
+
+def bump_version(*names):
+    """Меняет версии данных `names` после фиксации транзакции."""
+    def bump():
+        stamps = {name: new_stamp() for name in names}
+        for name, (stamp, modified) in stamps.items():
+            DataVersion.objects.update_or_create(
+                name=name, defaults={'stamp': stamp, 'modified': modified}
+            )
+        cache.set_many(
+            {KEY.format(name): stamp for name, stamp in stamps.items()},
+            VERSION_CACHE_TIMEOUT
+        )
+        version_changed.send(sender=None, names=names)
+
+    transaction.on_commit(bump)
@@ -1,5 +1,7 @@
+from core.models import Job, SlowQuery
 from django.contrib import admin
 from django.contrib.admin import register
+from django.utils import timezone
 from recipes.models import (Cart, Favorite, Ingredient, IngredientAmount,
                             Recipe, Tag, User)
 from users.models import Follow
@@ -70,8 +72,55 @@ class RecipesAdmin(admin.ModelAdmin):
     list_filter = ('tags', 'author', 'name')
     empty_value_display = '-empty-'
 
+    @admin.display(ordering='favorites_count')
     def cnt_favorites(self, obj):
-        return obj.favorites.count()
+        return obj.favorites_count
+
+    def save_model(self, request, obj, form, change):
+        # Счётчики и маску тегов пишут сигналы, поэтому изменённый рецепт
+        # сохраняет только поля, изменённые в форме.
+        if not change:
+            return super().save_model(request, obj, form, change)
+        obj.save(update_fields=[
+            name for name in form.changed_data
+            if not obj._meta.get_field(name).many_to_many
+        ])
+
+
+@register(Job)
+class JobAdmin(admin.ModelAdmin):
+    """Административная модель для фоновых задач."""
+    list_display = ('id', 'name', 'status', 'attempts', 'run_at', 'locked_by')
+    search_fields = ('name', )
+    list_filter = ('status', 'name')
+    readonly_fields = ('created_at', 'locked_at', 'locked_by', 'last_error')
+    actions = ('requeue', )
+
+    @admin.action(description='Requeue selected jobs')
+    def requeue(self, request, queryset):
+        queryset.update(
+            status=Job.QUEUED, attempts=0, run_at=timezone.now(),
+            locked_by='', locked_at=None
+        )
+
+
+@register(SlowQuery)
+class SlowQueryAdmin(admin.ModelAdmin):
+    """Административная модель для журнала медленных запросов (только
+    просмотр)."""
+    list_display = ('created_at', 'duration', 'database', 'view', 'origin')
+    search_fields = ('sql', 'view', 'origin')
+    list_filter = ('view', 'database')
+    readonly_fields = (
+        'created_at', 'duration', 'database', 'view', 'origin', 'sql',
+        'params', 'plan'
+    )
+
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
 
 
 class UserAdmin(admin.ModelAdmin):
@@ -0,0 +1,45 @@
+# Generated by Django 3.2.15 on 2026-10-18 19:04
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+import django.db.models.expressions
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('recipes', '0002_move_follow_to_users'),
+    ]
+
+    # Таблица уже перенесена миграцией recipes.0002, здесь меняется
+    # только состояние моделей.
+    operations = [
+        migrations.SeparateDatabaseAndState(
+            state_operations=[
+                migrations.CreateModel(
+                    name='Follow',
+                    fields=[
+                        ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                        ('author', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='following', to=settings.AUTH_USER_MODEL)),
+                        ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='follower', to=settings.AUTH_USER_MODEL)),
+                    ],
+                ),
+                migrations.AddIndex(
+                    model_name='follow',
+                    index=models.Index(fields=['user', 'author'], name='user_author'),
+                ),
+                migrations.AddConstraint(
+                    model_name='follow',
+                    constraint=models.CheckConstraint(check=models.Q(('user', django.db.models.expressions.F('author')), _negated=True), name='user_not_author'),
+                ),
+                migrations.AddConstraint(
+                    model_name='follow',
+                    constraint=models.UniqueConstraint(fields=('user', 'author'), name='unique_follow'),
+                ),
+            ],
+        ),
+    ]
@@ -0,0 +1,59 @@
+# Generated by Django 3.2.15 on 2026-10-18 19:07
+
+from django.db import migrations, models
+from django.db.models import OuterRef, Q
+import django.db.models.deletion
+
+from core.db import count_subquery
+
+
+def fill_stats(apps, schema_editor):
+    User = apps.get_model('auth', 'User')
+    Recipe = apps.get_model('recipes', 'Recipe')
+    Follow = apps.get_model('users', 'Follow')
+    AuthorStats = apps.get_model('users', 'AuthorStats')
+    authors = User.objects.filter(
+        Q(recipe__isnull=False) | Q(following__isnull=False)
+    ).distinct().annotate(
+        recipes_total=count_subquery(
+            Recipe.objects.filter(author=OuterRef('pk')), 'author'
+        ),
+        followers_total=count_subquery(
+            Follow.objects.filter(author=OuterRef('pk')), 'author'
+        )
+    ).values_list('id', 'recipes_total', 'followers_total')
+    AuthorStats.objects.bulk_create(
+        (
+            AuthorStats(
+                user_id=user_id,
+                recipes_count=recipes_total,
+                followers_count=followers_total
+            )
+            for user_id, recipes_total, followers_total in authors.iterator()
+        ),
+        batch_size=1000
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('auth', '0012_alter_user_first_name_max_length'),
+        ('recipes', '0004_recipe_counters'),
+        ('users', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AuthorStats',
+            fields=[
+                ('user', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='stats', serialize=False, to='auth.user')),
+                ('recipes_count', models.PositiveIntegerField(default=0)),
+                ('followers_count', models.PositiveIntegerField(db_index=True, default=0)),
+            ],
+            options={
+                'verbose_name_plural': 'Author stats',
+            },
+        ),
+        migrations.RunPython(fill_stats, migrations.RunPython.noop),
+    ]
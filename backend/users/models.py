@@ -1,6 +1,9 @@
+from core.db import count_subquery
 from django.contrib.auth import get_user_model
-from django.db import models
-from django.db.models import F, Q
+from django.db import models, transaction
+from django.db.models import F, OuterRef, Q
+from django.db.models.functions import Greatest
+from recipes.models import Recipe
 
 User = get_user_model()
 
@@ -32,3 +35,92 @@ class Follow(models.Model):
                 name='unique_follow'
             )
         ]
+
+
+class AuthorStatsManager(models.Manager):
+    """Атомарное обновление и пересчёт счётчиков авторов."""
+
+    def bump(self, user_id, **deltas):
+        """Изменяет счётчики автора на `deltas` одним UPDATE с F().
+
+        Если строки ещё нет, при увеличении она создаётся и счётчики
+        пересчитываются под её блокировкой; уменьшение отсутствующей
+        строки пропускается (например, при каскадном удалении
+        пользователя).
+        """
+        with transaction.atomic():
+            updated = self.filter(user_id=user_id).update(**{
+                field: Greatest(F(field) + delta, 0)
+                for field, delta in deltas.items()
+            })
+            if updated or all(delta <= 0 for delta in deltas.values()):
+                return
+            # Параллельная вставка той же строки ждёт коммита этой,
+            # поэтому второй пересчёт видит обе записи.
+            self.get_or_create(user_id=user_id)
+            self.recount([user_id])
+
+    def recount(self, user_ids):
+        """Пересчитывает счётчики авторов по исходным таблицам."""
+        with transaction.atomic():
+            # Сначала блокировка строк, потом подсчёт: изменения,
+            # закоммиченные до получения блокировки, попадают в счёт.
+            existing = {
+                stats.user_id: stats
+                for stats in self.select_for_update().filter(
+                    user_id__in=user_ids
+                )
+            }
+            counts = User.objects.filter(id__in=user_ids).annotate(
+                recipes_total=count_subquery(
+                    Recipe.objects.filter(author=OuterRef('pk')), 'author'
+                ),
+                followers_total=count_subquery(
+                    Follow.objects.filter(author=OuterRef('pk')), 'author'
+                )
+            ).values_list('id', 'recipes_total', 'followers_total')
+            to_create, to_update = [], []
+            for user_id, recipes_total, followers_total in counts:
+                stats = existing.get(user_id)
+                if stats is None:
+                    to_create.append(self.model(
+                        user_id=user_id,
+                        recipes_count=recipes_total,
+                        followers_count=followers_total
+                    ))
+                elif (stats.recipes_count, stats.followers_count) != (
+                        recipes_total, followers_total):
+                    stats.recipes_count = recipes_total
+                    stats.followers_count = followers_total
+                    to_update.append(stats)
+
+            if to_update:
+                self.bulk_update(
+                    to_update, ('recipes_count', 'followers_count')
+                )
+            if to_create:
+                # Строку мог успеть создать параллельный запрос.
+                self.bulk_create(to_create, ignore_conflicts=True)
+
+        return len(to_create) + len(to_update)
+
+
+class AuthorStats(models.Model):
+    """Денормализованные счётчики автора: рецепты и подписчики."""
+
+    user = models.OneToOneField(
+        User,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='stats'
+    )
+    recipes_count = models.PositiveIntegerField(default=0)
+    followers_count = models.PositiveIntegerField(default=0, db_index=True)
+
+    objects = AuthorStatsManager()
+
+    class Meta:
+        verbose_name_plural = 'Author stats'
+
+    def __str__(self):
+        return f'{self.user}'
@@ -0,0 +1,96 @@
+import pytest
+
+
+@pytest.fixture(autouse=True)
+def clear_cache():
+    # Версии данных и токены из кэша не переживают откат базы.
+    from django.core.cache import cache
+
+    cache.clear()
+
+
+@pytest.fixture
+def no_page_cache(monkeypatch):
+    monkeypatch.setattr('api.mixins.RECIPE_CACHE_TIMEOUT', 0)
+
+
+@pytest.fixture
+def users(django_user_model):
+    return [
+        django_user_model.objects.create_user(
+            username=f'user{number}',
+            email=f'user{number}@foodgram.ru',
+            password='Foodgram-2022'
+        )
+        for number in range(3)
+    ]
+
+
+@pytest.fixture
+def tags():
+    from recipes.models import Tag
+
+    return [
+        Tag.objects.create(name=name, color='#E26C2D', slug=name)
+        for name in ('breakfast', 'lunch', 'dinner')
+    ]
+
+
+@pytest.fixture
+def ingredients():
+    from recipes.models import Ingredient
+
+    return [
+        Ingredient.objects.create(name=f'ingredient{number}',
+                                  measurement_unit='g')
+        for number in range(10)
+    ]
+
+
+@pytest.fixture
+def make_recipes(users, tags, ingredients):
+    """Рецепты по кругу авторов, тегов и ингредиентов."""
+    from recipes.models import IngredientAmount, Recipe
+
+    def make(count):
+        recipes = []
+        for number in range(count):
+            recipe = Recipe.objects.create(
+                author=users[number % len(users)],
+                name=f'recipe{number}',
+                text='text',
+                cooking_time=10
+            )
+            recipe.tags.set(tags[:1 + number % len(tags)])
+            IngredientAmount.objects.bulk_create(
+                IngredientAmount(
+                    recipe=recipe,
+                    ingredient=ingredients[
+                        (number + shift) % len(ingredients)
+                    ],
+                    amount=shift + 1
+                )
+                for shift in range(3)
+            )
+            recipes.append(recipe)
+        return recipes
+
+    return make
+
+
+@pytest.fixture
+def user_client(users):
+    from rest_framework.authtoken.models import Token
+    from rest_framework.test import APIClient
+
+    client = APIClient()
+    token = Token.objects.create(user=users[0])
+    client.credentials(HTTP_AUTHORIZATION=f'Token {token.key}')
+    return client
+
+
+@pytest.fixture
+def guest_client():
+    from rest_framework.test import APIClient
+
+    return APIClient()
@@ -0,0 +1,32 @@
+import pytest
+from api import authentication
+
+MEMCACHED = {'default': {
+    'BACKEND': 'django.core.cache.backends.memcached.PyMemcacheCache'
+}}
+
+
+def test_shared_token_cache_needs_shared_cache(monkeypatch):
+    monkeypatch.setattr(authentication, 'AUTH_TOKEN_CACHE', 'shared')
+    assert authentication.get_token_cache() is None
+
+    monkeypatch.setattr('core.checks.CACHES', MEMCACHED)
+    assert isinstance(
+        authentication.get_token_cache(), authentication.SharedTokenCache
+    )
+
+
+@pytest.mark.django_db
+@pytest.mark.parametrize('token_cache', [
+    authentication.SharedTokenCache(60),
+    authentication.LocalTokenCache(10, 60),
+], ids=['shared', 'local'])
+def test_logout_revokes_cached_token(user_client, monkeypatch, token_cache,
+                                     django_capture_on_commit_callbacks):
+    monkeypatch.setattr(authentication, 'token_cache', token_cache)
+    assert user_client.get('/api/users/me/').status_code == 200
+
+    with django_capture_on_commit_callbacks(execute=True):
+        response = user_client.post('/api/auth/token/logout/')
+    assert response.status_code == 204
+    assert user_client.get('/api/users/me/').status_code == 401
@@ -0,0 +1,52 @@
+import pytest
+from api.views import FavoriteBulkView
+from recipes.models import Favorite, Recipe, ShoppingListItem
+
+
+@pytest.mark.django_db
+def test_bulk_delete_keeps_counters(user_client, users, make_recipes):
+    recipes = make_recipes(3)
+    ids = [recipe.id for recipe in recipes]
+    for url in ('/api/recipes/favorite/', '/api/recipes/shopping_cart/'):
+        response = user_client.post(url, {'ids': ids}, format='json')
+        assert response.status_code == 200
+
+    assert ShoppingListItem.objects.filter(user=users[0]).exists()
+    for url in ('/api/recipes/favorite/', '/api/recipes/shopping_cart/'):
+        response = user_client.delete(url, {'ids': ids[:2]}, format='json')
+        assert [item['status'] for item in response.json()['results']] == [
+            'removed', 'removed'
+        ]
+
+    counters = Recipe.objects.filter(id__in=ids).order_by('id').values_list(
+        'favorites_count', 'carts_count'
+    )
+    assert list(counters) == [(0, 0), (0, 0), (1, 1)]
+    expected = ShoppingListItem.objects.expected([users[0].id])
+    assert {
+        (item.user_id, item.ingredient_id): item.amount
+        for item in ShoppingListItem.objects.filter(
+            user=users[0], amount__gt=0
+        )
+    } == {key: total for key, total in expected.items() if total}
+
+
+@pytest.mark.django_db
+def test_bulk_add_reports_concurrent_insert(user_client, users, make_recipes,
+                                            monkeypatch):
+    recipes = make_recipes(2)
+    Favorite.objects.create(user=users[0], recipe=recipes[0])
+    # Связь создана параллельным запросом после проверки.
+    monkeypatch.setattr(
+        FavoriteBulkView, 'get_targets',
+        lambda self, ids: {target_id: False for target_id in ids}
+    )
+    response = user_client.post(
+        '/api/recipes/favorite/',
+        {'ids': [recipes[0].id, recipes[1].id]}, format='json'
+    )
+    assert [item['status'] for item in response.json()['results']] == [
+        'exists', 'added'
+    ]
+    assert Favorite.objects.filter(user=users[0]).count() == 2
+    assert Recipe.objects.get(id=recipes[1].id).favorites_count == 1
@@ -0,0 +1,54 @@
+import threading
+
+import pytest
+from django.db import connection, connections
+from users.models import AuthorStats, Follow
+
+
+def followers(author):
+    return AuthorStats.objects.get(user=author).followers_count
+
+
+@pytest.mark.django_db
+def test_first_follow_counts_existing_followers(users):
+    author = users[0]
+    # Подписка, записанная в обход сигналов, например генератором данных.
+    Follow.objects.bulk_create([Follow(user=users[1], author=author)])
+    assert not AuthorStats.objects.filter(user=author).exists()
+
+    Follow.objects.create(user=users[2], author=author)
+    assert followers(author) == 2
+
+    Follow.objects.filter(user=users[1]).delete()
+    assert followers(author) == 1
+
+
+@pytest.mark.skipif(
+    connection.vendor == 'sqlite',
+    reason='SQLite serializes writers, the race needs row locks.'
+)
+@pytest.mark.django_db(transaction=True)
+def test_concurrent_first_follows(users):
+    author = users[0]
+    barrier = threading.Barrier(2)
+    errors = []
+
+    def follow(user):
+        try:
+            barrier.wait()
+            Follow.objects.create(user=user, author=author)
+        except Exception as error:
+            errors.append(error)
+        finally:
+            connections.close_all()
+
+    threads = [
+        threading.Thread(target=follow, args=(user,)) for user in users[1:]
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert errors == []
+    assert followers(author) == 2
@@ -0,0 +1,41 @@
+import time
+
+import pytest
+from core.checks import check_replica_cache
+from core.db_routers import (RequestRouting, can_cache_read, current_routing,
+                             is_pinned, pin_to_primary)
+
+from backend.settings import REPLICA_STICKY_SECONDS
+
+
+@pytest.fixture
+def routing(rf):
+    request = rf.get('/api/recipes/', HTTP_AUTHORIZATION='Token 1234')
+    token = current_routing.set(RequestRouting(request))
+    yield current_routing.get()
+    current_routing.reset(token)
+
+
+def test_pinned_client_skips_page_cache(routing):
+    assert not is_pinned()
+    pin_to_primary(routing.request)
+    current_routing.set(RequestRouting(routing.request))
+    assert is_pinned()
+    assert not can_cache_read(0)
+
+
+def test_fresh_replica_read_is_not_cached(routing):
+    assert can_cache_read(time.time())
+    routing.alias = 'replica1'
+    assert not can_cache_read(time.time())
+    assert can_cache_read(time.time() - REPLICA_STICKY_SECONDS)
+
+
+def test_replicas_require_shared_cache(monkeypatch):
+    monkeypatch.setattr('core.checks.REPLICA_DATABASES', ['replica1'])
+    assert [error.id for error in check_replica_cache(None)] == ['core.E001']
+
+    monkeypatch.setattr('core.checks.CACHES', {'default': {
+        'BACKEND': 'django.core.cache.backends.memcached.PyMemcacheCache'
+    }})
+    assert check_replica_cache(None) == []
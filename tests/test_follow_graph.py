@@ -0,0 +1,40 @@
+import pytest
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from users.models import Follow
+
+
+def get(client, url):
+    """Ответ и число запросов к подпискам."""
+    with CaptureQueriesContext(connection) as queries:
+        response = client.get(url)
+    assert response.status_code == 200
+    return response.json(), sum(
+        'users_follow' in query['sql'] for query in queries.captured_queries
+    )
+
+
+@pytest.mark.django_db
+@pytest.mark.parametrize('url', ['/api/recipes/?limit=20', '/api/users/'])
+def test_is_subscribed_with_one_query(user_client, guest_client, users,
+                                      make_recipes, no_page_cache, url):
+    make_recipes(9)
+    Follow.objects.create(user=users[0], author=users[1])
+
+    def subscribed(data):
+        items = data['results'] if isinstance(data, dict) else data
+        return {
+            item.get('author', item)['id']:
+                item.get('author', item)['is_subscribed']
+            for item in items
+        }
+
+    data, queries = get(user_client, url)
+    assert subscribed(data) == {
+        user.id: user == users[1] for user in users
+    }
+    assert queries == 1
+
+    data, queries = get(guest_client, url)
+    assert not any(subscribed(data).values())
+    assert queries == 0
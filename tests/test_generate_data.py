@@ -0,0 +1,55 @@
+from io import StringIO
+
+import pytest
+from django.core.management import call_command
+from django.db.models import Count
+from recipes.models import Ingredient, Recipe, ShoppingListItem, User
+from users.models import AuthorStats
+
+OPTIONS = {
+    'users': 12, 'recipes': 40, 'follows': 3, 'favorites': 4, 'carts': 2,
+    'batch_size': 7, 'seed': 3,
+}
+
+
+def generate():
+    call_command('generate_data', stdout=StringIO(), **OPTIONS)
+    return sorted(
+        (recipe.author.username, recipe.name, recipe.cooking_time,
+         tuple(recipe.tags.values_list('slug', flat=True)),
+         tuple(recipe.ingredient_amounts.values_list(
+             'ingredient__name', 'amount'
+         )))
+        for recipe in Recipe.objects.select_related('author')
+    )
+
+
+@pytest.mark.django_db
+def test_generate_data():
+    recipes = generate()
+    user_ids = list(User.objects.values_list('id', flat=True))
+    assert len(user_ids) == OPTIONS['users']
+    assert len(recipes) == OPTIONS['recipes']
+    assert all(tags and ingredients for *_, tags, ingredients in recipes)
+    # Ингредиенты из каталога в data/.
+    assert Ingredient.objects.filter(name='абрикосовое варенье').exists()
+
+    # Счётчики и списки покупок пересчитаны после записи в обход моделей.
+    stats = {
+        author.id: (author.recipes_total, author.followers_total)
+        for author in User.objects.annotate(
+            recipes_total=Count('recipe', distinct=True),
+            followers_total=Count('following', distinct=True)
+        )
+    }
+    for row in AuthorStats.objects.all():
+        assert stats[row.user_id] == (row.recipes_count, row.followers_count)
+    items = {
+        (item.user_id, item.ingredient_id): item.amount
+        for item in ShoppingListItem.objects.filter(amount__gt=0)
+    }
+    assert items == ShoppingListItem.objects.expected(user_ids)
+
+    # Тот же seed на пустой базе даёт те же данные.
+    User.objects.all().delete()
+    assert generate() == recipes
@@ -0,0 +1,48 @@
+import pytest
+from api.search import ingredient_index
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from recipes.models import Ingredient
+
+
+@pytest.fixture
+def catalogue():
+    ingredient_index.index = None
+    Ingredient.objects.bulk_create(
+        Ingredient(name=name, measurement_unit='g')
+        for name in ('apple', 'avocado', 'banana', 'salt')
+    )
+    yield
+    ingredient_index.index = None
+
+
+def names(client, query):
+    response = client.get(f'/api/ingredients/?name={query}')
+    return [item['name'] for item in response.json()]
+
+
+@pytest.mark.django_db
+@pytest.mark.parametrize('use_index', [True, False], ids=['index', 'db'])
+def test_short_query_matches_prefix_only(guest_client, catalogue,
+                                         monkeypatch, use_index):
+    monkeypatch.setattr('api.views.INGREDIENT_SEARCH_INDEX', use_index)
+    assert names(guest_client, 'a') == ['apple', 'avocado']
+    assert names(guest_client, 'al') == ['salt']
+
+
+@pytest.mark.django_db
+def test_index_refreshed_on_ingredient_write(
+        guest_client, catalogue, django_capture_on_commit_callbacks):
+    # Индекс построен заранее: поиск не обращается к базе.
+    ingredient_index.get()
+    with CaptureQueriesContext(connection) as queries:
+        assert names(guest_client, 'ban') == ['banana']
+    assert len(queries) == 0
+
+    with django_capture_on_commit_callbacks(execute=True):
+        Ingredient.objects.create(name='banana chips', measurement_unit='g')
+    # Процесс, где была запись, перестроил индекс сразу после коммита.
+    assert len(ingredient_index.index) == 5
+    with CaptureQueriesContext(connection) as queries:
+        assert names(guest_client, 'ban') == ['banana', 'banana chips']
+    assert len(queries) == 0
@@ -0,0 +1,67 @@
+import threading
+from datetime import timedelta
+
+import pytest
+from core import jobs
+from core.management.commands import run_jobs
+from core.models import Job
+from django.core.management import call_command
+from django.utils import timezone
+
+finished = []
+last_started = threading.Event()
+
+
+@jobs.job
+def slow_job():
+    # Дождётся последней задачи, только если её взяли до своего конца.
+    finished.append(('slow', last_started.wait(5)))
+
+
+@jobs.job
+def fast_job(number, last=False):
+    if last:
+        last_started.set()
+    finished.append(number)
+
+
+@pytest.fixture
+def database_queue(monkeypatch):
+    monkeypatch.setattr(jobs, 'JOB_BACKEND', 'database')
+    finished.clear()
+    last_started.clear()
+
+
+@pytest.mark.django_db(transaction=True)
+def test_free_thread_takes_next_job(database_queue, monkeypatch):
+    # Тестовая SQLite в памяти не ждёт блокировок таблиц, поэтому потоки
+    # только вызывают функции, а с базой работает основной поток.
+    def execute(job):
+        jobs.registry[job.name](**job.payload)
+        return True
+
+    monkeypatch.setattr(run_jobs, 'execute', execute)
+    jobs.enqueue(slow_job)
+    for number in range(3):
+        jobs.enqueue(fast_job, number=number, last=number == 2)
+
+    call_command('run_jobs', '--once', '--threads=2', '--poll-interval=0.1')
+
+    assert finished == [0, 1, 2, ('slow', True)]
+
+
+@pytest.mark.django_db(transaction=True)
+def test_heartbeat_keeps_running_job(database_queue):
+    jobs.enqueue(fast_job, number=0)
+    job, = jobs.claim('worker', 1)
+    Job.objects.update(locked_at=timezone.now() - timedelta(days=1))
+
+    assert jobs.heartbeat('worker') == 1
+    assert jobs.release_stale() == 0
+
+    # Брошенную задачу взял другой воркер: первый её не удаляет.
+    Job.objects.update(locked_at=timezone.now() - timedelta(days=1))
+    assert jobs.release_stale() == 1
+    jobs.claim('other', 1)
+    assert jobs.execute(job)
+    assert Job.objects.get().locked_by == 'other'
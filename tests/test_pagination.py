@@ -0,0 +1,63 @@
+import pytest
+from django.contrib.auth import get_user_model
+from django.utils import timezone
+from recipes.models import Recipe
+from users.models import Follow
+
+
+def walk(client, url, link='next'):
+    """Идёт по ссылкам `link` и собирает id со всех страниц."""
+    pages = []
+    while url:
+        data = client.get(url).json()
+        assert data['count'] is None
+        pages.append([item['id'] for item in data['results']])
+        url = data[link]
+    return pages
+
+
+@pytest.mark.django_db
+def test_recipe_cursor_walks_every_recipe_once(user_client, make_recipes):
+    recipes = make_recipes(11)
+    # Одинаковое время публикации: порядок решает id.
+    Recipe.objects.filter(
+        id__in=[recipe.id for recipe in recipes[3:7]]
+    ).update(pub_date=timezone.now())
+    expected = [
+        item['id'] for item in
+        user_client.get('/api/recipes/?limit=100').json()['results']
+    ]
+
+    pages = walk(user_client, '/api/recipes/?cursor=&limit=3')
+    assert [len(page) for page in pages] == [3, 3, 3, 2]
+    assert sum(pages, []) == expected
+
+    # Назад от последней страницы.
+    last = user_client.get('/api/recipes/?cursor=&limit=3')
+    while last.json()['next']:
+        last = user_client.get(last.json()['next'])
+    back = walk(user_client, last.json()['previous'], link='previous')
+    assert sum(reversed(back), []) == expected[:9]
+
+
+@pytest.mark.django_db
+def test_page_number_and_invalid_cursor(user_client, make_recipes):
+    make_recipes(5)
+    data = user_client.get('/api/recipes/?page=2&limit=2').json()
+    assert data['count'] == 5
+    assert len(data['results']) == 2
+    assert user_client.get('/api/recipes/?cursor=broken').status_code == 404
+
+
+@pytest.mark.django_db
+def test_subscriptions_cursor(user_client, users):
+    authors = [
+        get_user_model().objects.create_user(
+            username=f'author{number}', email=f'author{number}@foodgram.ru'
+        )
+        for number in range(5)
+    ]
+    for author in authors:
+        Follow.objects.create(user=users[0], author=author)
+    pages = walk(user_client, '/api/users/subscriptions/?cursor=&limit=2')
+    assert sum(pages, []) == [author.id for author in reversed(authors)]
@@ -0,0 +1,60 @@
+import json
+import os
+import re
+import subprocess
+import sys
+
+import pytest
+from django.conf import settings
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+
+def requests_count(client, view):
+    """Число запросов к `view` в гистограмме /metrics."""
+    text = client.get('/metrics').content.decode()
+    match = re.search(
+        r'^foodgram_http_request_db_queries_count'
+        rf'{{view="{view}",method="GET"}} (\d+)$', text, re.M
+    )
+    return int(match[1]) if match else 0
+
+
+@pytest.mark.django_db
+def test_server_timing_and_metrics(guest_client, tags):
+    before = requests_count(guest_client, 'tags-list')
+    with CaptureQueriesContext(connection) as queries:
+        response = guest_client.get('/api/tags/')
+    assert response.status_code == 200
+    names = [
+        part.split(';')[0] for part in response['Server-Timing'].split(', ')
+    ]
+    assert names == ['db', 'app', 'render', 'total']
+    assert f'"{len(queries)} queries"' in response['Server-Timing']
+
+    assert requests_count(guest_client, 'tags-list') == before + 1
+    assert guest_client.get(
+        '/metrics', REMOTE_ADDR='8.8.8.8'
+    ).status_code == 404
+    assert guest_client.get(
+        '/metrics', HTTP_X_FORWARDED_FOR='10.0.0.1'
+    ).status_code == 404
+
+
+@pytest.mark.parametrize('debug', ['', '1'])
+def test_middleware_order(debug):
+    # Настройки читаются при импорте, поэтому проверяются в новом процессе.
+    output = subprocess.run(
+        [sys.executable, '-c', (
+            'import json; from backend import settings; '
+            'print(json.dumps([settings.INSTALLED_APPS, settings.MIDDLEWARE]))'
+        )],
+        cwd=settings.BASE_DIR, env={**os.environ, 'DJANGO_DEBUG': debug},
+        capture_output=True, check=True, text=True
+    ).stdout
+    installed_apps, middleware = json.loads(output)
+    # Замеры охватывают все остальные middleware.
+    assert middleware[0] == 'core.middleware.PerformanceMiddleware'
+    toolbar = 'debug_toolbar.middleware.DebugToolbarMiddleware'
+    assert (toolbar in middleware) == bool(debug)
+    assert ('debug_toolbar' in installed_apps) == bool(debug)
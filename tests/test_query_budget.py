@@ -0,0 +1,104 @@
+import pytest
+from recipes.models import Cart, Favorite
+from users.models import Follow
+
+# Бюджет считается для запросов мимо общего кэша страниц: с тёплым
+# кэшем страница рецептов стоит 0–1 запрос и регрессий не видно.
+pytestmark = pytest.mark.usefixtures('no_page_cache')
+
+# Число запросов к БД не зависит от числа рецептов на странице:
+# токен, COUNT(*), страница, подписки, теги, ингредиенты.
+BUDGET = {
+    'recipe-list': 6,
+    'recipe-detail': 5,
+    'subscriptions': 4,
+    'download-cart': 2,
+}
+
+
+@pytest.fixture
+def filled(users, make_recipes):
+    """Рецепты с подписками, избранным и корзиной первого пользователя."""
+    def fill(count):
+        recipes = make_recipes(count)
+        user = users[0]
+        for author in users[1:]:
+            Follow.objects.create(user=user, author=author)
+        for recipe in recipes:
+            Favorite.objects.create(user=user, recipe=recipe)
+            Cart.objects.create(user=user, recipe=recipe)
+        return recipes
+
+    return fill
+
+
+# Варианты списка рецептов: фильтры, поиск и пагинация по ключу, и
+# сколько запросов вариант добавляет к бюджету списка: фильтр по
+# тегам выбирает теги по slug.
+LIST_QUERIES = {
+    'plain': ('', 0),
+    'tags-any': ('tags=breakfast&tags=lunch', 1),
+    'tags-all': ('tags=breakfast&tags=lunch&tags_mode=all', 1),
+    'author': ('author={author}', 0),
+    'favorited': ('is_favorited=1', 0),
+    'in-cart': ('is_in_shopping_cart=1', 0),
+    'search': ('search=recipe1', 0),
+    'cursor': ('cursor=', 0),
+}
+
+
+@pytest.mark.django_db
+@pytest.mark.parametrize('client', ['user_client', 'guest_client'])
+@pytest.mark.parametrize('query', LIST_QUERIES.values(), ids=LIST_QUERIES)
+@pytest.mark.parametrize('count', [3, 30])
+def test_recipe_list(request, users, filled, count, query, client,
+                     django_assert_max_num_queries):
+    filled(count)
+    client = request.getfixturevalue(client)
+    query, extra = query
+    query = query.format(author=users[1].id)
+    with django_assert_max_num_queries(BUDGET['recipe-list'] + extra):
+        response = client.get(f'/api/recipes/?limit=30&{query}')
+    assert response.status_code == 200
+
+
+@pytest.mark.django_db
+def test_recipe_list_next_cursor(user_client, filled,
+                                 django_assert_max_num_queries):
+    filled(30)
+    first = user_client.get('/api/recipes/?limit=10&cursor=').json()
+    with django_assert_max_num_queries(BUDGET['recipe-list']):
+        response = user_client.get(first['next'])
+    assert response.status_code == 200
+    assert len(response.json()['results']) == 10
+
+
+@pytest.mark.django_db
+def test_recipe_detail(user_client, filled, django_assert_max_num_queries):
+    recipe = filled(3)[0]
+    with django_assert_max_num_queries(BUDGET['recipe-detail']):
+        response = user_client.get(f'/api/recipes/{recipe.id}/')
+    assert response.status_code == 200
+
+
+@pytest.mark.django_db
+@pytest.mark.parametrize('count', [3, 30])
+def test_subscriptions(user_client, filled, count,
+                       django_assert_max_num_queries):
+    filled(count)
+    with django_assert_max_num_queries(BUDGET['subscriptions']):
+        response = user_client.get(
+            '/api/users/subscriptions/?limit=10&recipes_limit=3'
+        )
+    assert response.status_code == 200
+    assert response.json()['count'] == 2
+
+
+@pytest.mark.django_db
+@pytest.mark.parametrize('count', [3, 30])
+def test_download_cart(user_client, filled, count,
+                       django_assert_max_num_queries):
+    filled(count)
+    with django_assert_max_num_queries(BUDGET['download-cart']):
+        response = user_client.get('/api/recipes/download_shopping_cart/')
+    assert response.status_code == 200
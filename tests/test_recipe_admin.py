@@ -0,0 +1,26 @@
+import pytest
+from recipes.models import Favorite, Recipe
+
+
+@pytest.mark.django_db
+def test_admin_change_keeps_counters(admin_client, users, make_recipes,
+                                     monkeypatch):
+    recipe = make_recipes(1)[0]
+    Recipe.objects.filter(id=recipe.id).update(image='recipe/images/1.png')
+    url = f'/admin/recipes/recipe/{recipe.id}/change/'
+    form = admin_client.get(url).context['adminform'].form
+    data = {
+        name: form[name].value() for name in form.fields if name != 'image'
+    }
+    data['name'] = 'updated'
+    # Рецепт добавляют в избранное, пока админка сохраняет форму.
+    monkeypatch.setattr(
+        Recipe, 'clean',
+        lambda self: Favorite.objects.create(user=users[1], recipe=recipe)
+    )
+
+    response = admin_client.post(url, data)
+    assert response.status_code == 302
+    recipe = Recipe.objects.get(id=recipe.id)
+    assert recipe.name == 'updated'
+    assert recipe.favorites_count == 1
@@ -0,0 +1,34 @@
+import pytest
+from recipes.models import Recipe
+
+
+def found(client, query):
+    response = client.get('/api/recipes/', {'search': query})
+    assert response.status_code == 200
+    return [item['name'] for item in response.json()]
+
+
+@pytest.mark.django_db
+def test_search_ranks_and_follows_changes(guest_client, users,
+                                          no_page_cache):
+    author = users[0]
+    Recipe.objects.create(author=author, name='Борщ украинский',
+                          text='свекла, капуста', cooking_time=60)
+    Recipe.objects.create(author=author, name='Салат',
+                          text='капуста и морковь, борщевик', cooking_time=5)
+    pancakes = Recipe.objects.create(author=author, name='Pancakes',
+                                     text='flour milk eggs', cooking_time=20)
+
+    # Совпадение в названии выше совпадения в описании.
+    assert found(guest_client, 'борщ') == ['Борщ украинский', 'Салат']
+    assert found(guest_client, 'капуста') == ['Борщ украинский', 'Салат']
+    assert found(guest_client, 'pancake') == ['Pancakes']
+    assert found(guest_client, '!!') == []
+
+    pancakes.name = 'Блины'
+    pancakes.save()
+    assert found(guest_client, 'pancake') == []
+    assert found(guest_client, 'блины') == ['Блины']
+
+    pancakes.delete()
+    assert found(guest_client, 'блины') == []
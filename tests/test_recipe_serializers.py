@@ -0,0 +1,66 @@
+import pytest
+from api.views import RecipeViewSet
+from recipes.models import Cart, Favorite, Recipe
+from users.models import Follow
+
+pytestmark = pytest.mark.usefixtures('no_page_cache')
+
+
+@pytest.fixture
+def recipes(users, make_recipes):
+    recipes = make_recipes(6)
+    user = users[0]
+    Follow.objects.create(user=user, author=users[1])
+    Favorite.objects.create(user=user, recipe=recipes[0])
+    Cart.objects.create(user=user, recipe=recipes[1])
+    # Картинки с готовыми вариантами и без них.
+    Recipe.objects.filter(id=recipes[2].id).update(
+        image='recipe/images/2.png', variants_image='recipe/images/2.png'
+    )
+    Recipe.objects.filter(id=recipes[3].id).update(
+        image='recipe/images/3.png'
+    )
+    return recipes
+
+
+def responses(client, url, monkeypatch):
+    """Ответы быстрого и обычного сериализатора на один запрос."""
+    fast = client.get(url)
+    with monkeypatch.context() as patch:
+        patch.setattr(RecipeViewSet, 'fast_read', False)
+        regular = client.get(url)
+    assert fast.status_code == regular.status_code == 200
+    return fast.content, regular.content
+
+
+@pytest.mark.django_db
+@pytest.mark.parametrize('url', [
+    '/api/recipes/', '/api/recipes/?limit=4', '/api/recipes/?page=2&limit=4'
+])
+@pytest.mark.parametrize('client', ['user_client', 'guest_client'])
+def test_list_matches_regular_serializer(request, client, url, recipes,
+                                         monkeypatch):
+    client = request.getfixturevalue(client)
+    fast, regular = responses(client, url, monkeypatch)
+    assert fast == regular
+
+
+@pytest.mark.django_db
+def test_detail_matches_regular_serializer(user_client, recipes,
+                                           monkeypatch):
+    for recipe in recipes:
+        fast, regular = responses(
+            user_client, f'/api/recipes/{recipe.id}/', monkeypatch
+        )
+        assert fast == regular
+
+
+@pytest.mark.django_db
+def test_variants_only_when_ready(guest_client, recipes):
+    def variants(recipe):
+        response = guest_client.get(f'/api/recipes/{recipe.id}/')
+        return response.json()['image_variants']
+
+    assert len(variants(recipes[2])) > 1
+    assert list(variants(recipes[3])) == ['original']
+    assert variants(recipes[4]) is None
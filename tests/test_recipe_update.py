@@ -0,0 +1,145 @@
+import pytest
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from recipes.models import IngredientAmount, Recipe
+
+# Картинка 2x2 в PNG.
+PNG = (
+    'iVBORw0KGgoAAAANSUhEUgAAAAIAAAACCAIAAAD91JpzAAAAFklEQVR4nGP8z8DAwMDAxMDA'
+    'wMDAAAANHQEDasKb6QAAAABJRU5ErkJggg=='
+)
+
+
+@pytest.mark.django_db
+def test_update_tags_then_filter(user_client, make_recipes, tags,
+                                 ingredients):
+    recipe = make_recipes(1)[0]
+    response = user_client.put(f'/api/recipes/{recipe.id}/', {
+        'tags': [tags[1].id],
+        'ingredients': [{'id': ingredients[0].id, 'amount': 5}],
+        'name': 'updated',
+        'text': 'text',
+        'cooking_time': 15,
+    }, format='json')
+    assert response.status_code == 200
+
+    def found(tag):
+        response = user_client.get(f'/api/recipes/?limit=10&tags={tag.slug}')
+        return [item['id'] for item in response.json()['results']]
+
+    assert found(tags[1]) == [recipe.id]
+    assert found(tags[0]) == []
+
+
+@pytest.fixture
+def scheduled(monkeypatch, settings, tmp_path):
+    settings.MEDIA_ROOT = tmp_path
+    images = []
+    monkeypatch.setattr('recipes.signals.schedule_variants', images.append)
+    return images
+
+
+@pytest.mark.django_db
+def test_variants_scheduled_only_for_new_image(user_client, make_recipes,
+                                               tags, ingredients, scheduled):
+    recipe = make_recipes(1)[0]
+    data = {
+        'tags': [tags[0].id],
+        'ingredients': [{'id': ingredients[0].id, 'amount': 5}],
+        'name': 'updated',
+        'text': 'text',
+        'cooking_time': 15,
+    }
+    url = f'/api/recipes/{recipe.id}/'
+    assert user_client.put(url, data, format='json').status_code == 200
+    assert scheduled == []
+
+    data['image'] = f'data:image/png;base64,{PNG}'
+    assert user_client.put(url, data, format='json').status_code == 200
+    assert [image.name for image in scheduled] == [
+        Recipe.objects.get(id=recipe.id).image.name
+    ]
+
+
+@pytest.mark.django_db
+def test_ingredient_patch_refreshes_cached_pages(
+        user_client, make_recipes, tags, ingredients,
+        django_capture_on_commit_callbacks):
+    recipe = make_recipes(1)[0]
+    url = f'/api/recipes/{recipe.id}/'
+    # Страницы попадают в общий кэш.
+    user_client.get(url)
+    user_client.get('/api/recipes/?limit=10')
+
+    with django_capture_on_commit_callbacks(execute=True):
+        response = user_client.patch(url, {
+            'tags': [tags[0].id],
+            'ingredients': [{'id': ingredients[0].id, 'amount': 42}],
+        }, format='json')
+    assert response.status_code == 200
+
+    expected = [(ingredients[0].id, 42)]
+    detail = user_client.get(url).json()
+    assert [(item['id'], item['amount'])
+            for item in detail['ingredients']] == expected
+    listed = user_client.get('/api/recipes/?limit=10').json()['results']
+    assert [(item['id'], item['amount'])
+            for item in listed[0]['ingredients']] == expected
+
+
+@pytest.mark.django_db
+def test_update_writes_only_changed_ingredients(user_client, make_recipes,
+                                                tags, ingredients):
+    # Ингредиенты рецепта: 0, 1, 2 с количествами 1, 2, 3.
+    recipe = make_recipes(1)[0]
+    rows = dict(
+        recipe.ingredient_amounts.values_list('ingredient_id', 'id')
+    )
+    with CaptureQueriesContext(connection) as queries:
+        response = user_client.put(f'/api/recipes/{recipe.id}/', {
+            'tags': [tags[0].id],
+            'ingredients': [
+                {'id': ingredients[0].id, 'amount': 1},
+                {'id': ingredients[1].id, 'amount': 7},
+                {'id': ingredients[3].id, 'amount': 4},
+            ],
+            'name': 'updated',
+            'text': 'text',
+            'cooking_time': 15,
+        }, format='json')
+    assert response.status_code == 200
+
+    amounts = {
+        row.ingredient_id: (row.id, row.amount)
+        for row in IngredientAmount.objects.filter(recipe=recipe)
+    }
+    assert amounts[ingredients[0].id] == (rows[ingredients[0].id], 1)
+    assert amounts[ingredients[1].id] == (rows[ingredients[1].id], 7)
+    assert ingredients[2].id not in amounts
+    assert amounts[ingredients[3].id][1] == 4
+
+    writes = [
+        query['sql'].split()[0] for query in queries.captured_queries
+        if 'recipes_ingredientamount' in query['sql']
+        and not query['sql'].startswith('SELECT')
+    ]
+    assert sorted(writes) == ['DELETE', 'INSERT', 'UPDATE']
+
+
+@pytest.mark.django_db
+def test_unknown_ingredients_reported_together(user_client, tags,
+                                               ingredients):
+    response = user_client.post('/api/recipes/', {
+        'tags': [tags[0].id],
+        'ingredients': [
+            {'id': ingredients[0].id, 'amount': 1},
+            {'id': 99998, 'amount': 1},
+            {'id': 99999, 'amount': 1},
+        ],
+        'name': 'recipe',
+        'text': 'text',
+        'cooking_time': 15,
+    }, format='json')
+    assert response.status_code == 400
+    assert 'Ingredients not found: [99998, 99999].' in str(response.json())
+    assert not Recipe.objects.exists()
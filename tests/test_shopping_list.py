@@ -0,0 +1,142 @@
+import pytest
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from recipes.models import Cart, IngredientAmount, Recipe, ShoppingListItem
+
+
+def shopping_list(user):
+    return {
+        (item.user_id, item.ingredient_id): item.amount
+        for item in ShoppingListItem.objects.filter(user=user, amount__gt=0)
+    }
+
+
+def assert_matches_rebuild(client, user):
+    """Агрегат и выгрузка совпадают с пересчитанными с нуля."""
+    assert shopping_list(user) == ShoppingListItem.objects.expected([user.id])
+    download = client.get('/api/recipes/download_shopping_cart/?format=json')
+    ShoppingListItem.objects.rebuild([user.id])
+    rebuilt = client.get('/api/recipes/download_shopping_cart/?format=json')
+    assert download.content == rebuilt.content
+
+
+@pytest.mark.django_db
+def test_cart_add_and_remove(user_client, users, make_recipes):
+    recipes = make_recipes(3)
+    for recipe in recipes:
+        url = f'/api/recipes/{recipe.id}/shopping_cart/'
+        assert user_client.post(url).status_code == 201
+    assert_matches_rebuild(user_client, users[0])
+
+    url = f'/api/recipes/{recipes[1].id}/shopping_cart/'
+    assert user_client.delete(url).status_code == 204
+    assert_matches_rebuild(user_client, users[0])
+
+
+@pytest.mark.django_db
+def test_bulk_cart_add(user_client, users, make_recipes):
+    recipes = make_recipes(4)
+    Cart.objects.create(user=users[0], recipe=recipes[0])
+
+    with CaptureQueriesContext(connection) as queries:
+        response = user_client.post('/api/recipes/shopping_cart/', {
+            'ids': [recipe.id for recipe in recipes]
+        }, format='json')
+    assert [item['status'] for item in response.json()['results']] == [
+        'exists', 'added', 'added', 'added'
+    ]
+    # Добавляются только новые рецепты, список не пересобирается.
+    assert not [
+        query for query in queries.captured_queries
+        if query['sql'].startswith('DELETE')
+    ]
+    assert_matches_rebuild(user_client, users[0])
+
+
+@pytest.mark.django_db
+def test_recipe_ingredients_change(user_client, users, make_recipes,
+                                   ingredients):
+    recipes = make_recipes(2)
+    for recipe in recipes:
+        Cart.objects.create(user=users[0], recipe=recipe)
+
+    response = user_client.patch(f'/api/recipes/{recipes[0].id}/', {
+        'tags': [tag.id for tag in recipes[0].tags.all()],
+        'ingredients': [
+            {'id': ingredients[1].id, 'amount': 7},
+            {'id': ingredients[5].id, 'amount': 3},
+        ],
+    }, format='json')
+    assert response.status_code == 200
+    assert_matches_rebuild(user_client, users[0])
+
+
+@pytest.mark.django_db
+def test_ingredient_amount_direct_writes(user_client, users, make_recipes,
+                                         ingredients):
+    recipes = make_recipes(2)
+    for recipe in recipes:
+        Cart.objects.create(user=users[0], recipe=recipe)
+
+    # Так пишет IngredientAmountAdmin.
+    row = IngredientAmount.objects.filter(recipe=recipes[0]).first()
+    row.amount = 100
+    row.save()
+    assert_matches_rebuild(user_client, users[0])
+
+    row.ingredient = ingredients[9]
+    row.recipe = recipes[1]
+    row.save()
+    assert_matches_rebuild(user_client, users[0])
+
+    IngredientAmount.objects.create(
+        recipe=recipes[0], ingredient=ingredients[8], amount=4
+    )
+    assert_matches_rebuild(user_client, users[0])
+
+    row.delete()
+    assert_matches_rebuild(user_client, users[0])
+
+
+@pytest.mark.django_db
+def test_recipe_delete(user_client, users, make_recipes):
+    recipes = make_recipes(2)
+    for recipe in recipes:
+        Cart.objects.create(user=users[0], recipe=recipe)
+
+    Recipe.objects.get(id=recipes[0].id).delete()
+    assert_matches_rebuild(user_client, users[0])
+
+
+@pytest.mark.django_db
+@pytest.mark.parametrize('fmt', ['csv', 'txt', 'json'])
+def test_download_formats(user_client, users, make_recipes, monkeypatch,
+                          fmt):
+    for recipe in make_recipes(3):
+        Cart.objects.create(user=users[0], recipe=recipe)
+    url = f'/api/recipes/download_shopping_cart/?format={fmt}'
+
+    response = user_client.get(url)
+    assert response.status_code == 200
+    assert not response.streaming
+    assert int(response['Content-Length']) == len(response.content)
+    assert response['Content-Disposition'].endswith(f'.{fmt}"')
+    assert 'ingredient0(g)' in response.content.decode()
+    not_modified = user_client.get(url, HTTP_IF_NONE_MATCH=response['ETag'])
+    assert not_modified.status_code == 304
+
+    # Список длиннее буфера отдаётся потоком с тем же содержимым.
+    monkeypatch.setattr('api.views.SHOPPING_LIST_BUFFER_ROWS', 1)
+    monkeypatch.setattr('api.views.SHOPPING_LIST_CHUNK_SIZE', 2)
+    streamed = user_client.get(url)
+    assert streamed.streaming
+    assert 'Content-Length' not in streamed
+    assert b''.join(streamed.streaming_content) == response.content
+
+
+@pytest.mark.django_db
+def test_download_unknown_format(user_client):
+    response = user_client.get(
+        '/api/recipes/download_shopping_cart/?format=xml'
+    )
+    assert response.status_code == 400
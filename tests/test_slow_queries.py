@@ -0,0 +1,43 @@
+import re
+
+import pytest
+from core import slow_queries
+from core.models import SlowQuery
+from django.db import connection, transaction
+from recipes.models import Tag
+
+
+@pytest.fixture
+def slow_log(monkeypatch):
+    monkeypatch.setattr(slow_queries, 'SLOW_QUERY_THRESHOLD', 0.0001)
+    monkeypatch.setattr(slow_queries, 'SLOW_QUERY_SAMPLE_RATE', 1)
+    slow_queries.install(None, connection)
+    yield
+    connection.execute_wrappers.remove(slow_queries.slow_query_log)
+    slow_queries.pending.clear()
+
+
+def db_queries(client):
+    response = client.get('/api/tags/')
+    return int(re.search(r'"(\d+) queries"', response['Server-Timing'])[1])
+
+
+@pytest.mark.django_db
+def test_entry_survives_rollback(slow_log, tags):
+    with pytest.raises(RuntimeError), transaction.atomic():
+        list(Tag.objects.all())
+        raise RuntimeError
+    slow_queries.flush_pending()
+    assert SlowQuery.objects.filter(sql__contains='recipes_tag').exists()
+
+
+@pytest.mark.django_db
+def test_log_writes_are_not_timed(guest_client, no_page_cache, tags,
+                                  slow_log, monkeypatch):
+    monkeypatch.setattr(slow_queries, 'SLOW_QUERY_SAMPLE_RATE', 0)
+    # Первый запрос ещё заводит версии данных в кэше.
+    db_queries(guest_client)
+    expected = db_queries(guest_client)
+    monkeypatch.setattr(slow_queries, 'SLOW_QUERY_SAMPLE_RATE', 1)
+    assert db_queries(guest_client) == expected
+    assert SlowQuery.objects.filter(view='tags-list').exists()
@@ -0,0 +1,40 @@
+import pytest
+from recipes.models import Recipe
+from users.models import Follow
+
+
+@pytest.fixture
+def followed(users, make_recipes):
+    # По три рецепта у каждого автора.
+    make_recipes(9)
+    for author in users[1:]:
+        Follow.objects.create(user=users[0], author=author)
+    return users[1:]
+
+
+def latest(author):
+    return list(
+        Recipe.objects.filter(author=author).order_by(
+            '-pub_date', '-id'
+        ).values_list('name', flat=True)
+    )
+
+
+@pytest.mark.django_db
+@pytest.mark.parametrize('limit', [1, 2, None])
+def test_subscriptions_latest_recipes(user_client, followed, limit):
+    url = '/api/users/subscriptions/?limit=10'
+    if limit:
+        url += f'&recipes_limit={limit}'
+    response = user_client.get(url)
+    assert response.status_code == 200
+
+    results = {item['id']: item for item in response.json()['results']}
+    assert set(results) == {author.id for author in followed}
+    for author in followed:
+        item = results[author.id]
+        assert [recipe['name'] for recipe in item['recipes']] == (
+            latest(author)[:limit]
+        )
+        assert item['recipes_count'] == 3
+        assert item['is_subscribed']
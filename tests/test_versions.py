@@ -0,0 +1,17 @@
+import pytest
+from django.core.cache import cache
+from recipes.versions import bump_version, get_version
+
+
+@pytest.mark.django_db
+def test_version_is_shared_through_database(
+        django_capture_on_commit_callbacks):
+    first = get_version('recipes')
+    with django_capture_on_commit_callbacks(execute=True):
+        bump_version('recipes')
+    bumped = get_version('recipes')
+    assert bumped != first
+
+    # Процесс, у которого своя копия версии в кэше истекла.
+    cache.clear()
+    assert get_version('recipes') == bumped